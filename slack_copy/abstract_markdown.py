@@ -1,10 +1,24 @@
+import functools
 import re
-import markdown
+import threading
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 
 from slack_copy.html_parsers.airtable_parser import AirtableParser
+from slack_copy.html_parsers.gdocs_parser import GDocsParser
 from slack_copy.html_parsers.html_parser import HTMLParser
 from slack_copy.html_parsers.slack_parser import SlackParser
-from slack_copy.nodes import AMNode
+from slack_copy.nodes import AMNode, iter_html, write_html
+from slack_copy.normalize import NormalizationStats, normalize
+from slack_copy.obsidian_reader import read_obsidian_markdown
+from slack_copy.render import FORMATS, RenderedFormats, render_formats
+
+if TYPE_CHECKING:
+    import markdown
+    from slack_copy.html_parsers.backends import ParserBackend
+
+# One markdown converter per thread, reset between conversions, since building
+# one (and loading its extensions) costs more than a small conversion.
+_markdown_converters = threading.local()
 
 
 class AbstractMarkdownTree:
@@ -13,6 +27,9 @@ class AbstractMarkdownTree:
 
     Represents a markdown file in a way that is independent of the actual implementation.
     This way we can convert to and from different formats (e.g. Slack, Obsidian, etc.)
+
+    The `from_*` methods take an optional parser `backend` ("bs4", "lxml" or
+    "stream"); see `slack_copy.html_parsers.backends`.
     """
 
     def __init__(self, root: AMNode) -> None:
@@ -21,28 +38,50 @@ class AbstractMarkdownTree:
     def to_html(self) -> str:
         return self.root.to_html()
 
+    def iter_html(self) -> Iterator[str]:
+        """Yield the html as a stream of fragments."""
+        return iter_html(self.root)
+
+    def write_html(self, write: Callable[[str], object]) -> None:
+        """Write the html into a sink, e.g. `list.append` or `io.StringIO.write`."""
+        write_html(self.root, write)
+
+    def render_formats(self, formats: Iterable[str] = FORMATS) -> RenderedFormats:
+        """Render HTML, plain text and markdown in one pass; see `slack_copy.render`."""
+        return render_formats(self.root, formats)
+
+    def normalize(self) -> NormalizationStats:
+        """Simplify the tree in place without changing how it displays; see `slack_copy.normalize`."""
+        self.root, stats = normalize(self.root)
+        return stats
+
     @staticmethod
-    def from_obsidian(text: str, is_html: bool = True) -> "AbstractMarkdownTree":
+    def from_obsidian(
+        text: str, is_html: bool = True, backend: str | None = None
+    ) -> "AbstractMarkdownTree":
         if not is_html:
+            root = read_obsidian_markdown(text)
+            if root is not None:
+                return AbstractMarkdownTree(root)
             text = parse_obsidian_markdown(text)
-        parser = HTMLParser()
+        parser = get_parser(HTMLParser, backend)
         root = parser.parse(text)
         assert root is not None
         return AbstractMarkdownTree(root)
 
     def to_obsidian(self) -> str:
-        raise NotImplementedError
+        return render_formats(self.root, ["markdown"]).markdown
 
     @staticmethod
-    def from_slack(text: str) -> "AbstractMarkdownTree":
-        parser = SlackParser()
+    def from_slack(text: str, backend: str | None = None) -> "AbstractMarkdownTree":
+        parser = get_parser(SlackParser, backend)
         root = parser.parse(text)
         assert root is not None
         return AbstractMarkdownTree(root)
 
     @staticmethod
-    def from_airtable(text: str) -> "AbstractMarkdownTree":
-        parser = AirtableParser()
+    def from_airtable(text: str, backend: str | None = None) -> "AbstractMarkdownTree":
+        parser = get_parser(AirtableParser, backend)
         root = parser.parse(text)
         assert root is not None
         return AbstractMarkdownTree(root)
@@ -51,8 +90,8 @@ class AbstractMarkdownTree:
         raise NotImplementedError
 
     @staticmethod
-    def from_gdocs(text: str) -> "AbstractMarkdownTree":
-        parser = HTMLParser()
+    def from_gdocs(text: str, backend: str | None = None) -> "AbstractMarkdownTree":
+        parser = get_parser(GDocsParser, backend)
         root = parser.parse(text)
         assert root is not None
         return AbstractMarkdownTree(root)
@@ -61,36 +100,60 @@ class AbstractMarkdownTree:
         raise NotImplementedError
 
 
+@functools.cache
+def get_parser(
+    parser_class: type[HTMLParser], backend: "str | ParserBackend | None" = None
+) -> HTMLParser:
+    """Return a shared parser instance, so its handler table is only built once.
+
+    Parsers keep no state between calls to `parse`, so they can be reused.
+    """
+    return parser_class(backend)
+
+
+def get_markdown_converter() -> "markdown.Markdown":
+    """Return this thread's markdown converter, reset and ready to use."""
+    converter = getattr(_markdown_converters, "converter", None)
+    if converter is None:
+        import markdown
+
+        converter = markdown.Markdown(extensions=["sane_lists"])
+        _markdown_converters.converter = converter
+    return converter.reset()
+
+
+def warm_up() -> None:
+    """Import the parsing libraries and build the parsers ahead of the first paste."""
+    for parser_class in [GDocsParser, SlackParser, AirtableParser, HTMLParser]:
+        get_parser(parser_class).parse("<p>warm up</p>")
+    get_markdown_converter().convert("warm up")
+
+
 def parse_obsidian_markdown(text):
     """Parse obsidian-flavored markdown (in particular, lists) into HTML.
 
     (Help from https://claude.ai/chat/63a0feed-2065-4216-90d5-b10232326d5b)"""
     preprocessed_text = preprocess_obsidian_markdown(text)
-    html = markdown.markdown(preprocessed_text, extensions=["sane_lists"])
+    html = get_markdown_converter().convert(preprocessed_text)
     return html
 
 
-def preprocess_obsidian_markdown(text):
-    # Regular expression pattern to match text followed by a list without a newline
-    pattern = re.compile(r"(.*)\n((?:[*+-] .*(?:\n|$))+)", re.MULTILINE)
+# Text followed by a list without a blank line in between.
+_TEXT_BEFORE_UNORDERED_LIST = re.compile(r"(.*)\n((?:[*+-] .*(?:\n|$))+)", re.MULTILINE)
+_TEXT_BEFORE_ORDERED_LIST = re.compile(r"(.*)\n((?:\d+\. .*(?:\n|$))+)", re.MULTILINE)
+# A list followed by text without a blank line in between.
+# (from https://claude.ai/chat/78f86edb-cd82-43b4-bae2-ea891f9a1f67)
+_LIST_BEFORE_TEXT = re.compile(
+    r"(?m)^(?:(?:\s*\d+\.|\s*-)\s+.*(?:\n(?:\s*\d+\.|\s*-)\s+.*)*)\n(?!\s*(?:\d+\.|-)\s)"
+)
 
-    # Replace matched patterns with text followed by two newlines and the list
-    def replace_unordered(match):
-        return f"{match.group(1)}\n\n{match.group(2)}"
-
-    processed_text = pattern.sub(replace_unordered, text)
-
-    pattern = re.compile(r"(.*)\n((?:\d+\. .*(?:\n|$))+)", re.MULTILINE)
 
+def preprocess_obsidian_markdown(text):
     # Replace matched patterns with text followed by two newlines and the list
-    def replace_ordered(match):
-        return f"{match.group(1)}\n\n{match.group(2)}"
-
-    processed_text = pattern.sub(replace_ordered, processed_text)
+    processed_text = _TEXT_BEFORE_UNORDERED_LIST.sub(r"\1\n\n\2", text)
+    processed_text = _TEXT_BEFORE_ORDERED_LIST.sub(r"\1\n\n\2", processed_text)
 
     # Add a newline between the end of the list and continued text
-    # (from https://claude.ai/chat/78f86edb-cd82-43b4-bae2-ea891f9a1f67)
-    pattern = r"(?m)^(?:(?:\s*\d+\.|\s*-)\s+.*(?:\n(?:\s*\d+\.|\s*-)\s+.*)*)\n(?!\s*(?:\d+\.|-)\s)"
-    processed_text = re.sub(pattern, r"\g<0>\n", processed_text)
+    processed_text = _LIST_BEFORE_TEXT.sub(r"\g<0>\n", processed_text)
 
     return processed_text
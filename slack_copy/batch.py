@@ -0,0 +1,251 @@
+"""Headless batch conversion: `slack-copy convert`.
+
+Converts exported HTML (or Obsidian markdown) files without a clipboard or Qt,
+using the same conversion as the clipboard loop. Work is spread over a pool
+of processes (or threads) with chunked dispatch, and results are streamed
+out as JSON lines in input order.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+import functools
+import itertools
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import IO, Iterable, Iterator
+
+from slack_copy.abstract_markdown import warm_up
+from slack_copy.main import ClipboardContents, cb_to_amtree, render_contents
+
+HTML_SUFFIXES = {".html", ".htm"}
+TEXT_SUFFIXES = {".md", ".markdown", ".txt"}
+DEFAULT_CHUNKSIZE = 16
+
+
+@dataclass
+class BatchItem:
+    """One document to convert.
+
+    File documents carry only their path, so that workers read them
+    themselves and the inputs don't all have to be held in memory at once.
+
+    Attributes:
+        name: How the document is identified in the output.
+        path: The file to read, if the contents haven't been read yet.
+        contents: The contents, if already read (stdin or JSON lines).
+        error: Why the document couldn't be read (e.g. a malformed JSON
+            line), in which case it is reported without converting it.
+    """
+    name: str
+    path: Path | None = None
+    contents: ClipboardContents | None = None
+    error: str | None = None
+
+
+def looks_like_html(text: str) -> bool:
+    return text.lstrip().startswith("<")
+
+
+def contents_from_file(path: Path) -> ClipboardContents:
+    data = path.read_text(encoding="utf-8")
+    suffix = path.suffix.lower()
+    if suffix in HTML_SUFFIXES or (suffix not in TEXT_SUFFIXES and looks_like_html(data)):
+        return ClipboardContents("", data)
+    return ClipboardContents(data, "")
+
+
+def contents_from_record(record: dict) -> ClipboardContents:
+    """The contents of a JSON record with "html", "text" and "formats" fields.
+
+    Raises:
+        ValueError: If the fields aren't strings (and a list of strings).
+    """
+    contents = ClipboardContents(record.get("text", ""), record.get("html", ""), record.get("formats", ()))
+    if not isinstance(contents.html, str) or not isinstance(contents.text, str):
+        raise ValueError('"html" and "text" must be strings')
+    if not isinstance(contents.formats, (list, tuple)) or not all(isinstance(f, str) for f in contents.formats):
+        raise ValueError('"formats" must be a list of strings')
+    contents.formats = tuple(contents.formats)
+    return contents
+
+
+def iter_jsonl_items(stream: IO[str], name: str) -> Iterator[BatchItem]:
+    """Yield a document for each JSON record with "html" and/or "text".
+
+    Lines that aren't such a record are yielded as documents with an error,
+    so that one bad line doesn't stop the batch.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        item_name = f"{name}:{line_number}"
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("JSON record must be an object")
+            item_name = str(record.get("id", item_name))
+            contents = contents_from_record(record)
+        except ValueError as e:
+            yield BatchItem(item_name, error=f"{type(e).__name__}: {e}")
+            continue
+        yield BatchItem(item_name, contents=contents)
+
+
+def iter_items(inputs: Iterable[str], jsonl: bool = False) -> Iterator[BatchItem]:
+    """Yield the documents to convert from files, directories and stdin ("-").
+
+    Args:
+        inputs: Paths, or "-" for stdin. Directories are searched recursively
+            for html and markdown files.
+        jsonl: Whether the inputs are JSON lines with a record per document
+            rather than a document per file.
+    """
+    for input_name in inputs:
+        if input_name == "-":
+            if jsonl:
+                yield from iter_jsonl_items(sys.stdin, "<stdin>")
+            else:
+                data = sys.stdin.read()
+                contents = ClipboardContents("", data) if looks_like_html(data) else ClipboardContents(data, "")
+                yield BatchItem("<stdin>", contents=contents)
+            continue
+
+        path = Path(input_name)
+        if path.is_dir():
+            paths = sorted(
+                p for p in path.rglob("*")
+                if p.is_file() and p.suffix.lower() in HTML_SUFFIXES | TEXT_SUFFIXES
+            )
+        else:
+            paths = [path]
+        for file_path in paths:
+            if jsonl:
+                with file_path.open(encoding="utf-8") as stream:
+                    yield from iter_jsonl_items(stream, str(file_path))
+            else:
+                yield BatchItem(str(file_path), path=file_path)
+
+
+def convert_item(item: BatchItem) -> dict:
+    """Convert one document, returning its output record.
+
+    Failures are reported in the record rather than raised, so that one bad
+    document doesn't stop the batch.
+    """
+    if item.error is not None:
+        return {"name": item.name, "error": item.error}
+    try:
+        contents = item.contents if item.contents is not None else contents_from_file(item.path)  # type: ignore
+        amtree = cb_to_amtree(contents)
+    except (OSError, UnicodeDecodeError, ValueError, NotImplementedError) as e:
+        return {"name": item.name, "error": f"{type(e).__name__}: {e}"}
+    rendered = render_contents(amtree, contents)
+    return {"name": item.name, "text": rendered.text, "html": rendered.html, "markdown": rendered.markdown}
+
+
+def make_executor(kind: str, jobs: int) -> Executor:
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=jobs, initializer=warm_up)
+    return ProcessPoolExecutor(max_workers=jobs, initializer=warm_up)
+
+
+def convert_all(
+    items: Iterable[BatchItem],
+    jobs: int = 1,
+    executor: str = "process",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> Iterator[dict]:
+    """Convert documents, yielding output records in input order.
+
+    Args:
+        items: The documents to convert.
+        jobs: How many workers to use. With 1, documents are converted in
+            this process without a pool.
+        executor: "process" or "thread". Conversion is CPU-bound Python, so
+            only processes scale with cores.
+        chunksize: How many documents to send to a process worker at a time.
+            Larger chunks amortize the cost of sending work between processes.
+            At most `2 * jobs` chunks are read ahead of the output.
+    """
+    if jobs <= 1:
+        warm_up()
+        yield from map(convert_item, items)
+        return
+    with make_executor(executor, jobs) as pool:
+        # Executor.map would read every item before yielding anything, so
+        # keep a bounded window of chunks in flight instead.
+        max_pending = 2 * jobs
+        pending: deque[Future] = deque()
+        chunks = iter(functools.partial(_take, iter(items), chunksize), [])
+        for chunk in chunks:
+            pending.append(pool.submit(convert_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def convert_chunk(items: list[BatchItem]) -> list[dict]:
+    return [convert_item(item) for item in items]
+
+
+def _take(items: Iterator[BatchItem], n: int) -> list[BatchItem]:
+    return list(itertools.islice(items, n))
+
+
+def add_convert_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=["-"],
+        help="Files or directories to convert, or - for stdin (the default).",
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help='Read JSON lines with "html", "text", "formats" and "id" fields instead of one document per file.',
+    )
+    parser.add_argument(
+        "-o", "--output", help="File to write the JSON lines to (defaults to stdout)."
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of workers."
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        default="process",
+        help="Run workers as processes (the default) or threads.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=DEFAULT_CHUNKSIZE,
+        help="Documents sent to a worker at a time.",
+    )
+
+
+def run_convert(args: argparse.Namespace) -> int:
+    """Run `slack-copy convert`, returning the exit code."""
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    n_documents = n_failed = 0
+    start = time.perf_counter()
+    try:
+        items = iter_items(args.inputs, jsonl=args.jsonl)
+        for record in convert_all(items, args.jobs, args.executor, args.chunksize):
+            n_documents += 1
+            n_failed += "error" in record
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Converted {n_documents} documents ({n_failed} failed) in {elapsed:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if n_failed else 0
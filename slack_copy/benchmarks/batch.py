@@ -0,0 +1,44 @@
+"""Throughput of `slack-copy convert` over a generated corpus.
+
+Run with `python -m slack_copy.benchmarks.batch [n_documents]`.
+"""
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from slack_copy.batch import convert_all, iter_items
+from slack_copy.examples.basic import BASIC_EXAMPLE
+
+SOURCES = {"gdocs": ".html", "slack": ".html", "obsidian_plain": ".md"}
+CONFIGURATIONS = [
+    (1, "process"),
+    (2, "thread"),
+    (2, "process"),
+    (4, "process"),
+]
+
+
+def write_corpus(directory: Path, n_documents: int) -> None:
+    sources = list(SOURCES.items())
+    for i in range(n_documents):
+        source, suffix = sources[i % len(sources)]
+        (directory / f"{i:06}{suffix}").write_text(BASIC_EXAMPLE[source], encoding="utf-8")
+
+
+def main():
+    n_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with tempfile.TemporaryDirectory() as directory:
+        write_corpus(Path(directory), n_documents)
+        print(f"{n_documents} documents")
+        print(f"{'jobs':>6}{'executor':>10}{'docs/s':>10}")
+        for jobs, executor in CONFIGURATIONS:
+            start = time.perf_counter()
+            for record in convert_all(iter_items([directory]), jobs, executor):
+                assert "error" not in record, record
+            rate = n_documents / (time.perf_counter() - start)
+            print(f"{jobs:>6}{executor:>10}{rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
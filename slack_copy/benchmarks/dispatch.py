@@ -0,0 +1,45 @@
+"""Micro-benchmark of the per-node cost of HTMLParser.parse_tag dispatch.
+
+The bound handlers are swapped for a no-op, so the numbers are the cost of
+finding the handler rather than of building nodes. Unknown tags also include
+the cost of reporting them.
+
+Run with `python -m slack_copy.benchmarks.dispatch`.
+"""
+import contextlib
+import io
+import timeit
+
+from slack_copy.html_parsers import AirtableParser, GDocsParser, HTMLParser, SlackParser
+from slack_copy.html_parsers.backends import ElementTag
+from slack_copy.nodes import EMPTY_CHILDREN, AMLeaf
+
+# Entries from the start and end of the table, and unknown tags.
+TAG_NAMES = ["a", "b", "span", "div", "li", "ul", "meta", "br"]
+
+
+def _no_op(tag, parsed_children):
+    return None
+
+
+def time_dispatch(parser: HTMLParser, tag_name: str, number: int = 200_000) -> float:
+    """Return the mean time in nanoseconds of one parse_tag call."""
+    parser._dispatch = {name: _no_op for name in parser._dispatch}
+    tag = ElementTag(tag_name, {})
+    children = [AMLeaf(children=EMPTY_CHILDREN, text="x", styles=[])]
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = min(
+            timeit.repeat(lambda: parser.parse_tag(tag, children), number=number, repeat=5)
+        )
+    return seconds / number * 1e9
+
+
+def main():
+    print(f"{'parser':<16}" + "".join(f"{name:>8}" for name in TAG_NAMES) + "   (ns per parse_tag)")
+    for parser_class in [HTMLParser, SlackParser, AirtableParser, GDocsParser]:
+        timings = [time_dispatch(parser_class(), tag_name) for tag_name in TAG_NAMES]
+        print(f"{parser_class.__name__:<16}" + "".join(f"{t:>8.0f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Synthetic documents for benchmarks, built from the real samples in `examples`.
+
+Each generator copies the markup of its source's sample (the tags, attributes
+and inline styles each app really emits) and repeats it into a document of a
+given size, list depth and style density, so benchmarks can measure how the
+pipeline scales on realistic input.
+"""
+import random
+import re
+from pathlib import Path
+from typing import Callable
+
+from slack_copy.examples.basic import BASIC_EXAMPLE
+
+AIRTABLE_SAMPLE = (Path(__file__).parent.parent / "examples" / "airtable_html.html").read_text()
+WORDS = re.findall(r"[A-Za-z]+", BASIC_EXAMPLE["obsidian_plain"])
+ITEMS_PER_LIST = 6
+
+Style = str
+Run = tuple[str, Style | None]
+
+
+def _opening_tag(sample: str, pattern: str) -> str:
+    """The first opening tag in the sample matching the pattern."""
+    match = re.search(rf"<{pattern}[^>]*>", sample)
+    if match is None:
+        raise ValueError(f"No tag matching {pattern!r} in sample")
+    return match.group()
+
+
+class _DocumentPlan:
+    """The random choices behind a document, shared by all the generators.
+
+    Args:
+        size: The number of top-level blocks (paragraphs or lists).
+        list_depth: The maximum nesting depth of lists (1 means flat lists).
+        style_density: The probability that a run of text is styled.
+        seed: The random seed, so documents are reproducible.
+    """
+
+    def __init__(self, size: int, list_depth: int, style_density: float, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.size = size
+        self.list_depth = max(1, list_depth)
+        self.style_density = style_density
+
+    def blocks(self):
+        """Yield ("paragraph", runs) and ("list", ordered, [(indent, runs), ...]) blocks."""
+        for i in range(self.size):
+            if i % 2 == 0:
+                yield "paragraph", self.runs()
+            else:
+                yield "list", self.rng.random() < 0.5, self.items()
+
+    def items(self) -> list[tuple[int, list[Run]]]:
+        items = []
+        indent = 0
+        for _ in range(ITEMS_PER_LIST):
+            items.append((indent, self.runs()))
+            indent = self.rng.randint(0, min(indent + 1, self.list_depth - 1))
+        return items
+
+    def runs(self) -> list[Run]:
+        runs = []
+        for _ in range(3):
+            text = " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 4)))
+            style = None
+            if self.rng.random() < self.style_density:
+                style = self.rng.choice(["bold", "italic", "code"])
+            runs.append((text, style))
+        return runs
+
+
+_GDOCS = BASIC_EXAMPLE["gdocs"]
+_GDOCS_PREFIX = _GDOCS[:_GDOCS.index("<p ")]
+_GDOCS_SUFFIX = _GDOCS[_GDOCS.rindex("</p>") + len("</p>"):]
+_GDOCS_P = _opening_tag(_GDOCS, "p ")
+_GDOCS_ITEM_P = _opening_tag(_GDOCS, 'p [^>]*role="presentation"')
+_GDOCS_LI = _opening_tag(_GDOCS, "li ")
+_GDOCS_LIST = _opening_tag(_GDOCS, "ul ")[len("<ul"):]
+_GDOCS_SPAN = _opening_tag(_GDOCS, 'span style="[^"]*font-weight:400;font-style:normal')
+_GDOCS_SPANS = {
+    None: _GDOCS_SPAN,
+    "bold": _GDOCS_SPAN.replace("font-weight:400", "font-weight:700"),
+    "italic": _GDOCS_SPAN.replace("font-style:normal", "font-style:italic"),
+    "code": _GDOCS_SPAN.replace("font-family:Arial,sans-serif", "font-family:'Roboto Mono',monospace"),
+}
+
+
+def _gdocs_runs(runs: list[Run]) -> str:
+    return "".join(f"{_GDOCS_SPANS[style]}{text} </span>" for text, style in runs)
+
+
+def generate_gdocs(size: int, list_depth: int = 3, style_density: float = 0.3, seed: int = 0) -> str:
+    """Google Docs HTML: spans with inline CSS, and nested <ul>/<ol> lists."""
+    parts = [_GDOCS_PREFIX]
+    for block in _DocumentPlan(size, list_depth, style_density, seed).blocks():
+        if block[0] == "paragraph":
+            parts.append(f"{_GDOCS_P}{_gdocs_runs(block[1])}</p>")
+            continue
+        _, ordered, items = block
+        tag = "ol" if ordered else "ul"
+        depth = 0
+        for indent, runs in items:
+            while depth <= indent:
+                parts.append(f"<{tag}{_GDOCS_LIST}")
+                depth += 1
+            while depth > indent + 1:
+                parts.append(f"</{tag}>")
+                depth -= 1
+            parts.append(f"{_GDOCS_LI}{_GDOCS_ITEM_P}{_gdocs_runs(runs)}</p></li>")
+        parts.append(f"</{tag}>" * depth)
+    parts.append(_GDOCS_SUFFIX)
+    return "".join(parts)
+
+
+_SLACK = BASIC_EXAMPLE["slack"]
+_SLACK_SECTION = _opening_tag(_SLACK, 'div class="p-rich_text_section"')
+_SLACK_LISTS = {
+    False: _opening_tag(_SLACK, 'ul [^>]*data-indent="0"'),
+    True: _opening_tag(_SLACK, 'ol [^>]*data-indent="0"'),
+}
+_SLACK_LI = _opening_tag(_SLACK, 'li data-stringify-indent="0"')
+_SLACK_STYLES = {
+    "bold": (_opening_tag(_SLACK, 'b data-stringify-type="bold"'), "</b>"),
+    "italic": (_opening_tag(_SLACK, 'i data-stringify-type="italic"'), "</i>"),
+    "code": (_opening_tag(_SLACK, 'code data-stringify-type="code"'), "</code>"),
+}
+
+
+def _slack_runs(runs: list[Run]) -> str:
+    parts = []
+    for text, style in runs:
+        if style is None:
+            parts.append(text)
+        else:
+            opening, closing = _SLACK_STYLES[style]
+            parts.append(f"{opening}{text}{closing}")
+        parts.append("<span> </span>")
+    return "".join(parts)
+
+
+def generate_slack(size: int, list_depth: int = 3, style_density: float = 0.3, seed: int = 0) -> str:
+    """Slack HTML: flat lists with a data-indent per run of items at the same level."""
+    parts = ["<meta charset='utf-8'>"]
+    for block in _DocumentPlan(size, list_depth, style_density, seed).blocks():
+        if block[0] == "paragraph":
+            parts.append(f"{_SLACK_SECTION}{_slack_runs(block[1])}</div>")
+            continue
+        _, ordered, items = block
+        tag = "ol" if ordered else "ul"
+        current_indent = None
+        for indent, runs in items:
+            if indent != current_indent:
+                if current_indent is not None:
+                    parts.append(f"</{tag}>")
+                parts.append(_SLACK_LISTS[ordered].replace('data-indent="0"', f'data-indent="{indent}"'))
+                current_indent = indent
+            li = _SLACK_LI.replace('data-stringify-indent="0"', f'data-stringify-indent="{indent}"')
+            parts.append(f"{li}{_slack_runs(runs)}</li>")
+        parts.append(f"</{tag}>")
+    return "".join(parts)
+
+
+_AIRTABLE_P = _opening_tag(AIRTABLE_SAMPLE, "p ")
+_AIRTABLE_LIST = _opening_tag(AIRTABLE_SAMPLE, "ol ")[len("<ol"):]
+_AIRTABLE_LI = _opening_tag(AIRTABLE_SAMPLE, "li style")
+_AIRTABLE_STYLES = {
+    "bold": (_opening_tag(AIRTABLE_SAMPLE, "strong "), "</strong>"),
+    "italic": ("<em>", "</em>"),
+    "code": ("<code>", "</code>"),
+}
+
+
+def _airtable_runs(runs: list[Run]) -> str:
+    parts = []
+    for text, style in runs:
+        if style is None:
+            parts.append(f"{text} ")
+        else:
+            opening, closing = _AIRTABLE_STYLES[style]
+            parts.append(f"{opening}{text}{closing} ")
+    return "".join(parts)
+
+
+def generate_airtable(size: int, list_depth: int = 3, style_density: float = 0.3, seed: int = 0) -> str:
+    """Airtable HTML: flat lists whose items carry ql-indent-N classes."""
+    parts = ["<meta charset='utf-8'>"]
+    for block in _DocumentPlan(size, list_depth, style_density, seed).blocks():
+        if block[0] == "paragraph":
+            parts.append(f"{_AIRTABLE_P}{_airtable_runs(block[1])}</p>")
+            continue
+        _, ordered, items = block
+        tag = "ol" if ordered else "ul"
+        parts.append(f"<{tag}{_AIRTABLE_LIST}")
+        for indent, runs in items:
+            li = _AIRTABLE_LI if indent == 0 else _AIRTABLE_LI.replace("<li ", f'<li class="ql-indent-{indent}" ', 1)
+            parts.append(f"{li}{_airtable_runs(runs)}</li>")
+        parts.append(f"</{tag}>")
+    return "".join(parts)
+
+
+_OBSIDIAN_STYLES = {None: "{}", "bold": "**{}**", "italic": "*{}*", "code": "`{}`"}
+
+
+def _obsidian_runs(runs: list[Run]) -> str:
+    # Lines start with a plain word, as markup at the start of a line could
+    # also be read as a list marker or fence.
+    return " ".join([WORDS[0]] + [_OBSIDIAN_STYLES[style].format(text) for text, style in runs])
+
+
+def generate_obsidian_plain(size: int, list_depth: int = 3, style_density: float = 0.3, seed: int = 0) -> str:
+    """Obsidian markdown: tab-indented lists straight after their paragraph."""
+    lines = []
+    for block in _DocumentPlan(size, list_depth, style_density, seed).blocks():
+        if block[0] == "paragraph":
+            if lines:
+                lines.append("")
+            lines.append(_obsidian_runs(block[1]))
+            continue
+        _, ordered, items = block
+        marker = "1." if ordered else "-"
+        for indent, runs in items:
+            lines.append(f"{chr(9) * indent}{marker} {_obsidian_runs(runs)}")
+    return "\n".join(lines)
+
+
+GENERATORS: dict[str, Callable[..., str]] = {
+    "gdocs": generate_gdocs,
+    "slack": generate_slack,
+    "airtable": generate_airtable,
+    "obsidian_plain": generate_obsidian_plain,
+}
@@ -0,0 +1,136 @@
+"""Memory benchmark: bytes retained per AMNode for a large Google Docs paste,
+and peak memory converting a paste with large inline images.
+
+With `--check`, the run fails if any backend's tree keeps more memory than
+the streaming backend's, which never holds a document tree, if a tree keeps
+its BeautifulSoup document alive after parsing, or if converting the images
+takes much more than one copy of them besides the output.
+
+Run with `python -m slack_copy.benchmarks.memory [--check]`.
+"""
+import argparse
+import base64
+import gc
+import random
+import sys
+import tracemalloc
+import weakref
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.html_parsers import GDocsParser
+from slack_copy.normalize import count_nodes
+
+BACKENDS = ["bs4", "lxml", "stream"]
+# How much more a backend's tree may retain than the streaming backend's
+# (e.g. from lists over-allocated differently while building it).
+MAX_RETAINED_RATIO = 1.5
+# Peak memory converting a paste with large inline images, besides the
+# output, relative to the input: the tree holds one copy of the images.
+MAX_PEAK_RATIO = 1.2
+
+
+def measure_tree_memory(html: str, backend: str = "stream") -> tuple[int, int]:
+    """Parse the html and return (bytes retained by the tree, number of nodes)."""
+    # Parse something small first, so lazy imports aren't counted.
+    AbstractMarkdownTree.from_gdocs(BASIC_EXAMPLE["gdocs"], backend=backend)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = AbstractMarkdownTree.from_gdocs(html, backend=backend)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, count_nodes(tree.root)
+
+
+def soup_released(html: str) -> bool:
+    """Whether a BeautifulSoup document is freed once its tree has been parsed."""
+    import bs4
+
+    soup = bs4.BeautifulSoup(html, "lxml")
+    soup_ref = weakref.ref(soup)
+    tree = GDocsParser(backend="bs4").recursive_parse(soup)
+    del soup
+    gc.collect()
+    return tree is not None and soup_ref() is None
+
+
+def image_heavy_html(n_images: int = 4, image_bytes: int = 1_000_000, seed: int = 0) -> str:
+    """The Google Docs example with data-URI images between its paragraphs."""
+    rng = random.Random(seed)
+    html = BASIC_EXAMPLE["gdocs"]
+    for _ in range(n_images):
+        data = base64.b64encode(rng.randbytes(image_bytes)).decode()
+        html = html.replace("<p", f'<p><img src="data:image/png;base64,{data}" alt="chart"></p><P', 1)
+    return html.replace("<P", "<p")
+
+
+def measure_peak_memory(html: str, backend: str = "stream") -> tuple[int, int]:
+    """Parse and render the html, returning the peak bytes allocated on the way and the output's size.
+
+    The input itself was allocated beforehand, so it isn't included.
+    """
+    gc.collect()
+    tracemalloc.start()
+    tree = AbstractMarkdownTree.from_gdocs(html, backend=backend)
+    tree.normalize()
+    rendered = tree.render_formats()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, sys.getsizeof(rendered.html)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--check", action="store_true", help="Exit with 1 if a tree keeps parser state or extra copies alive."
+    )
+    args = parser.parse_args(argv)
+
+    failures = []
+    for copies in [100, 1000]:
+        html = BASIC_EXAMPLE["gdocs"] * copies
+        retained = {}
+        for backend in BACKENDS:
+            retained[backend], n_nodes = measure_tree_memory(html, backend)
+            print(
+                f"gdocs x{copies} ({backend}): {n_nodes} nodes, {retained[backend] / 1e6:.1f} MB retained, "
+                f"{retained[backend] / n_nodes:.0f} bytes per node"
+            )
+        for backend in BACKENDS:
+            if retained[backend] > MAX_RETAINED_RATIO * retained["stream"]:
+                failures.append(
+                    f"gdocs x{copies} ({backend}) retained {retained[backend] / retained['stream']:.1f}x "
+                    f"what the stream backend did"
+                )
+    if not soup_released(BASIC_EXAMPLE["gdocs"]):
+        failures.append("the parsed tree keeps its BeautifulSoup document alive")
+
+    html = image_heavy_html()
+    input_size = sys.getsizeof(html)
+    for backend in BACKENDS:
+        peak, output_size = measure_peak_memory(html, backend)
+        # The output holds the images again, so it's left out of the ratio.
+        working = peak - output_size
+        print(
+            f"gdocs with 4 inline images ({backend}): input {input_size / 1e6:.1f} MB, "
+            f"peak {peak / 1e6:.1f} MB, of which {output_size / 1e6:.1f} MB is the output "
+            f"({working / input_size:.2f}x the input besides it)"
+        )
+        if working > MAX_PEAK_RATIO * input_size:
+            failures.append(
+                f"converting images ({backend}) took {working / input_size:.2f}x the input besides the output"
+            )
+
+    if not args.check:
+        return 0
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if not failures:
+        print("No tree keeps parser state or extra copies alive.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Benchmark of list nesting for long flat Slack and Airtable lists.
+
+Both parsers nest lists with `nest_by_indent`, which is a single pass, so the
+time per item should stay flat as the lists get longer.
+
+Run with `python -m slack_copy.benchmarks.nesting`.
+"""
+import timeit
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+
+SIZES = [1000, 2000, 4000, 8000]
+# Indentation pattern with nesting, jumps and dedents.
+INDENTS = [0, 1, 2, 2, 1, 3, 0]
+
+
+def slack_list_html(n_items: int) -> str:
+    """A flat Slack list of n items, one <ul> per item as Slack copies it."""
+    return "".join(
+        f'<ul data-indent="{INDENTS[i % len(INDENTS)]}"><li>item {i}</li></ul>'
+        for i in range(n_items)
+    )
+
+
+def airtable_list_html(n_items: int) -> str:
+    """A flat Airtable list of n items with ql-indent-N classes."""
+    items = "".join(
+        f'<li class="ql-indent-{INDENTS[i % len(INDENTS)]}">item {i}</li>'
+        for i in range(n_items)
+    )
+    return f"<ul>{items}</ul>"
+
+
+def time_per_item(convert, html: str, n_items: int) -> float:
+    """Return the best time in microseconds per item of converting the html."""
+    seconds = min(timeit.repeat(lambda: convert(html, backend="stream"), number=1, repeat=3))
+    return seconds / n_items * 1e6
+
+
+def main():
+    print(f"{'items':>8}{'slack':>10}{'airtable':>10}   (us per item)")
+    for n_items in SIZES:
+        slack = time_per_item(AbstractMarkdownTree.from_slack, slack_list_html(n_items), n_items)
+        airtable = time_per_item(
+            AbstractMarkdownTree.from_airtable, airtable_list_html(n_items), n_items
+        )
+        print(f"{n_items:>8}{slack:>10.1f}{airtable:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
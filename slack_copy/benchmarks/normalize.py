@@ -0,0 +1,66 @@
+"""Benchmark of the normalization pass on generated documents.
+
+Reports how many nodes `normalize` removes and its effect on render time and
+output size, next to the time the pass itself takes.
+
+Run with `python -m slack_copy.benchmarks.normalize`.
+"""
+import time
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.generators import GENERATORS
+
+SIZE = 400
+CONVERTERS = {
+    "gdocs": AbstractMarkdownTree.from_gdocs,
+    "slack": AbstractMarkdownTree.from_slack,
+    "airtable": AbstractMarkdownTree.from_airtable,
+    "obsidian_plain": lambda text: AbstractMarkdownTree.from_obsidian(text, is_html=False),
+}
+
+
+def best_time(function, *args, repeat: int = 5) -> float:
+    """Return the best wall-clock time in seconds of calling the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def best_normalize_time(convert, text: str, repeat: int = 5) -> float:
+    """Return the best time of normalizing a freshly converted tree."""
+    times = []
+    for _ in range(repeat):
+        tree = convert(text)
+        start = time.perf_counter()
+        tree.normalize()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print(
+        f"{'source':<16}{'nodes':>8}{'after':>8}{'render (ms)':>13}{'after':>8}"
+        f"{'html (kB)':>11}{'after':>8}{'pass (ms)':>11}"
+    )
+    for source, generate in GENERATORS.items():
+        text = generate(SIZE)
+        convert = CONVERTERS[source]
+        tree = convert(text)
+        render_before = best_time(tree.to_html)
+        html_before = tree.to_html()
+        pass_time = best_normalize_time(convert, text)
+        stats = tree.normalize()
+        render_after = best_time(tree.to_html)
+        html_after = tree.to_html()
+        print(
+            f"{source:<16}{stats.nodes_before:>8}{stats.nodes_after:>8}"
+            f"{render_before * 1e3:>13.2f}{render_after * 1e3:>8.2f}"
+            f"{len(html_before) / 1e3:>11.1f}{len(html_after) / 1e3:>8.1f}{pass_time * 1e3:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark of reading Obsidian markdown directly versus through HTML.
+
+Run with `python -m slack_copy.benchmarks.obsidian`.
+"""
+import time
+
+from slack_copy.abstract_markdown import parse_obsidian_markdown
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.obsidian_reader import read_obsidian_markdown
+
+COPIES = [10, 100, 1000]
+
+
+def best_time(function, *args, repeat: int = 3) -> float:
+    """Return the best wall-clock time in seconds of calling the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def read_through_html(text: str):
+    return HTMLParser().parse(parse_obsidian_markdown(text))
+
+
+def main():
+    print(f"{'lines':>8}{'html (ms)':>12}{'direct (ms)':>13}{'speedup':>9}")
+    for copies in COPIES:
+        text = "\n\n".join([BASIC_EXAMPLE["obsidian_plain"]] * copies)
+        assert read_obsidian_markdown(text) is not None, "example should be supported"
+        through_html = best_time(read_through_html, text)
+        direct = best_time(read_obsidian_markdown, text)
+        print(
+            f"{text.count(chr(10)) + 1:>8}{through_html * 1e3:>12.1f}{direct * 1e3:>13.1f}"
+            f"{through_html / direct:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark of parsing large documents serially versus with `ParallelBackend`.
+
+Run with `python -m slack_copy.benchmarks.parallel [jobs]`. The parallel
+backend only pays off with several cores; on fewer, this shows its overhead.
+"""
+import os
+import sys
+import time
+
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.html_parsers import GDocsParser
+from slack_copy.html_parsers.parallel import ParallelBackend
+from slack_copy.html_parsers.slack_parser import SlackParser
+
+SIZES = [400, 1600]
+PARSERS = {"gdocs": GDocsParser, "slack": SlackParser}
+
+
+def best_time(function, *args, repeat: int = 3) -> float:
+    """Return the best wall-clock time in seconds of calling the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    backend = ParallelBackend(jobs)
+    print(f"{jobs} workers on {os.cpu_count()} cores")
+    print(f"{'source':<8}{'MB':>7}{'serial (ms)':>13}{'parallel (ms)':>15}{'speedup':>9}")
+    for source, parser_class in PARSERS.items():
+        parser = parser_class("lxml")
+        for size in SIZES:
+            text = GENERATORS[source](size)
+            # Start the workers before timing.
+            backend.build(parser, GENERATORS[source](4))
+            assert backend.build(parser, text) == parser.backend.build(parser, text)
+            serial = best_time(parser.backend.build, parser, text)
+            parallel = best_time(backend.build, parser, text)
+            print(
+                f"{source:<8}{len(text) / 1e6:>7.1f}{serial * 1e3:>13.0f}"
+                f"{parallel * 1e3:>15.0f}{serial / parallel:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
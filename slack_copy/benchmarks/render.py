@@ -0,0 +1,31 @@
+"""Benchmark of rendering every clipboard format in one pass against one pass each.
+
+For each source, a normalized generated document is rendered to HTML alone
+(`to_html`), to HTML, plain text and markdown with a pass per format, and to
+all three in one fused pass with `render_formats`.
+
+Run with `python -m slack_copy.benchmarks.render`.
+"""
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.benchmarks.normalize import CONVERTERS, SIZE, best_time
+from slack_copy.render import FORMATS, render_formats
+
+
+def render_separately(root) -> None:
+    for name in FORMATS:
+        render_formats(root, [name])
+
+
+def main():
+    print(f"{'source':<16}{'html (ms)':>11}{'separate (ms)':>15}{'fused (ms)':>12}")
+    for source, generate in GENERATORS.items():
+        tree = CONVERTERS[source](generate(SIZE))
+        tree.normalize()
+        html_only = best_time(tree.to_html)
+        separate = best_time(render_separately, tree.root)
+        fused = best_time(render_formats, tree.root)
+        print(f"{source:<16}{html_only * 1e3:>11.2f}{separate * 1e3:>15.2f}{fused * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
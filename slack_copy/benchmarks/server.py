@@ -0,0 +1,128 @@
+"""Requests per second and latency of `slack-copy serve` under concurrent clients.
+
+Starts a server on a temporary socket (or uses a running one with --socket),
+then keeps --clients connections busy with generated documents until
+--requests have been answered, and reports throughput and latency
+percentiles.
+
+Run with `python -m slack_copy.benchmarks.server [--clients 16] [--requests 2000]`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from slack_copy.benchmarks.generators import GENERATORS
+
+# How each generated document is sent: as html or text, and its source hint.
+SOURCES = {"gdocs": "html", "slack": "html", "airtable": "html", "obsidian_plain": "text"}
+
+
+def make_requests(size: int, hint: bool) -> list[bytes]:
+    """One encoded request line per source, with documents of `size` blocks."""
+    lines = []
+    for source, field in SOURCES.items():
+        request = {field: GENERATORS[source](size)}
+        if hint:
+            request["source"] = "obsidian" if source == "obsidian_plain" else source
+        lines.append(json.dumps(request).encode() + b"\n")
+    return lines
+
+
+async def run_client(socket_path: str, lines: list[bytes], next_request, latencies: list[float]) -> int:
+    """Send requests one at a time until there are none left, returning the number of errors."""
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=256 * 1024 * 1024)
+    errors = 0
+    try:
+        while (index := next_request()) is not None:
+            start = time.perf_counter()
+            writer.write(lines[index % len(lines)])
+            await writer.drain()
+            response = await reader.readline()
+            latencies.append(time.perf_counter() - start)
+            # Not decoded, to leave the CPU to the server. Without an "id",
+            # an error response starts with its "error".
+            errors += not response or response.startswith(b'{"error"')
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return errors
+
+
+async def run_load(socket_path: str, lines: list[bytes], n_clients: int, n_requests: int) -> tuple[float, list[float], int]:
+    """Run the clients, returning (elapsed seconds, latencies, errors)."""
+    counter = iter(range(n_requests))
+
+    def next_request() -> int | None:
+        return next(counter, None)
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(
+        *[run_client(socket_path, lines, next_request, latencies) for _ in range(n_clients)]
+    )
+    return time.perf_counter() - start, latencies, sum(errors)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_server(socket_path: str, jobs: int, executor: str) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "slack_copy.main", "serve", "--socket", socket_path, "-j", str(jobs), "--executor", executor],
+    )
+    deadline = time.monotonic() + 60
+    while not os.path.exists(socket_path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("The server didn't start")
+        time.sleep(0.05)
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=None, help="Use a running server instead of starting one.")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests to send in total.")
+    parser.add_argument("--size", type=int, default=20, help="Blocks per generated document.")
+    parser.add_argument("--hint", action="store_true", help="Send each document's source, skipping detection.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Workers for the started server.")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    args = parser.parse_args(argv)
+
+    lines = make_requests(args.size, args.hint)
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        socket_path = args.socket
+        if socket_path is None:
+            socket_path = os.path.join(directory, "server.sock")
+            server = start_server(socket_path, args.jobs, args.executor)
+        try:
+            # Warm up the workers before timing.
+            asyncio.run(run_load(socket_path, lines, args.jobs, 4 * args.jobs))
+            elapsed, latencies, errors = asyncio.run(
+                run_load(socket_path, lines, args.clients, args.requests)
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print(
+        f"{args.requests} requests from {args.clients} clients ({args.size}-block documents): "
+        f"{args.requests / elapsed:.0f} requests/s, "
+        f"p50 {percentile(latencies, 0.5) * 1e3:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1e3:.1f} ms, "
+        f"max {max(latencies) * 1e3:.1f} ms, {errors} errors"
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
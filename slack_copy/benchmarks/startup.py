@@ -0,0 +1,66 @@
+"""Import-time and first-conversion latency, each measured in a fresh interpreter.
+
+Also reports which heavy libraries an import pulls in, so that an eager
+import sneaking back in shows up.
+
+Run with `python -m slack_copy.benchmarks.startup`.
+"""
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["PyQt5", "bs4", "lxml", "markdown"]
+# Sources with a converter; obsidian_plain is plain text rather than html.
+SOURCES = ["gdocs", "slack", "obsidian_plain"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import slack_copy.main
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+_CONVERSION_SCRIPT = """
+import json, time
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.main import ClipboardContents, process_contents
+if {source!r} == "obsidian_plain":
+    contents = ClipboardContents(BASIC_EXAMPLE[{source!r}], "")
+else:
+    contents = ClipboardContents("", BASIC_EXAMPLE[{source!r}])
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    process_contents(contents, cache=None)
+    timings.append(time.perf_counter() - start)
+print(json.dumps({{"first": timings[0], "second": timings[1]}}))
+"""
+
+
+def run_script(script: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def best_of(script: str, repeat: int = 3) -> dict:
+    results = [run_script(script) for _ in range(repeat)]
+    return min(results, key=lambda result: next(iter(result.values())))
+
+
+def main():
+    result = best_of(_IMPORT_SCRIPT.format(heavy=HEAVY_MODULES))
+    heavy = ", ".join(result["heavy"]) or "none"
+    print(f"import slack_copy.main: {result['seconds'] * 1e3:.1f} ms (heavy modules loaded: {heavy})")
+
+    print(f"{'source':<16}{'first (ms)':>12}{'second (ms)':>13}")
+    for source in SOURCES:
+        result = best_of(_CONVERSION_SCRIPT.format(source=source))
+        print(f"{source:<16}{result['first'] * 1e3:>12.1f}{result['second'] * 1e3:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
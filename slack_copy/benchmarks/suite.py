@@ -0,0 +1,207 @@
+"""Stage-by-stage benchmark of the whole pipeline on generated documents.
+
+For each source in `generators.GENERATORS`, documents of growing size are
+timed through detection, parsing, list nesting and rendering separately.
+With `--check`, each stage must also scale at most linearly: the time of a
+stage at 4x the size may only grow by 4x, plus some slack for noise, or the
+run fails.
+
+Run with `python -m slack_copy.benchmarks.suite [--check]`.
+"""
+import argparse
+from contextlib import contextmanager
+import gc
+import math
+import sys
+import time
+from typing import Callable, Iterator
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.detectors import SOURCE_DETECTORS
+from slack_copy.html_parsers import GDocsParser
+from slack_copy.html_parsers.airtable_parser import AirtableParser
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.html_parsers.slack_parser import SlackParser
+from slack_copy.nodes import AMNode
+from slack_copy.telemetry import TELEMETRY
+
+STAGES = ["detect", "parse", "nest", "render"]
+SIZES = [100, 400, 1600]
+# Exponent of time against size above which a stage counts as superlinear.
+# Linear is 1; the slack absorbs timer noise and cache effects.
+MAX_EXPONENT = 1.3
+# Stages faster than this are too noisy to guard (e.g. prefix-only detection).
+MIN_GUARDED_SECONDS = 2e-4
+
+PARSERS: dict[str, type[HTMLParser]] = {
+    "gdocs": GDocsParser,
+    "slack": SlackParser,
+    "airtable": AirtableParser,
+}
+
+
+@contextmanager
+def _timing_nest() -> Iterator[Callable[[], float]]:
+    """Turn on telemetry for the body of a `with` block, to time list nesting.
+
+    Yields:
+        A function returning the seconds spent in the "nest" stage so far
+        within the block.
+    """
+    def nest_total() -> float:
+        stats = TELEMETRY.stages.get("nest")
+        return stats.total if stats is not None else 0.0
+
+    was_enabled = TELEMETRY.enabled
+    TELEMETRY.enabled = True
+    before = nest_total()
+    try:
+        yield lambda: nest_total() - before
+    finally:
+        TELEMETRY.enabled = was_enabled
+
+
+def time_stages(source: str, text: str, backend: str | None = None) -> dict[str, float | None]:
+    """Time each stage of converting the text once.
+
+    Args:
+        backend: The parser backend. Defaults to each parser's default
+            backend, which is passed explicitly so that large documents
+            aren't switched to the parallel backend.
+
+    Returns:
+        Seconds per stage. "nest" is the part of parsing spent nesting lists
+        and is not included in "parse"; it is None for sources whose lists
+        come out nested from parsing. "detect" is None for plain text.
+    """
+    timings: dict[str, float | None] = dict.fromkeys(STAGES)
+    is_html = source != "obsidian_plain"
+    if is_html:
+        start = time.perf_counter()
+        SOURCE_DETECTORS.detect(text)
+        timings["detect"] = time.perf_counter() - start
+
+    parse: Callable[[str], AMNode | None]
+    if is_html:
+        parser_class = PARSERS[source]
+        parse = parser_class(backend or parser_class.default_backend).parse
+    else:
+        # As pasted: read directly where possible, or through HTML.
+        def parse(text: str) -> AMNode | None:
+            return AbstractMarkdownTree.from_obsidian(text, is_html=False, backend=backend).root
+    with _timing_nest() as nest_seconds:
+        start = time.perf_counter()
+        root = parse(text)
+        parse_seconds = time.perf_counter() - start
+        nested = nest_seconds()
+    if root is None:
+        raise ValueError(f"Generated {source} document could not be parsed")
+    if source in ("slack", "airtable"):
+        timings["nest"] = nested
+    timings["parse"] = parse_seconds - nested
+
+    start = time.perf_counter()
+    AbstractMarkdownTree(root).to_html()
+    timings["render"] = time.perf_counter() - start
+    return timings
+
+
+def best_stages(
+    source: str,
+    size: int,
+    repeat: int = 3,
+    list_depth: int = 3,
+    style_density: float = 0.3,
+    backend: str | None = None,
+) -> dict[str, float | None]:
+    """The best time of each stage over several runs on one generated document.
+
+    The garbage collector is off while timing, as in `timeit`: its pauses grow
+    with the number of live objects and would otherwise show up as
+    superlinear time in whichever stage happens to trigger them.
+    """
+    text = GENERATORS[source](size, list_depth=list_depth, style_density=style_density)
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            runs.append(time_stages(source, text, backend))
+        finally:
+            gc.enable()
+    best: dict[str, float | None] = {}
+    for stage in STAGES:
+        values = [run[stage] for run in runs]
+        best[stage] = None if values[0] is None else min(v for v in values if v is not None)
+    return best
+
+
+def scaling_exponent(small: float, large: float, ratio: float) -> float:
+    """The exponent k such that time grows like size**k between two sizes."""
+    return math.log(large / small) / math.log(ratio)
+
+
+def check_scaling(
+    results: dict[int, dict[str, float | None]], sizes: list[int], max_exponent: float = MAX_EXPONENT
+) -> list[str]:
+    """Return a message for each stage that scales worse than linearly.
+
+    Args:
+        max_exponent: The largest exponent of time against size allowed.
+    """
+    failures = []
+    for small, large in zip(sizes, sizes[1:]):
+        for stage in STAGES:
+            small_time, large_time = results[small][stage], results[large][stage]
+            if small_time is None or large_time is None or large_time < MIN_GUARDED_SECONDS:
+                continue
+            exponent = scaling_exponent(max(small_time, 1e-9), large_time, large / small)
+            if exponent > max_exponent:
+                failures.append(
+                    f"{stage} grew as size^{exponent:.2f} from {small} to {large} blocks"
+                )
+    return failures
+
+
+def _format_ms(seconds: float | None) -> str:
+    return "-" if seconds is None else f"{seconds * 1e3:.2f}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="Document sizes in blocks.")
+    parser.add_argument("--depth", type=int, default=3, help="Maximum list depth.")
+    parser.add_argument("--density", type=float, default=0.3, help="Fraction of styled text runs.")
+    parser.add_argument("--backend", choices=["bs4", "lxml", "stream"], default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--check", action="store_true", help="Exit with 1 if any stage scales worse than linearly."
+    )
+    args = parser.parse_args(argv)
+    sizes = sorted(args.sizes)
+
+    print(f"{'source':<16}{'blocks':>8}" + "".join(f"{stage + ' (ms)':>14}" for stage in STAGES))
+    all_failures = []
+    for source in args.sources:
+        results = {
+            size: best_stages(source, size, args.repeat, args.depth, args.density, args.backend)
+            for size in sizes
+        }
+        for size in sizes:
+            row = "".join(f"{_format_ms(results[size][stage]):>14}" for stage in STAGES)
+            print(f"{source:<16}{size:>8}{row}")
+        all_failures += [f"{source}: {failure}" for failure in check_scaling(results, sizes)]
+
+    if not args.check:
+        return 0
+    for failure in all_failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if not all_failures:
+        print("All stages scale linearly.")
+    return 1 if all_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
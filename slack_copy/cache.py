@@ -0,0 +1,122 @@
+"""Content-addressed cache of clipboard conversions."""
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+from typing import TYPE_CHECKING, Hashable
+
+if TYPE_CHECKING:
+    from slack_copy.main import ClipboardContents
+
+DEFAULT_CACHE_SIZE = 64
+
+
+def contents_digest(source: str, payload: str) -> bytes:
+    """Digest identifying a payload from a given source."""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(source.encode())
+    hasher.update(b"\0")
+    hasher.update(payload.encode("utf-8", "surrogatepass"))
+    return hasher.digest()
+
+
+def output_digest(contents: "ClipboardContents") -> bytes:
+    """Digest identifying contents that we wrote to the clipboard."""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(contents.text.encode("utf-8", "surrogatepass"))
+    hasher.update(b"\0")
+    hasher.update(contents.html.encode("utf-8", "surrogatepass"))
+    return hasher.digest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    own_outputs: int = 0
+
+
+class ConversionCache:
+    """Bounded LRU cache from input digests to converted ClipboardContents.
+
+    The cache also remembers the digests of everything it returned, so that
+    when our own output shows up on the clipboard it is recognized immediately
+    instead of looking like a new paste.
+
+    Args:
+        maxsize: The maximum number of conversions (and outputs) to remember.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._conversions: OrderedDict[bytes, "ClipboardContents"] = OrderedDict()
+        self._outputs: OrderedDict[bytes, None] = OrderedDict()
+
+    def get(self, key: bytes) -> "ClipboardContents | None":
+        converted = self._conversions.get(key)
+        if converted is None:
+            self.stats.misses += 1
+            return None
+        self._conversions.move_to_end(key)
+        self.stats.hits += 1
+        return converted
+
+    def put(self, key: bytes, converted: "ClipboardContents") -> None:
+        self._conversions[key] = converted
+        self._conversions.move_to_end(key)
+        if len(self._conversions) > self.maxsize:
+            self._conversions.popitem(last=False)
+        self.remember_output(converted)
+
+    def remember_output(self, contents: "ClipboardContents") -> None:
+        digest = output_digest(contents)
+        self._outputs[digest] = None
+        self._outputs.move_to_end(digest)
+        if len(self._outputs) > self.maxsize:
+            self._outputs.popitem(last=False)
+
+    def is_own_output(self, contents: "ClipboardContents") -> bool:
+        """Whether the contents are something we produced ourselves."""
+        if output_digest(contents) in self._outputs:
+            self.stats.own_outputs += 1
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._conversions.clear()
+        self._outputs.clear()
+        self.stats = CacheStats()
+
+
+class RejectionCache:
+    """Bounded LRU set of clipboard fingerprints whose contents were left alone.
+
+    Converting is deterministic, so contents that were left alone once (an
+    unknown source, a failed parse, our own output) will be again. Keying on
+    the fingerprint lets the watcher skip them before reading the contents.
+
+    Args:
+        maxsize: The maximum number of fingerprints to remember.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self._fingerprints: OrderedDict[Hashable, None] = OrderedDict()
+
+    def add(self, fingerprint: Hashable) -> None:
+        self._fingerprints[fingerprint] = None
+        self._fingerprints.move_to_end(fingerprint)
+        if len(self._fingerprints) > self.maxsize:
+            self._fingerprints.popitem(last=False)
+
+    def __contains__(self, fingerprint: Hashable) -> bool:
+        if fingerprint in self._fingerprints:
+            self._fingerprints.move_to_end(fingerprint)
+            self.hits += 1
+            return True
+        return False
+
+    def clear(self) -> None:
+        self._fingerprints.clear()
+        self.hits = 0
@@ -0,0 +1,142 @@
+"""Client for the conversion server (`slack-copy serve`).
+
+Only imports the standard library (and the list of formats), so that scripts
+and editor plugins calling it start quickly; the parsing libraries stay warm
+in the server. From the shell:
+
+    python -m slack_copy.client page.html --to markdown
+    pbpaste | python -m slack_copy.client --source obsidian --to html
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+from typing import IO, Iterable, Sequence
+
+from slack_copy.render import FORMATS
+
+
+def default_socket_path() -> str:
+    """Where the server listens by default: in the user's runtime directory if there is one."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "slack-copy.sock")
+    return os.path.join(tempfile.gettempdir(), f"slack-copy-{os.getuid()}.sock")
+
+
+class ConversionError(Exception):
+    """The server couldn't convert a document."""
+
+
+class ConversionClient:
+    """A connection to the conversion server.
+
+    Requests on one connection are answered in order, one at a time; open a
+    client per thread to convert several documents at once.
+
+    Args:
+        socket_path: The server's socket. Defaults to `default_socket_path()`.
+        timeout: Seconds to wait for the server, or None to wait forever.
+    """
+
+    def __init__(self, socket_path: str | None = None, timeout: float | None = None) -> None:
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._socket: socket.socket | None = None
+        self._responses: IO[bytes] | None = None
+
+    def connect(self) -> None:
+        if self._socket is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+        self._responses = sock.makefile("rb")
+
+    def close(self) -> None:
+        if self._responses is not None:
+            self._responses.close()
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = self._responses = None
+
+    def __enter__(self) -> "ConversionClient":
+        self.connect()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def request(self, request: dict) -> dict:
+        """Send one request and return the server's response, errors included."""
+        self.connect()
+        self._socket.sendall(json.dumps(request, ensure_ascii=False).encode() + b"\n")  # type: ignore
+        line = self._responses.readline()  # type: ignore
+        if not line:
+            self.close()
+            raise ConnectionError("The conversion server closed the connection")
+        return json.loads(line)
+
+    def convert(
+        self,
+        html: str = "",
+        text: str = "",
+        source: str | None = None,
+        to: Iterable[str] = FORMATS,
+    ) -> dict[str, str]:
+        """Convert a document, returning it in each of the `to` formats.
+
+        Args:
+            html: The document as HTML, if it has any.
+            text: The document as plain text (e.g. Obsidian markdown).
+            source: The app the document came from ("gdocs", "slack",
+                "airtable" or "obsidian"), or None to detect it.
+            to: Which of "html", "text" and "markdown" to return.
+
+        Raises:
+            ConversionError: If the server couldn't convert the document.
+        """
+        request: dict = {"html": html, "text": text, "to": list(to)}
+        if source is not None:
+            request["source"] = source
+        response = self.request(request)
+        if "error" in response:
+            raise ConversionError(response["error"])
+        return response
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a document with a running `slack-copy serve`.")
+    parser.add_argument("input", nargs="?", default="-", help="The file to convert, or - for stdin (the default).")
+    parser.add_argument("--socket", default=None, help="The server's socket.")
+    parser.add_argument("--source", default=None, help="Where the document came from, instead of detecting it.")
+    parser.add_argument("--to", choices=FORMATS, default="html", help="The format to print.")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        data = sys.stdin.read()
+    else:
+        with open(args.input, encoding="utf-8") as stream:
+            data = stream.read()
+    is_html = data.lstrip().startswith("<")
+    try:
+        with ConversionClient(args.socket) as client:
+            converted = client.convert(
+                html=data if is_html else "", text="" if is_html else data, source=args.source, to=[args.to]
+            )
+    except (OSError, ConversionError) as e:
+        print(f"slack-copy: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.write(converted[args.to])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""Registry of rules for working out which app some clipboard HTML came from.
+
+Each source registers cheap checks, which are tried in cost order across all
+sources at once:
+
+1. "mime": the clipboard offers a format only that app uses (e.g. Slack's
+   `slack/texty`). This doesn't look at the HTML at all.
+2. "prefix": a marker string appears in the first `prefix_size` characters of
+   the HTML. Every source we know puts its marker in the first few tags.
+3. "full": a marker appears anywhere in the rest of the HTML.
+
+All markers are compiled into a single regex, so each text stage is one pass
+over its window however many sources are registered.
+
+Plain text has no markers, so `looks_like_markdown` instead decides whether
+it's worth converting as Obsidian markdown at all.
+"""
+from dataclasses import dataclass
+import re
+from typing import Iterable, Literal, Sequence
+
+RuleKind = Literal["mime", "prefix", "full"]
+
+DEFAULT_PREFIX_SIZE = 16 * 1024
+# How much of some plain text `looks_like_markdown` scans.
+DEFAULT_MARKDOWN_SCAN_SIZE = 16 * 1024
+
+# Markdown constructs that rarely turn up in other plain text (logs, code,
+# URLs), as one alternation so that classifying is a single scan.
+_LINE_START_CONSTRUCTS = [
+    # List items: "- item", "* item", "+ item", "1. item", "1) item".
+    r"[ \t]*(?:[-*+]|\d{1,9}[.)])[ \t]+\S",
+    # ATX headings.
+    r"#{1,6}[ \t]+\S",
+    # Code fences.
+    r"```",
+]
+_INLINE_CONSTRUCTS = [
+    # Bold, italic and strikethrough, hugging their text.
+    r"\*\*[^\s*](?:[^*\n]*[^\s*])?\*\*",
+    r"(?<![\w*])\*[^\s*](?:[^*\n]*[^\s*])?\*(?![\w*])",
+    r"(?<!\w)__?[^\s_](?:[^_\n]*[^\s_])?__?(?!\w)",
+    r"~~[^\s~](?:[^~\n]*[^\s~])?~~",
+    # Inline code.
+    r"`[^`\n]+`",
+    # Links, and Obsidian's wikilinks.
+    r"\[[^\]\n]+\]\([^)\s]+\)",
+    r"\[\[[^\]\n]+\]\]",
+]
+# The lookahead skips the inline constructs at positions that can't start
+# one, which is most of them, making the scan several times faster.
+MARKDOWN_CONSTRUCTS = re.compile(
+    f"^(?:{'|'.join(_LINE_START_CONSTRUCTS)})"
+    f"|(?=[*_~`\\[])(?:{'|'.join(_INLINE_CONSTRUCTS)})",
+    re.MULTILINE,
+)
+
+
+@dataclass(frozen=True)
+class DetectionRule:
+    """A single check that identifies a source.
+
+    Attributes:
+        source: The source this rule identifies, e.g. "slack".
+        kind: Which stage matched ("mime", "prefix" or "full").
+        pattern: The MIME format or marker string that matched.
+    """
+    source: str
+    kind: RuleKind
+    pattern: str
+
+
+@dataclass(frozen=True)
+class Detection:
+    """The result of detecting a source: the source and the rule that matched."""
+    source: str
+    rule: DetectionRule
+
+
+class SourceDetectorRegistry:
+    """Detects the source of clipboard HTML using registered rules.
+
+    Sources registered earlier take priority when several match in the same
+    stage. In the "full" stage the first marker found wins, so that the scan
+    can stop as soon as anything matches.
+
+    Args:
+        prefix_size: How many characters the "prefix" stage looks at.
+    """
+
+    def __init__(self, prefix_size: int = DEFAULT_PREFIX_SIZE) -> None:
+        self.prefix_size = prefix_size
+        self._priorities: dict[str, int] = {}
+        self._mime_rules: dict[str, str] = {}
+        self._markers: dict[str, str] = {}
+        self._marker_pattern: re.Pattern | None = None
+        self._longest_marker = 0
+
+    def register(
+        self,
+        source: str,
+        mime_formats: Iterable[str] = (),
+        markers: Iterable[str] = (),
+    ) -> None:
+        """Register the checks that identify a source.
+
+        Args:
+            source: The name of the source.
+            mime_formats: Clipboard formats that only this source offers.
+            markers: Strings that only appear in this source's HTML.
+        """
+        self._priorities.setdefault(source, len(self._priorities))
+        for mime_format in mime_formats:
+            self._mime_rules[mime_format] = source
+        for marker in markers:
+            self._markers[marker] = source
+        self._marker_pattern = None
+
+    @property
+    def sources(self) -> list[str]:
+        return list(self._priorities)
+
+    def detect(self, html: str, formats: Sequence[str] = ()) -> Detection | None:
+        """Work out which source some HTML came from.
+
+        Args:
+            html: The clipboard HTML.
+            formats: The MIME formats offered alongside it, if known.
+
+        Returns:
+            The detected source and the rule that matched, or None if no rule
+            matched.
+        """
+        best: DetectionRule | None = None
+        for mime_format in formats:
+            source = self._mime_rules.get(mime_format)
+            if source is not None:
+                rule = DetectionRule(source, "mime", mime_format)
+                best = self._prefer(best, rule)
+        if best is not None:
+            return Detection(best.source, best)
+
+        pattern = self._get_marker_pattern()
+        if pattern is None:
+            return None
+        for match in pattern.finditer(html, 0, self.prefix_size):
+            rule = DetectionRule(self._markers[match.group()], "prefix", match.group())
+            best = self._prefer(best, rule)
+        if best is not None:
+            return Detection(best.source, best)
+
+        # Back up so that a marker straddling the prefix boundary is found.
+        start = max(0, self.prefix_size - self._longest_marker + 1)
+        if start >= len(html):
+            return None
+        match = pattern.search(html, start)
+        if match is None:
+            return None
+        rule = DetectionRule(self._markers[match.group()], "full", match.group())
+        return Detection(rule.source, rule)
+
+    def _prefer(self, current: DetectionRule | None, new: DetectionRule) -> DetectionRule:
+        if current is None:
+            return new
+        if self._priorities[new.source] < self._priorities[current.source]:
+            return new
+        return current
+
+    def _get_marker_pattern(self) -> re.Pattern | None:
+        if self._marker_pattern is None and self._markers:
+            # Longest first, so a marker that contains another still wins.
+            markers = sorted(self._markers, key=len, reverse=True)
+            self._marker_pattern = re.compile("|".join(re.escape(m) for m in markers))
+            self._longest_marker = len(markers[0])
+        return self._marker_pattern
+
+
+def looks_like_markdown(text: str, scan_size: int = DEFAULT_MARKDOWN_SCAN_SIZE) -> bool:
+    """Whether plain text looks like markdown worth converting.
+
+    Looks for any of `MARKDOWN_CONSTRUCTS` in the first `scan_size`
+    characters, so the cost is bounded however big the text is. Markdown
+    that only uses constructs after that is treated as plain text.
+    """
+    return MARKDOWN_CONSTRUCTS.search(text, 0, scan_size) is not None
+
+
+SOURCE_DETECTORS = SourceDetectorRegistry()
+SOURCE_DETECTORS.register(
+    "gdocs",
+    mime_formats=["application/x-vnd.google-docs-document-slice-clip+wrapped"],
+    markers=["docs-internal"],
+)
+SOURCE_DETECTORS.register("slack", mime_formats=["slack/texty"], markers=["Slack-Lato"])
+SOURCE_DETECTORS.register("airtable", markers=["Roboto, Oxygen-Sans, Ubuntu, Cantarell"])
+# I think this font is only used in Obsidian
+SOURCE_DETECTORS.register("obsidian", markers=["Microsoft YaHei Light"])
@@ -0,0 +1,70 @@
+"""Cheap change detection for clipboard contents.
+
+Reading `clipboard.text()` and `mimeData().html()` copies the whole payload
+into Python strings, which is expensive for multi-megabyte pastes. A
+fingerprint instead looks at the cheapest signals first (the list of MIME
+formats and the payload sizes) and then hashes the raw `QByteArray`s inside
+Qt, so nothing is copied into Python unless the contents actually changed.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PyQt5.QtCore import QByteArray, QMimeData
+
+# The formats whose payloads we hash; other formats only contribute their name.
+FINGERPRINT_FORMATS = ("text/plain", "text/html")
+# Bytes hashed from each of the start, middle and end of a large payload.
+DEFAULT_SAMPLE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class ClipboardFingerprint:
+    """Summary of clipboard contents that is cheap to compute and compare.
+
+    Attributes:
+        formats: The MIME formats offered by the clipboard owner.
+        sizes: The byte size of each of the `FINGERPRINT_FORMATS` payloads
+            (-1 if the format is missing).
+        digest: A hash of the payloads (sampled or full, see
+            `fingerprint_mime_data`).
+    """
+    formats: tuple[str, ...]
+    sizes: tuple[int, ...]
+    digest: bytes
+
+
+def fingerprint_mime_data(
+    mime_data: "QMimeData", sample_size: int | None = DEFAULT_SAMPLE_SIZE
+) -> ClipboardFingerprint:
+    """Fingerprint clipboard MIME data without copying it into Python.
+
+    Args:
+        mime_data: The clipboard's mime data.
+        sample_size: If given, payloads larger than three samples are hashed
+            by sampling their start, middle and end; combined with the sizes
+            this catches practically every real change for a fixed cost. If
+            None, the full payloads are hashed (still inside Qt).
+
+    Returns:
+        The fingerprint of the mime data.
+    """
+    from PyQt5.QtCore import QCryptographicHash
+
+    formats = tuple(mime_data.formats())
+    sizes = []
+    hasher = QCryptographicHash(QCryptographicHash.Md5)
+    for mime_format in FINGERPRINT_FORMATS:
+        if mime_format not in formats:
+            sizes.append(-1)
+            continue
+        payload: "QByteArray" = mime_data.data(mime_format)
+        size = payload.size()
+        sizes.append(size)
+        if sample_size is None or size <= 3 * sample_size:
+            hasher.addData(payload)
+        else:
+            hasher.addData(payload.left(sample_size))
+            hasher.addData(payload.mid((size - sample_size) // 2, sample_size))
+            hasher.addData(payload.right(sample_size))
+    return ClipboardFingerprint(formats, tuple(sizes), bytes(hasher.result()))
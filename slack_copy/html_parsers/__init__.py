@@ -1,9 +1,11 @@
 from .html_parser import HTMLParser
 from .airtable_parser import AirtableParser
+from .gdocs_parser import GDocsParser
 from .slack_parser import SlackParser
 
 __all__ = [
     "HTMLParser",
     "AirtableParser",
+    "GDocsParser",
     "SlackParser",
 ]
\ No newline at end of file
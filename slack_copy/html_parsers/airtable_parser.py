@@ -1,11 +1,10 @@
 
-from collections import deque
-from typing import cast
+from typing import Iterator
 from typing_extensions import override
 
-from bs4.element import Tag
-
+from slack_copy.html_parsers.backends import TagLike
 from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.html_parsers.nesting import nest_by_indent
 from slack_copy.nodes import AMList, AMListElement, AMNode
 
 
@@ -18,7 +17,7 @@ class AirtableParser(HTMLParser):
         return AMListElement(children=parsed_children, ql_indent=ql_indent)
 
     @override
-    def parse_parent_list_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMList:
+    def parse_parent_list_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMList:
         parent = super().parse_parent_list_tag(tag, parsed_children)
         # Modifies the parent in-place
         parent = maybe_parse_airtable_list(parent)
@@ -28,54 +27,34 @@ class AirtableParser(HTMLParser):
 def maybe_parse_airtable_list(parent: AMList) -> AMList:
     """Parse Airtable lists into nested lists if necessary.
 
-    Modifies the parent in-place. 
+    Airtable copies a nested list as one flat list whose items have
+    ql-indent-N classes. Modifies the parent in-place.
 
     Args:
-        children: The children to parse.
+        parent: The list to parse. Children other than AMListElements (e.g.
+            whitespace) stay at the level of the item before them.
+
+    Returns:
+        The parent, with its items nested.
     """
     children = parent.children
-    assert all(isinstance(c, AMListElement) for c in children)
-    children = cast(list[AMListElement], children)
-    if len(children) <= 1:
-        # TODO(ian): Fix type hinting here.
-        parent.children = children  # type: ignore
+    if not any(isinstance(c, AMListElement) and c.ql_indent > 0 for c in children):
         return parent
-    # TODO(ian): Separate out the logic for parsing Airtable lists.
-    if not any(c.ql_indent > 0 for c in children):
-        # TODO(ian): Fix type hinting here.
-        parent.children = children  # type: ignore
-        return parent
-    
-    current_list = parent
-    stack = deque([current_list])
-    previous_indent = 0
-
-    for child in children:
-        indent = child.ql_indent
-        if indent == previous_indent:
-            current_list.children.append(child)
 
-        elif indent > previous_indent:
-            assert indent == previous_indent + 1
-            new_list = AMList(children=[child], ordered=parent.ordered, data_indent=parent.data_indent)
-            current_list.children.append(new_list)
-            stack.append(new_list)
-            current_list = new_list
-            previous_indent = indent
+    def items() -> Iterator[tuple[int, AMList]]:
+        yield 0, parent
+        indent = 0
+        for child in children:
+            if isinstance(child, AMListElement):
+                indent = child.ql_indent
+            yield indent, AMList(children=[child], ordered=parent.ordered, data_indent=parent.data_indent)
 
-        # indent < previous_indent
-        else:
-            # Pop until we reach the right level of indentation
-            for _ in range(previous_indent - indent):
-                _ = stack.pop()
-            current_list = stack[-1]
-            current_list.children.append(child)
-            previous_indent = indent
-        
+    parent.children = []
+    nest_by_indent(items())
     return parent
 
 
-def get_airtable_ql_indent(tag: Tag) -> int:
+def get_airtable_ql_indent(tag: TagLike) -> int:
     """Get the ql-indent attribute from a tag, or 0 if it doesn't exist.
 
     Args:
@@ -0,0 +1,461 @@
+"""Backends that turn HTML text into AMNodes for an HTMLParser.
+
+The parser's `parse_*_tag` hooks only need a tag's `name`, `attrs` and `text`,
+so a backend can feed them from anything that provides those (see `TagLike`):
+
+- "bs4" builds a full BeautifulSoup tree and walks it (the original behavior).
+- "lxml" walks `lxml` elements directly, skipping BeautifulSoup's tree.
+- "stream" consumes lxml's start/end/data parser events and builds AMNodes in
+  one pass, without building any intermediate DOM.
+
+BeautifulSoup's "lxml" builder sits on top of the same lxml parser events, so
+all three backends produce identical trees. The lxml backends copy the few
+bits of BeautifulSoup's post-processing that affect the tree: whitespace-only
+strings collapse to a single space or newline (except inside `<pre>` and
+`<textarea>`), multi-valued attributes such as `class` become lists, and
+comments, processing instructions and doctypes are kept as strings.
+"""
+from abc import ABC, abstractmethod
+import functools
+import re
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Protocol
+
+from slack_copy.nodes import AMNode
+from slack_copy.telemetry import TELEMETRY
+
+if TYPE_CHECKING:
+    from slack_copy.html_parsers.html_parser import HTMLParser
+
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+# Attributes that BeautifulSoup splits into lists of values.
+MULTI_VALUED_ATTRIBUTES: dict[str, set[str]] = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+DOCUMENT_TAG_NAME = "[document]"
+# libxml2 adds a default doctype to every HTML document, so check the source
+# for one (after any leading whitespace, comments or processing instructions).
+DOCTYPE_PATTERN = re.compile(r"\s*(?:(?:<!--.*?-->|<\?.*?>)\s*)*<!doctype", re.IGNORECASE | re.DOTALL)
+
+
+class TagLike(Protocol):
+    """What the parser's tag hooks need from a tag."""
+    name: str
+    attrs: dict[str, Any]
+
+    @property
+    def text(self) -> str:
+        ...
+
+
+class ParserBackend(ABC):
+    """Turns HTML text into an AMNode tree using a parser's hooks."""
+    name: str
+
+    @abstractmethod
+    def build(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        """Parse the text, returning the root node or None if it is empty."""
+        pass
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """Build a BeautifulSoup tree and walk it with `HTMLParser.recursive_parse`."""
+    name = "bs4"
+
+    def build(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        import bs4
+        root_tag = bs4.BeautifulSoup(text, "lxml")
+        return parser.recursive_parse(root_tag)
+
+
+def walk_soup(parser: "HTMLParser", root: Any) -> AMNode | None:
+    """Build AMNodes from a BeautifulSoup tag, bottom-up, with an explicit stack.
+
+    Each frame holds a tag, an iterator over its children and the children
+    parsed so far, so arbitrarily deep documents use constant Python stack.
+    """
+    from bs4.element import NavigableString, Tag
+
+    parse_string = parser.parse_navigable_string
+    stack: list[tuple[Any, Iterator[Any], list[AMNode]]] = [(root, iter(root.contents), [])]
+    while True:
+        tag, children, parsed_children = stack[-1]
+        for child in children:
+            if isinstance(child, NavigableString):
+                node = parse_string(child)
+                if node is not None:
+                    parsed_children.append(node)
+            elif isinstance(child, Tag):
+                stack.append((child, iter(child.contents), []))
+                break
+            else:
+                TELEMETRY.count_unparsed(f"#{type(child).__name__}")
+        else:
+            stack.pop()
+            node = _finish_tag(parser, tag, parsed_children)
+            if not stack:
+                return node
+            if node is not None:
+                stack[-1][2].append(node)
+
+
+def _finish_tag(parser: "HTMLParser", tag: TagLike, parsed_children: list[AMNode]) -> AMNode | None:
+    parsed_children = parser.postprocess_children(parsed_children)
+    if len(parsed_children) == 0 and tag.name not in parser.empty_tags:
+        # Empty tags are dropped without dispatch, but still count unknown ones.
+        if tag.name not in parser.tag_handlers:
+            TELEMETRY.count_unparsed(tag.name)
+        return None
+    return parser.parse_tag(tag, parsed_children)
+
+
+class ElementTag:
+    """A TagLike view of an lxml element."""
+    __slots__ = ("name", "attrs", "_element")
+
+    def __init__(self, name: str, attrs: dict[str, Any], element: Any = None) -> None:
+        self.name = name
+        self.attrs = attrs
+        self._element = element
+
+    @property
+    def text(self) -> str:
+        if self._element is None:
+            return ""
+        return "".join(
+            collapse_whitespace(s, False) for s in self._element.itertext(with_tail=False)
+        )
+
+
+@functools.cache
+def _doctype_tree_builder_class() -> type:
+    """TreeBuilder that also remembers the doctype (defined on first use, so
+    that lxml is only imported when it's needed)."""
+    from lxml import etree
+
+    class DoctypeTreeBuilder(etree.TreeBuilder):
+        doctype_args: tuple[str | None, str | None, str | None] | None = None
+
+        def doctype(self, name, pubid, system):
+            self.doctype_args = (name, pubid, system)
+
+    return DoctypeTreeBuilder
+
+
+class LxmlTreeBackend(ParserBackend):
+    """Parse with lxml and walk its elements directly, with an explicit stack."""
+    name = "lxml"
+
+    # libxml2 silently drops elements nested deeper than this when it builds
+    # the tree itself (but not when it reports parser events).
+    MAX_NATIVE_DEPTH = 2048
+
+    def build(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        top_level = self.parse_top_level(text)
+        if top_level is None:
+            return None
+        node, max_depth = self._walk(parser, top_level)
+        if max_depth < self.MAX_NATIVE_DEPTH:
+            return node
+        return self.build_from_events(parser, text)
+
+    def parse_top_level(self, text: str) -> list[Any] | None:
+        """Parse the text with lxml, returning the document's top-level contents.
+
+        These are the root element with any comments around it, preceded by
+        the doctype string if there is one; None if there is nothing to parse.
+        """
+        from lxml import etree
+
+        lxml_parser = etree.HTMLParser(recover=True, huge_tree=True)
+        try:
+            lxml_parser.feed(text)
+            root = lxml_parser.close()
+        except etree.XMLSyntaxError:
+            return None
+        if root is None:
+            return None
+
+        top_level: list[Any] = []
+        docinfo = root.getroottree().docinfo
+        if docinfo.doctype and DOCTYPE_PATTERN.match(text):
+            top_level.append(doctype_string(docinfo.root_name, docinfo.public_id, docinfo.system_url))
+        top_level.extend(reversed(list(root.itersiblings(preceding=True))))
+        top_level.append(root)
+        top_level.extend(root.itersiblings())
+        return top_level
+
+    def build_from_events(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        """Build the tree from parser events, for documents too deep for lxml's tree."""
+        from lxml import etree
+
+        # The tree may have been truncated, so build it again from parser
+        # events. This is slower, so we only do it for pathological input.
+        tree_builder = _doctype_tree_builder_class()(insert_comments=True, insert_pis=True)
+        lxml_parser = etree.HTMLParser(target=tree_builder, recover=True, huge_tree=True)
+        lxml_parser.feed(text)
+        root = lxml_parser.close()
+        top_level = [root]
+        if tree_builder.doctype_args is not None:
+            top_level.insert(0, doctype_string(*tree_builder.doctype_args))
+        node, _ = self._walk(parser, top_level)
+        return node
+
+    def _walk(
+        self,
+        parser: "HTMLParser",
+        top_level: list[Any],
+        substitutions: dict[Any, AMNode | None] | None = None,
+    ) -> tuple[AMNode | None, int]:
+        """Build AMNodes bottom-up, returning the root and the deepest stack size."""
+        parsed_children, max_depth = self.walk_contents(parser, top_level, substitutions=substitutions)
+        return _finish_tag(parser, ElementTag(DOCUMENT_TAG_NAME, {}), parsed_children), max_depth
+
+    def walk_contents(
+        self,
+        parser: "HTMLParser",
+        contents: Iterable[Any],
+        preserve: bool = False,
+        substitutions: dict[Any, AMNode | None] | None = None,
+    ) -> tuple[list[AMNode], int]:
+        """Build the AMNodes for a run of lxml contents (strings and elements).
+
+        Args:
+            parser: The parser whose hooks build the nodes.
+            contents: Strings, elements, comments and processing instructions.
+            preserve: Whether the contents are inside a whitespace-preserving tag.
+            substitutions: Nodes already built for some elements (None if an
+                element builds no node), used instead of walking them.
+
+        Returns:
+            The parsed nodes, and the deepest stack size reached, counting
+            the contents' parent as 1.
+        """
+        from lxml import etree
+
+        parse_string = parser.parse_navigable_string
+        top_children: list[AMNode] = []
+        # Frames are (tag, contents iterator, parsed children, preserve whitespace).
+        stack: list[tuple[ElementTag | None, Iterator[Any], list[AMNode], bool]] = [
+            (None, iter(contents), top_children, preserve)
+        ]
+        max_depth = 1
+        while True:
+            tag, contents, parsed_children, preserve = stack[-1]
+            for item in contents:
+                if isinstance(item, str):
+                    node = parse_string(collapse_whitespace(item, preserve))
+                    if node is not None:
+                        parsed_children.append(node)
+                    continue
+                name = item.tag
+                if name is etree.Comment or name is etree.PI:
+                    text = item.text or "" if name is etree.Comment else f"{item.target} {item.text or ''}"
+                    node = parse_string(collapse_whitespace(text, preserve))
+                    if node is not None:
+                        parsed_children.append(node)
+                elif substitutions and item in substitutions:
+                    node = substitutions[item]
+                    if node is not None:
+                        parsed_children.append(node)
+                elif isinstance(name, str):
+                    attrs = split_multi_valued_attributes(name, dict(item.attrib))
+                    stack.append((
+                        ElementTag(name, attrs, item),
+                        element_contents(item),
+                        [],
+                        preserve or name in PRESERVE_WHITESPACE_TAGS,
+                    ))
+                    if len(stack) > max_depth:
+                        max_depth = len(stack)
+                    break
+            else:
+                if len(stack) == 1:
+                    return top_children, max_depth
+                stack.pop()
+                node = _finish_tag(parser, tag, parsed_children)  # type: ignore
+                if node is not None:
+                    stack[-1][2].append(node)
+
+
+def element_contents(element: Any) -> Iterator[Any]:
+    """Yield an element's text and children in document order."""
+    if element.text:
+        yield element.text
+    for child in element:
+        yield child
+        if child.tail:
+            yield child.tail
+
+
+class EventTag:
+    """A TagLike for the streaming backend; text is read from the shared buffer."""
+    __slots__ = ("name", "attrs", "_strings", "_start", "_end")
+
+    def __init__(self, name: str, attrs: dict[str, Any], strings: list[str], start: int, end: int) -> None:
+        self.name = name
+        self.attrs = attrs
+        self._strings = strings
+        self._start = start
+        self._end = end
+
+    @property
+    def text(self) -> str:
+        return "".join(self._strings[self._start:self._end])
+
+
+class _StreamFrame:
+    __slots__ = ("name", "attrs", "children", "text_start")
+
+    def __init__(self, name: str, attrs: dict[str, Any], text_start: int) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.children: list[AMNode] = []
+        self.text_start = text_start
+
+
+class _StreamTarget:
+    """lxml parser target that builds AMNodes as parser events arrive."""
+
+    def __init__(self, parser: "HTMLParser") -> None:
+        self.parser = parser
+        self.stack = [_StreamFrame(DOCUMENT_TAG_NAME, {}, 0)]
+        # Text strings seen so far, so EventTag.text is a cheap slice.
+        self.strings: list[str] = []
+        self.pending: list[str] = []
+        self.preserve_depth = 0
+        # How many tags of each name are open, so end tags are checked in O(1).
+        self.open_counts: dict[str, int] = {}
+
+    def flush(self, is_text: bool = True) -> None:
+        if not self.pending:
+            return
+        text = collapse_whitespace("".join(self.pending), self.preserve_depth > 0)
+        self.pending = []
+        if is_text:
+            self.strings.append(text)
+        node = self.parser.parse_navigable_string(text)
+        if node is not None:
+            self.stack[-1].children.append(node)
+
+    def start(self, tag: str, attrib: Any) -> None:
+        self.flush()
+        attrs = split_multi_valued_attributes(tag, dict(attrib))
+        self.stack.append(_StreamFrame(tag, attrs, len(self.strings)))
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+
+    def end(self, tag: str) -> None:
+        self.flush()
+        # Like BeautifulSoup, close everything up to the matching open tag and
+        # ignore end tags that were never opened.
+        if not self.open_counts.get(tag):
+            return
+        while True:
+            frame = self.stack.pop()
+            self.open_counts[frame.name] -= 1
+            if frame.name in PRESERVE_WHITESPACE_TAGS:
+                self.preserve_depth -= 1
+            self._finish(frame)
+            if frame.name == tag:
+                return
+
+    def data(self, data: str) -> None:
+        self.pending.append(data)
+
+    def comment(self, text: str) -> None:
+        self.flush()
+        self.pending.append(text)
+        self.flush(is_text=False)
+
+    def pi(self, target: str, data: str) -> None:
+        self.flush()
+        self.pending.append(f"{target} {data}")
+        self.flush(is_text=False)
+
+    def doctype(self, name: str, pubid: str | None, system: str | None) -> None:
+        self.flush()
+        self.pending.append(doctype_string(name, pubid, system))
+        self.flush(is_text=False)
+
+    def close(self) -> AMNode | None:
+        self.flush()
+        while len(self.stack) > 1:
+            self._finish(self.stack.pop())
+        return _finish_tag(self.parser, ElementTag(DOCUMENT_TAG_NAME, {}), self.stack[0].children)
+
+    def _finish(self, frame: _StreamFrame) -> None:
+        tag = EventTag(frame.name, frame.attrs, self.strings, frame.text_start, len(self.strings))
+        node = _finish_tag(self.parser, tag, frame.children)
+        if node is not None:
+            self.stack[-1].children.append(node)
+
+
+class LxmlStreamBackend(ParserBackend):
+    """Build AMNodes directly from lxml parser events, without a DOM."""
+    name = "stream"
+
+    def build(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        from lxml import etree
+
+        target = _StreamTarget(parser)
+        lxml_parser = etree.HTMLParser(target=target, recover=True, huge_tree=True)
+        try:
+            lxml_parser.feed(text)
+            return lxml_parser.close()
+        except etree.XMLSyntaxError:
+            return None
+
+
+BACKENDS: dict[str, type[ParserBackend]] = {
+    backend.name: backend
+    for backend in [BeautifulSoupBackend, LxmlTreeBackend, LxmlStreamBackend]
+}
+
+
+def get_backend(backend: "str | ParserBackend") -> ParserBackend:
+    """Look up a backend by name (instances are passed through)."""
+    if isinstance(backend, ParserBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r}, expected one of {list(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+def collapse_whitespace(text: str, preserve: bool) -> str:
+    """Collapse whitespace-only strings like BeautifulSoup does."""
+    if preserve or text.strip(ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def split_multi_valued_attributes(name: str, attrs: dict[str, Any]) -> dict[str, Any]:
+    """Split attributes like `class` into lists like BeautifulSoup does."""
+    tag_specific = MULTI_VALUED_ATTRIBUTES.get(name)
+    for attr, value in attrs.items():
+        if attr in MULTI_VALUED_ATTRIBUTES["*"] or (tag_specific and attr in tag_specific):
+            attrs[attr] = value.split()
+    return attrs
+
+
+def doctype_string(name: str | None, pubid: str | None, system: str | None) -> str:
+    """The text BeautifulSoup stores for a doctype."""
+    value = name or ""
+    if pubid is not None:
+        value += f' PUBLIC "{pubid}"'
+        if system is not None:
+            value += f' "{system}"'
+    elif system is not None:
+        value += f' SYSTEM "{system}"'
+    return value
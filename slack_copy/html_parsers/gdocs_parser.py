@@ -0,0 +1,106 @@
+import functools
+
+from typing_extensions import override
+
+from slack_copy.html_parsers.backends import TagLike
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.nodes import AMNode, AMSpan, Style, intern_styles
+
+# Google Docs repeats the same few style strings on every span, so a small
+# cache covers a whole paste.
+STYLE_CACHE_SIZE = 256
+# Font families that mean the text is code. Google Docs uses 'Roboto Mono'
+# for its code blocks; the others are common choices when writing by hand.
+MONOSPACE_FONTS = frozenset([
+    "monospace",
+    "roboto mono",
+    "courier new",
+    "courier",
+    "consolas",
+    "source code pro",
+    "menlo",
+    "monaco",
+])
+
+
+class GDocsParser(HTMLParser):
+    """Parse Google Docs-flavored HTML.
+
+    Google Docs doesn't use <strong>, <em> etc. Instead every run of text is a
+    span with a long inline style, so the styles come from the CSS.
+    """
+
+    @override
+    def parse_span_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMSpan:
+        return AMSpan(children=parsed_children, styles=css_styles(tag.attrs.get("style", "")))
+
+    @override
+    def parse_strong_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
+        # Google Docs wraps the whole paste in <b style="font-weight:normal;">,
+        # which isn't bold at all.
+        style = tag.attrs.get("style", "")
+        if "font-weight" in style and "bold" not in css_styles(style):
+            return self.parse_container_tag(tag, parsed_children)
+        return super().parse_strong_tag(tag, parsed_children)
+
+
+def parse_css_declarations(style: str) -> dict[str, str]:
+    """Parse an inline style attribute into a dict of property to value.
+
+    Property names are lowercased, `!important` is dropped, and later
+    declarations override earlier ones, as in a browser.
+
+    Args:
+        style: The contents of a style attribute, e.g. "font-weight:700;".
+
+    Returns:
+        The declarations.
+    """
+    declarations = {}
+    for declaration in style.split(";"):
+        name, colon, value = declaration.partition(":")
+        if not colon:
+            continue
+        value = value.strip()
+        if value.endswith("!important"):
+            value = value[:-len("!important")].rstrip()
+        declarations[name.strip().lower()] = value
+    return declarations
+
+
+@functools.lru_cache(maxsize=STYLE_CACHE_SIZE)
+def css_styles(style: str) -> tuple[Style, ...]:
+    """Work out the markdown styles of an inline style attribute.
+
+    Memoized, so each distinct style string is only parsed once.
+
+    Args:
+        style: The contents of a style attribute.
+
+    Returns:
+        The styles, as a shared tuple (see `intern_styles`).
+    """
+    declarations = parse_css_declarations(style)
+    styles: list[Style] = []
+
+    weight = declarations.get("font-weight", "").lower()
+    if weight in ("bold", "bolder") or (weight.isdigit() and int(weight) >= 600):
+        styles.append("bold")
+
+    if declarations.get("font-style", "").lower() in ("italic", "oblique"):
+        styles.append("italic")
+
+    decoration = " ".join([
+        declarations.get("text-decoration", ""),
+        declarations.get("text-decoration-line", ""),
+    ]).lower()
+    if "underline" in decoration:
+        styles.append("underline")
+    if "line-through" in decoration:
+        styles.append("strikethrough")
+
+    families = declarations.get("font-family", "").lower().split(",")
+    if any(family.strip().strip("'\"") in MONOSPACE_FONTS for family in families):
+        styles.append("code")
+
+    return intern_styles(styles)
@@ -1,127 +1,203 @@
-import bs4
-from slack_copy.nodes import STYLES, AMLeaf, AMNode, AMSpan, AMParagraph, AMContainer, AMListElement, AMList
-from bs4.element import PageElement, NavigableString, Tag
+from slack_copy.nodes import EMPTY_CHILDREN, STYLES, AMImage, AMLeaf, AMNode, AMSpan, AMParagraph, AMContainer, AMListElement, AMList, clear_shared_texts
+from slack_copy.html_parsers.backends import ParserBackend, TagLike, get_backend, walk_soup
+from slack_copy.html_parsers.parallel import PARALLEL_THRESHOLD, get_parallel_backend, parallel_parsing_available
+from slack_copy.payloads import extract_payloads, resolve_payloads
+from slack_copy.telemetry import TELEMETRY
+from typing import TYPE_CHECKING, Callable, TypeVar
+
+if TYPE_CHECKING:
+    from bs4.element import PageElement, NavigableString
+
+TagHandler = Callable[..., AMNode | None]
+F = TypeVar("F", bound=TagHandler)
+
+
+def handles(*tag_names: str) -> Callable[[F], F]:
+    """Register a parser method as the handler for some tag names.
+
+    The registrations are collected into the class's `tag_handlers` table when
+    the class is created. Subclasses inherit the table, so overriding a method
+    keeps its tags, and decorating a new method adds or remaps tags.
+    """
+    def decorator(method: F) -> F:
+        method._handles_tags = tag_names  # type: ignore
+        return method
+    return decorator
+
 
 class HTMLParser:
     """The basic HTML parser class, with default parsing for each tag.
     
     Subclasses should override specific tag methods to change the behavior.
+
+    Args:
+        backend: The backend that turns HTML into calls to the tag methods
+            ("bs4", "lxml" or "stream"; see `backends`). Defaults to the
+            class's `default_backend`, in which case documents longer than
+            `PARALLEL_THRESHOLD` use the "parallel" backend instead, which
+            builds the same tree.
+
+    Large `data:` attribute values (inline images) are kept out of the
+    backends and put back into the finished tree; see `slack_copy.payloads`.
     """
+    default_backend: str = "bs4"
+    # Tag name -> name of the method that parses it. Built once per class.
+    tag_handlers: dict[str, str] = {}
+    # Tags that are parsed even with no children; other empty tags are dropped.
+    empty_tags: frozenset[str] = frozenset(["img"])
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.tag_handlers = _collect_tag_handlers(cls)
+
+    def __init__(self, backend: str | ParserBackend | None = None) -> None:
+        self.backend = get_backend(backend if backend is not None else self.default_backend)
+        # A backend that was asked for is always used.
+        self.allow_parallel = backend is None
+        # Bind the handlers once so that dispatch is a single dict lookup.
+        self._dispatch: dict[str, TagHandler] = {
+            tag_name: getattr(self, method_name)
+            for tag_name, method_name in self.tag_handlers.items()
+        }
 
     def parse(self, text: str) -> AMNode:
-        root_tag = bs4.BeautifulSoup(text, "lxml")
-        root_node = self.recursive_parse(root_tag)
+        source = text
+        text, payloads = extract_payloads(text)
+        backend = self.backend
+        if self.allow_parallel and len(text) >= PARALLEL_THRESHOLD and parallel_parsing_available():
+            # Very large documents are split into blocks parsed in parallel;
+            # see `slack_copy.html_parsers.parallel`.
+            backend = get_parallel_backend()
+        try:
+            root_node = backend.build(self, text)
+        finally:
+            clear_shared_texts()
         if root_node is None:
-            raise ValueError(f"Couldn't parse root tag {root_tag}")
+            raise ValueError(f"Couldn't parse root tag of {source[:100]!r}")
+        if payloads:
+            resolve_payloads(root_node, payloads)
         return root_node
 
-    def recursive_parse(self, tag: PageElement) -> AMNode | None:
-        """Parse HTML and return an AbstractMarkdownTree."""
+    def recursive_parse(self, tag: "PageElement") -> AMNode | None:
+        """Parse a BeautifulSoup element and everything below it.
+
+        Despite the name, this doesn't recurse: `walk_soup` keeps an explicit
+        stack, so deeply nested HTML can't hit the recursion limit.
+        """
+        from bs4.element import NavigableString, Tag
+
         # Base cases
         if isinstance(tag, NavigableString):
             return self.parse_navigable_string(tag)
 
         if not isinstance(tag, Tag):
-            print(f"Base: Cannot parse type {type(tag)}: {tag}")
+            TELEMETRY.count_unparsed(f"#{type(tag).__name__}")
             return None
 
-        # Now we assume it's a tag.
-        children = list(tag.children)
+        return walk_soup(self, tag)
 
-        # Potentially recursive cases:
-        parsed_children = self.get_parsed_children(children)
-        if len(parsed_children) == 0:
+    def parse_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode | None:
+        """Parse a tag whose children have already been parsed."""
+        handler = self._dispatch.get(tag.name)
+        if handler is None:
+            TELEMETRY.count_unparsed(tag.name)
             return None
-        
-
-        if tag.name == "a":
-            return self.parse_a_tag(tag, parsed_children)
-        if tag.name in ["strong", "b"]:
-            return self.parse_strong_tag(tag, parsed_children)
-        if tag.name in ["em", "i"]:
-            return self.parse_em_tag(tag, parsed_children)
-        if tag.name in ["s"]:
-            return self.parse_s_tag(tag, parsed_children)
-        if tag.name in ["u"]:
-            return self.parse_u_tag(tag, parsed_children)
-        if tag.name in ["code"]:
-            return self.parse_code_tag(tag, parsed_children)
-        if tag.name in ["span"]:
-            return self.parse_span_tag(tag, parsed_children)
-        if tag.name in ["p"]:
-            return self.parse_p_tag(tag, parsed_children)
-        if tag.name in ["body", "span", "div", "html", "[document]", "head"]:
-            return self.parse_container_tag(tag, parsed_children)
-        if tag.name == "li":
-            return self.parse_li_tag(tag, parsed_children)
-        if tag.name in ["ul", "ol"]:
-            return self.parse_parent_list_tag(tag, parsed_children)
-
-        print(f"End: Cannot parse tag {tag.name} with attrs {tag.attrs} and children {list(tag.children)}")
-        return None
-
-    def parse_navigable_string(self, tag: NavigableString) -> AMLeaf:
-        return AMLeaf(children=[], text=tag, styles=[], url=None)
-
-    def get_parsed_children(self, children: list[PageElement]) -> list[AMNode]:
-        parsed_children = [self.recursive_parse(c) for c in children]
-        return [c for c in parsed_children if c is not None]
-
-    def parse_a_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+        return handler(tag, parsed_children)
+
+    def parse_navigable_string(self, tag: "NavigableString | str") -> AMLeaf:
+        return AMLeaf(children=EMPTY_CHILDREN, text=tag, styles=[], url=None)
+
+    def postprocess_children(self, parsed_children: list[AMNode]) -> list[AMNode]:
+        """Hook for fixing up a tag's parsed children before the tag is parsed."""
+        return parsed_children
+
+    @handles("a")
+    def parse_a_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=[], url=tag.attrs["href"])
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=[], url=tag.attrs["href"])
         else:
             return AMSpan(children=parsed_children, styles=[], url=tag.attrs["href"])
 
-    def parse_strong_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("strong", "b")
+    def parse_strong_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=["bold"], url=None)
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=["bold"], url=None)
         else:
             return AMSpan(children=parsed_children, styles=["bold"])
 
-    def parse_em_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("em", "i")
+    def parse_em_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=["italic"], url=None)
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=["italic"], url=None)
         else:
             return AMSpan(children=parsed_children, styles=["italic"])
 
-    def parse_s_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("s")
+    def parse_s_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=["strikethrough"], url=None)
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=["strikethrough"], url=None)
         else:
             return AMSpan(children=parsed_children, styles=["strikethrough"])
 
-    def parse_u_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("u")
+    def parse_u_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=["underline"], url=None)
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=["underline"], url=None)
         else:
             return AMSpan(children=parsed_children, styles=["underline"])
 
-    def parse_code_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("code")
+    def parse_code_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         if len(parsed_children) == 0:
-            return AMLeaf(children=[], text=tag.text, styles=["code"], url=None)
+            return AMLeaf(children=EMPTY_CHILDREN, text=tag.text, styles=["code"], url=None)
         else:
             return AMSpan(children=parsed_children, styles=["code"])
 
-    def parse_span_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMSpan:
+    @handles("span")
+    def parse_span_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMSpan:
         # TODO(ian): Parse styles and work out where to store them (span or leaf?)
         for style in STYLES:
             if style in tag.attrs.get("style", ""):
                 return AMSpan(children=parsed_children, styles=[style])
         return AMSpan(children=parsed_children, styles=[])
 
-    def parse_p_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMParagraph:
+    @handles("p")
+    def parse_p_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMParagraph:
         return AMParagraph(children=parsed_children, styles=[])
 
-    def parse_container_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMNode:
+    @handles("body", "div", "html", "[document]", "head")
+    def parse_container_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode:
         # TODO (ian): parse styles and work out where to store them (span or leaf?)
         if len(parsed_children) == 1:
             return parsed_children[0]
         return AMContainer(children=parsed_children, styles=[])
 
-    def parse_li_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMListElement:
+    @handles("img")
+    def parse_img_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMNode | None:
+        src = tag.attrs.get("src")
+        if not src:
+            return None
+        return AMImage(children=EMPTY_CHILDREN, src=src, alt=tag.attrs.get("alt", ""))  # type: ignore
+
+    @handles("li")
+    def parse_li_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMListElement:
         return AMListElement(children=parsed_children)
 
-    def parse_parent_list_tag(self, tag: Tag, parsed_children: list[AMNode]) -> AMList:
+    @handles("ul", "ol")
+    def parse_parent_list_tag(self, tag: TagLike, parsed_children: list[AMNode]) -> AMList:
         ordered = tag.name == "ol"
-        return AMList(children=parsed_children, ordered=ordered)
\ No newline at end of file
+        return AMList(children=parsed_children, ordered=ordered)
+
+
+def _collect_tag_handlers(cls: type) -> dict[str, str]:
+    """Merge the inherited tag tables with the class's own @handles methods."""
+    tag_handlers: dict[str, str] = {}
+    for base in reversed(cls.__mro__[1:]):
+        tag_handlers.update(getattr(base, "tag_handlers", {}))
+    for name, attribute in vars(cls).items():
+        for tag_name in getattr(attribute, "_handles_tags", ()):
+            tag_handlers[tag_name] = name
+    return tag_handlers
+
+
+HTMLParser.tag_handlers = _collect_tag_handlers(HTMLParser)
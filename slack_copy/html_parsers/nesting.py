@@ -0,0 +1,62 @@
+"""Turn flat runs of indented list items into nested lists.
+
+Slack (`data-indent`) and Airtable (`ql-indent-N`) both copy nested lists as a
+flat sequence of lists or items, each marked with its indentation level.
+`nest_by_indent` rebuilds the nesting in a single pass with a stack of the
+currently open lists, so it is linear in the number of items.
+"""
+from typing import Iterable
+
+from slack_copy.nodes import AMList
+from slack_copy.telemetry import TELEMETRY
+
+
+@TELEMETRY.timed("nest")
+def nest_by_indent(items: Iterable[tuple[int, AMList]]) -> list[AMList]:
+    """Nest a flat sequence of lists according to their indentation.
+
+    Each item is merged into the open list at the same indentation, or nested
+    inside the innermost open list if it is more indented. If it skips levels
+    (e.g. from 0 to 2), empty lists are added for the missing levels so that
+    it still ends up at the right depth. Dedenting closes the open lists down
+    to the item's level.
+
+    The items' children are moved, not copied, so the items must not be used
+    afterwards except through the returned lists.
+
+    Args:
+        items: Pairs of (indentation, list) in document order.
+
+    Returns:
+        The top-level lists. This is a single list unless some item is less
+        indented than the first one.
+    """
+    roots: list[AMList] = []
+    # The open lists, innermost last, with their indentation.
+    stack: list[tuple[int, AMList]] = []
+    for indent, item in items:
+        while stack and stack[-1][0] > indent:
+            stack.pop()
+
+        if not stack:
+            roots.append(item)
+            stack.append((indent, item))
+            continue
+
+        top_indent, top = stack[-1]
+        if top_indent == indent:
+            top.children.extend(item.children)
+            continue
+
+        for level in range(top_indent + 1, indent):
+            filler = AMList(
+                children=[],
+                ordered=item.ordered,
+                data_indent=level if item.data_indent is not None else None,
+            )
+            top.children.append(filler)
+            stack.append((level, filler))
+            top = filler
+        top.children.append(item)
+        stack.append((indent, item))
+    return roots
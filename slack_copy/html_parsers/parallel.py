@@ -0,0 +1,318 @@
+"""Parse very large documents with their top-level blocks spread over processes.
+
+Long Google Docs and Slack exports are a single wrapper (`<body>`, Google
+Docs' `<b id="docs-internal-guid-...">`, ...) around thousands of independent
+blocks. `ParallelBackend` parses the document with lxml, walks down that
+spine of single-child wrappers to the element holding the blocks, and sends
+runs of blocks to worker processes, which build their AMNodes. The results
+are stitched back in order under the spine, where the parser's
+`postprocess_children` (e.g. Slack's list nesting) sees all the blocks at
+once, so list runs split across workers are still nested correctly.
+
+The result is the same tree the "lxml" backend (and so every backend) builds.
+Workers get each block as serialized HTML, so they check that re-parsing it
+gave back the same block, and blocks that didn't survive the round trip are
+built in this process instead.
+
+This process still parses the document, serializes the blocks and unpickles
+the workers' nodes, which together cost over half as much as parsing
+serially, so the speedup is bounded and it takes several cores to pay off.
+
+Workers are started with "forkserver" (or "spawn"), never "fork", since the
+watcher and the server parse from worker threads while other threads run,
+and forking a multithreaded process can deadlock. The pool is shut down once
+it has been idle for `POOL_IDLE_SECONDS`, so workers don't sit around between
+large pastes. If a worker dies (e.g. killed for running out of memory), the
+broken pool is discarded and the document is parsed serially with "bs4";
+the next large document starts a new pool.
+"""
+import atexit
+from contextlib import contextmanager
+import functools
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Iterator
+
+from slack_copy.html_parsers.backends import (
+    BACKENDS,
+    PRESERVE_WHITESPACE_TAGS,
+    ElementTag,
+    LxmlTreeBackend,
+    _finish_tag,
+    get_backend,
+    split_multi_valued_attributes,
+)
+from slack_copy.nodes import AMNode, clear_shared_texts
+from slack_copy.telemetry import logger
+
+# multiprocessing is imported when first needed, to keep startup cheap.
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from slack_copy.html_parsers.html_parser import HTMLParser
+
+# Documents at least this long (in characters) are parsed in parallel, if
+# there are at least MIN_CORES cores to do it on.
+PARALLEL_THRESHOLD = 1_000_000
+MIN_CORES = 4
+# Chunks of blocks per worker, so that uneven blocks still balance out.
+CHUNKS_PER_WORKER = 4
+# Blocks nested deeper than this are built in the main process, since nodes
+# are pickled recursively on their way back from the workers.
+MAX_PICKLED_DEPTH = 200
+# How long the worker processes are kept after a parse, so that a burst of
+# large documents doesn't start them again for each one.
+POOL_IDLE_SECONDS = 60.0
+
+# A chunk's result: whether each block was built and its node (which may be
+# None), and the deepest stack size reached.
+ChunkResult = tuple[list[tuple[bool, AMNode | None]], int]
+
+
+def parallel_parsing_available() -> bool:
+    """Whether there are cores to spare and we aren't already in a worker process."""
+    import multiprocessing
+
+    return (os.cpu_count() or 1) >= MIN_CORES and multiprocessing.parent_process() is None
+
+
+class ParallelBackend(LxmlTreeBackend):
+    """The "lxml" backend, with the blocks under the document's spine built in worker processes.
+
+    Args:
+        jobs: How many worker processes to use (defaults to the number of cores).
+    """
+    name = "parallel"
+
+    def __init__(self, jobs: int | None = None) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.pool = IdleProcessPool(self.jobs)
+
+    def build(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            return self._build_in_parallel(parser, text)
+        except BrokenProcessPool:
+            logger.warning("A parser worker process died, parsing serially instead")
+            return get_backend("bs4").build(parser, text)
+
+    def _build_in_parallel(self, parser: "HTMLParser", text: str) -> AMNode | None:
+        top_level = self.parse_top_level(text)
+        if top_level is None:
+            return None
+        root = next(item for item in top_level if isinstance(getattr(item, "tag", None), str))
+        spine = find_spine(root)
+        if spine is None:
+            return super().build(parser, text)
+
+        blocks_node, blocks_depth = self._build_blocks(parser, spine[-1])
+        node, max_depth = self._walk(parser, top_level, substitutions={spine[-1]: blocks_node})
+        # The document frame plus the spine's elements are above the blocks.
+        if max(max_depth, len(spine) + blocks_depth) < self.MAX_NATIVE_DEPTH:
+            return node
+        return self.build_from_events(parser, text)
+
+    def _build_blocks(self, parser: "HTMLParser", element: Any) -> tuple[AMNode | None, int]:
+        """Build the node for the element holding the blocks, returning it and its depth."""
+        from lxml import etree
+
+        contents = [element.text] if element.text else []
+        for child in element:
+            contents.append(child)
+            if child.tail:
+                contents.append(child.tail)
+        blocks = [item for item in contents if not isinstance(item, str) and isinstance(item.tag, str)]
+        fragments = [etree.tostring(block, method="html", encoding="unicode", with_tail=False) for block in blocks]
+
+        chunks = _split_chunks(fragments, self.jobs * CHUNKS_PER_WORKER)
+        with self.pool.use() as pool:
+            results = list(pool.map(_build_chunk, [(type(parser), chunk) for chunk in chunks]))
+
+        substitutions: dict[Any, AMNode | None] = {}
+        depth = 1
+        start = 0
+        for chunk, result in zip(chunks, results):
+            chunk_blocks = blocks[start:start + len(chunk)]
+            start += len(chunk)
+            if result is None:
+                continue
+            built_nodes, chunk_depth = result
+            depth = max(depth, chunk_depth)
+            for block, (built, node) in zip(chunk_blocks, built_nodes):
+                if built:
+                    substitutions[block] = node
+
+        # Blocks missing from `substitutions` are walked here, as is the text
+        # between blocks.
+        parsed_children, local_depth = self.walk_contents(parser, contents, substitutions=substitutions)
+        attrs = split_multi_valued_attributes(element.tag, dict(element.attrib))
+        node = _finish_tag(parser, ElementTag(element.tag, attrs, element), parsed_children)
+        return node, max(depth, local_depth)
+
+
+BACKENDS[ParallelBackend.name] = ParallelBackend
+
+
+@functools.cache
+def get_parallel_backend() -> ParallelBackend:
+    return ParallelBackend()
+
+
+def find_spine(root: Any) -> list[Any] | None:
+    """The chain of single-child elements from the root down to the blocks.
+
+    Returns:
+        The elements from the root to the one whose children are the blocks,
+        or None if there aren't several blocks to split, or they are inside a
+        tag that preserves whitespace.
+    """
+    spine = [root]
+    element = root
+    while True:
+        if element.tag in PRESERVE_WHITESPACE_TAGS:
+            return None
+        children = [child for child in element if isinstance(child.tag, str)]
+        if element is root:
+            # Skip the <head>, which holds nothing but metadata.
+            children = [child for child in children if child.tag != "head"]
+        if len(children) != 1:
+            break
+        element = children[0]
+        spine.append(element)
+    return spine if len(children) > 1 else None
+
+
+def _split_chunks(fragments: list[str], n_chunks: int) -> list[list[str]]:
+    """Split fragments into up to n runs of about the same total length."""
+    target = sum(map(len, fragments)) / n_chunks
+    chunks: list[list[str]] = [[]]
+    size = 0
+    for fragment in fragments:
+        if size >= target and chunks[-1]:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(fragment)
+        size += len(fragment)
+    return chunks
+
+
+class IdleProcessPool:
+    """A process pool that is started when needed and shut down when idle.
+
+    Args:
+        jobs: How many worker processes to use.
+        idle_seconds: How long the pool may go unused before it's shut down.
+    """
+
+    def __init__(self, jobs: int, idle_seconds: float = POOL_IDLE_SECONDS) -> None:
+        self.jobs = jobs
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._pool: "ProcessPoolExecutor | None" = None
+        self._users = 0
+        self._timer: threading.Timer | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    @contextmanager
+    def use(self) -> Iterator["ProcessPoolExecutor"]:
+        """Use the pool for the body of a `with` block, starting it if needed.
+
+        If a worker dies, the pool is discarded (and `BrokenProcessPool`
+        propagates), so the next use starts a new one.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pool is None:
+                self._pool = _new_pool(self.jobs)
+                atexit.register(self.shutdown)
+            self._users += 1
+            pool = self._pool
+        try:
+            yield pool
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+        finally:
+            with self._lock:
+                self._users -= 1
+                if self._users == 0:
+                    self._timer = threading.Timer(self.idle_seconds, self._shutdown_if_idle)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            atexit.unregister(self.shutdown)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _discard(self, pool: "ProcessPoolExecutor") -> None:
+        with self._lock:
+            # Another user may already have replaced the broken pool.
+            if self._pool is not pool:
+                return
+            self._pool = None
+        atexit.unregister(self.shutdown)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _shutdown_if_idle(self) -> None:
+        with self._lock:
+            # The pool may have been picked up again since the timer started.
+            if self._users:
+                return
+        self.shutdown()
+
+
+def _new_pool(jobs: int) -> "ProcessPoolExecutor":
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(method))
+
+
+@functools.cache
+def _worker_parser(parser_class: type["HTMLParser"]) -> "HTMLParser":
+    return parser_class("lxml")
+
+
+def _build_chunk(args: tuple[type["HTMLParser"], list[str]]) -> ChunkResult | None:
+    """Build the nodes for a run of blocks, in a worker process."""
+    from lxml import etree
+
+    parser_class, fragments = args
+    parser = _worker_parser(parser_class)
+    html = etree.fromstring(
+        f"<html><body>{''.join(fragments)}</body></html>", etree.HTMLParser(recover=True, huge_tree=True)
+    )
+    body = html.find("body")
+    if body is None or len(body) != len(fragments):
+        return None
+    built_nodes: list[tuple[bool, AMNode | None]] = []
+    max_depth = 1
+    backend = parser.backend
+    assert isinstance(backend, LxmlTreeBackend)
+    for block, fragment in zip(body, fragments):
+        if etree.tostring(block, method="html", encoding="unicode", with_tail=False) != fragment:
+            # The block parses differently out of context (e.g. a stray <td>).
+            built_nodes.append((False, None))
+            continue
+        parsed, depth = backend.walk_contents(parser, [block])
+        if depth > MAX_PICKLED_DEPTH:
+            built_nodes.append((False, None))
+            continue
+        built_nodes.append((True, parsed[0] if parsed else None))
+        max_depth = max(max_depth, depth)
+    clear_shared_texts()
+    return built_nodes, max_depth
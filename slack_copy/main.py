@@ -1,105 +1,488 @@
-from dataclasses import dataclass
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import functools
+import signal
+import socket
 import time
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QClipboard
-from PyQt5 import QtCore
-from PyQt5.QtCore import QMimeData
+from typing import TYPE_CHECKING, Callable, Iterable, Sequence
 import sys
 
-from slack_copy.abstract_markdown import AbstractMarkdownTree
+# PyQt5 (and the parsing libraries, see `warm_up`) are imported when first
+# needed, so that importing this module to convert contents stays cheap.
+if TYPE_CHECKING:
+    from PyQt5.QtCore import QMimeData
+    from PyQt5.QtGui import QClipboard
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree, warm_up
+from slack_copy.cache import ConversionCache, RejectionCache, contents_digest
+from slack_copy.detectors import SOURCE_DETECTORS, Detection, looks_like_markdown
+from slack_copy.fingerprint import (
+    DEFAULT_SAMPLE_SIZE,
+    FINGERPRINT_FORMATS,
+    ClipboardFingerprint,
+    fingerprint_mime_data,
+)
+from slack_copy.render import FORMATS, RenderedFormats
+from slack_copy.telemetry import TELEMETRY, add_telemetry_arguments, apply_telemetry_arguments, logger
 
 @dataclass
 class ClipboardContents:
     text: str
     html: str
+    # The MIME formats offered by the clipboard owner, used to detect the source.
+    formats: tuple[str, ...] = field(default=(), compare=False)
+    # Obsidian markdown for the same contents, published as text/markdown.
+    markdown: str = field(default="", compare=False)
 
-SourceIndicators = {
-    "gdocs": "docs-internal",
-    "obsidian": "Microsoft YaHei Light",
-    "slack": "Slack-Lato",
-    "airtable": "Roboto, Oxygen-Sans, Ubuntu, Cantarell"
+HTML_CONVERTERS: dict[str, Callable[[str], AbstractMarkdownTree]] = {
+    "gdocs": AbstractMarkdownTree.from_gdocs,
+    "slack": AbstractMarkdownTree.from_slack,
+    "airtable": AbstractMarkdownTree.from_airtable,
 }
 
 class ClipboardWrapper:
     def __init__(self):
+        from PyQt5.QtWidgets import QApplication
+
         # Ensure a QApplication instance exists
         self.app = QApplication.instance() or QApplication(sys.argv)
-        self.clipboard: QClipboard = self.app.clipboard()  # type: ignore
+        self.clipboard: "QClipboard" = self.app.clipboard()  # type: ignore
         self.loop = None
 
     def get_clipboard_contents(self):
-        text = self.clipboard.text()
-        mime_data: QMimeData = self.clipboard.mimeData()  # type: ignore
-        if mime_data.hasHtml():
-            html = mime_data.html()
-        else:
-            html = ""
-        return ClipboardContents(text, html)
+        with TELEMETRY.stage("fetch"):
+            text = self.clipboard.text()
+            mime_data: "QMimeData" = self.clipboard.mimeData()  # type: ignore
+            if mime_data.hasHtml():
+                html = mime_data.html()
+            else:
+                html = ""
+            return ClipboardContents(text, html, tuple(mime_data.formats()))
+
+    def get_clipboard_fingerprint(
+        self, sample_size: int | None = DEFAULT_SAMPLE_SIZE
+    ) -> ClipboardFingerprint:
+        """Cheaply summarize the clipboard without copying its contents."""
+        mime_data: "QMimeData" = self.clipboard.mimeData()  # type: ignore
+        return fingerprint_mime_data(mime_data, sample_size)
     
     def set_clipboard_contents(self, contents: ClipboardContents):
-        mime_data = QtCore.QMimeData()
-        mime_data.setText(contents.text)
-        mime_data.setHtml(contents.html)
-        self.clipboard.setMimeData(mime_data)
+        from PyQt5.QtCore import QMimeData
+
+        with TELEMETRY.stage("set_clipboard"):
+            mime_data = QMimeData()
+            mime_data.setText(contents.text)
+            mime_data.setHtml(contents.html)
+            if contents.markdown:
+                mime_data.setData("text/markdown", contents.markdown.encode("utf-8"))
+            self.clipboard.setMimeData(mime_data)
 
     def wait_for_new_paste(self, sleep_seconds: float = 0.1) -> ClipboardContents:
-        """Waits for new content on the clipboard."""
-        original_contents = self.get_clipboard_contents()
+        """Waits for new content on the clipboard.
+
+        Only the fingerprint is checked on each tick; the full contents are
+        read once, after a change has been seen.
+        """
+        original_fingerprint = self.get_clipboard_fingerprint()
         while True:
-            current_contents = self.get_clipboard_contents()
-            if current_contents != original_contents:
-                return current_contents
+            current_fingerprint = self.get_clipboard_fingerprint()
+            if current_fingerprint != original_fingerprint:
+                return self.get_clipboard_contents()
             time.sleep(sleep_seconds)
 
     def shutdown(self):
         self.app.quit()
 
-def html_to_amtree(html: str) -> AbstractMarkdownTree:
+def html_to_amtree(
+    html: str, formats: Sequence[str] = (), detection: Detection | None = None
+) -> AbstractMarkdownTree:
     # work out which kind of html it is and then parse
-    if SourceIndicators["gdocs"] in html:
-        return AbstractMarkdownTree.from_gdocs(html)
-    elif SourceIndicators["slack"] in html:
-        return AbstractMarkdownTree.from_slack(html)
-    elif SourceIndicators["airtable"] in html:
-        return AbstractMarkdownTree.from_airtable(html)
-    # I think this font is only used in Obsidian
-    elif SourceIndicators["obsidian"] in html:
-        raise NotImplementedError("Haven't implemented parsing from Obsidian yet")
-    else:
+    if detection is None:
+        with TELEMETRY.stage("detect"):
+            detection = SOURCE_DETECTORS.detect(html, formats)
+    if detection is None:
         raise ValueError("Unknown source for HTML")
+    converter = HTML_CONVERTERS.get(detection.source)
+    if converter is None:
+        raise NotImplementedError(f"Haven't implemented parsing from {detection.source} yet")
+    with TELEMETRY.stage("parse"):
+        return converter(html)
 
 def text_to_amtree(text: str) -> AbstractMarkdownTree:
     # for now, we'll assume that if it's not HTML, it's from Obsidian
-    return AbstractMarkdownTree.from_obsidian(text, is_html=False)
+    with TELEMETRY.stage("parse"):
+        return AbstractMarkdownTree.from_obsidian(text, is_html=False)
 
-def cb_to_amtree(contents: ClipboardContents) -> AbstractMarkdownTree:
+def cb_to_amtree(
+    contents: ClipboardContents, detection: Detection | None = None
+) -> AbstractMarkdownTree:
     if contents.html != "":
-        amtree = html_to_amtree(contents.html)
+        amtree = html_to_amtree(contents.html, contents.formats, detection)
     else:
         amtree = text_to_amtree(contents.text)
     return amtree
 
-def process_contents(contents: ClipboardContents) -> ClipboardContents:
+def rejection_reason(contents: ClipboardContents, detection: Detection | None) -> str | None:
+    """Why contents should be left alone, or None if they should be converted.
+
+    This only looks at the detected source, or for plain text at whether it
+    looks like markdown, so rejecting something costs no more than detecting
+    it. Plain text that isn't markdown (logs, code, URLs) would convert to
+    nothing more than itself.
+    """
+    if contents.html != "":
+        if detection is None:
+            return "unknown source"
+        if detection.source not in HTML_CONVERTERS:
+            return f"no converter for {detection.source}"
+        return None
+    if contents.text == "" or contents.text.isspace():
+        return "no text or html"
+    if not looks_like_markdown(contents.text):
+        return "not markdown"
+    return None
+
+def fingerprint_rejection_reason(fingerprint: ClipboardFingerprint) -> str | None:
+    """Why contents should be left alone, judging only by their fingerprint."""
+    sizes = dict(zip(FINGERPRINT_FORMATS, fingerprint.sizes))
+    if sizes["text/plain"] <= 0 and sizes["text/html"] <= 0:
+        return "no text or html"
+    return None
+
+def render_contents(
+    amtree: AbstractMarkdownTree, contents: ClipboardContents, formats: Iterable[str] = FORMATS
+) -> RenderedFormats:
+    """Normalize and render the tree converted from some contents.
+
+    Shared by the watcher, `slack-copy convert` and `slack-copy serve`, so
+    they all output the same thing.
+
+    Args:
+        amtree: The tree converted from the contents. It is normalized in place.
+        contents: What the tree was converted from.
+        formats: Which of "html", "text" and "markdown" to render.
+
+    Returns:
+        The rendered formats. Plain-text contents keep their own text, since
+        it's what the user wrote; others get the rendered text, or their own
+        if nothing rendered.
+    """
+    formats = tuple(formats)
+    with TELEMETRY.stage("normalize"):
+        stats = amtree.normalize()
+    logger.debug("Normalized tree from %d to %d nodes", stats.nodes_before, stats.nodes_after)
+    with TELEMETRY.stage("render"):
+        rendered = amtree.render_formats(formats)
+    if "text" in formats:
+        rendered.text = contents.text if contents.html == "" else rendered.text or contents.text
+    return rendered
+
+CONVERSION_CACHE = ConversionCache()
+# How long a conversion may take before the watcher gives up on it.
+DEFAULT_TIMEOUT_SECONDS = 10.0
+
+def process_contents(
+    contents: ClipboardContents, cache: ConversionCache | None = CONVERSION_CACHE
+) -> ClipboardContents:
+    # Our own output coming back round is not a new paste.
+    if cache is not None and cache.is_own_output(contents):
+        return contents
+    detection = None
+    with TELEMETRY.stage("detect"):
+        if contents.html != "":
+            detection = SOURCE_DETECTORS.detect(contents.html, contents.formats)
+            source = detection.source if detection is not None else "unknown"
+        else:
+            source = "text"
+        # Leave unconvertible contents alone before hashing (or parsing) them.
+        reason = rejection_reason(contents, detection)
+    if reason is not None:
+        TELEMETRY.count_skipped(reason)
+        logger.debug("Leaving %s contents alone: %s", source, reason)
+        return contents
+    key = contents_digest(source, contents.html if contents.html != "" else contents.text)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
     try:
-        amtree = cb_to_amtree(contents)
-    except ValueError as e:
-        print(f"Couldn't parse: {contents}")
-        print(f"Error: {e}")
+        amtree = cb_to_amtree(contents, detection)
+    except (ValueError, NotImplementedError) as e:
+        logger.warning("Couldn't parse %s contents: %s", source, e)
+        logger.debug("Unparsed contents: %r", contents)
         return contents
-    html = amtree.to_html()
-    return ClipboardContents(contents.text, html)
+    rendered = render_contents(amtree, contents)
+    processed_contents = ClipboardContents(rendered.text, rendered.html, markdown=rendered.markdown)
+    if cache is not None:
+        cache.put(key, processed_contents)
+    return processed_contents
  
-def main():
+@dataclass
+class ConversionJob:
+    """A conversion running off the Qt thread.
+
+    Attributes:
+        generation: Which clipboard change the job is for. Only the job for
+            the latest change may write its result back.
+        fingerprint: The fingerprint of the clipboard the contents were read
+            from, to check that it still holds them before writing back.
+        contents: The contents being converted.
+        abandoned: Whether the job timed out, so its result is discarded.
+    """
+    generation: int
+    fingerprint: ClipboardFingerprint
+    contents: ClipboardContents
+    abandoned: bool = False
+
+
+@functools.cache
+def _job_relay_class() -> type:
+    from PyQt5.QtCore import QObject, pyqtSignal
+
+    class JobRelay(QObject):
+        """Carries finished jobs from the worker thread to the Qt thread."""
+        finished = pyqtSignal(object, object)
+
+    return JobRelay
+
+
+class ClipboardWatcher:
+    """Event-driven clipboard watcher running on one long-lived QApplication.
+
+    Instead of polling like `ClipboardWrapper.wait_for_new_paste`, this
+    connects to `QClipboard.dataChanged` and lets the Qt event loop sleep
+    until the clipboard actually changes, so there is no idle CPU cost and no
+    polling delay before a conversion.
+
+    Conversions run on a worker thread, so a huge paste doesn't block the
+    event loop. Every clipboard change supersedes the job before it: a job
+    that hasn't started is cancelled, and the result of one that has is
+    discarded. A result is also only written back if the clipboard still
+    holds the contents it was computed from.
+
+    Contents that were left alone are remembered by fingerprint (see
+    `RejectionCache`), so when they come round again, e.g. because an app
+    re-announced the clipboard, they're skipped without being read.
+
+    Args:
+        process: The hook to run on new clipboard contents (`process_contents`
+            by default). If it returns different contents, they are written
+            back to the clipboard.
+        timeout: Seconds after which a conversion is abandoned and the
+            clipboard left alone, or None to wait indefinitely. Python threads
+            can't be interrupted, so an abandoned or superseded job still runs
+            to the end, and the newest job starts after it.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[ClipboardContents], ClipboardContents] = process_contents,
+        timeout: float | None = DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.wrapper = ClipboardWrapper()
+        self.process = process
+        self.timeout = timeout
+        # Set while we write to the clipboard ourselves, so that the resulting
+        # dataChanged signal is not treated as a new paste.
+        self._writing = False
+        self._last_seen: ClipboardFingerprint | None = None
+        self.rejections = RejectionCache()
+        # One worker, so conversions (and the conversion cache) stay serial.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slack-copy-convert")
+        self._generation = 0
+        self._current_job: ConversionJob | None = None
+        self._current_future: Future | None = None
+        self._relay = _job_relay_class()()
+        self._relay.finished.connect(self.on_job_finished)
+        self.wrapper.clipboard.dataChanged.connect(self.on_data_changed)
+        self._install_sigint_handler()
+
+    def on_data_changed(self):
+        if self._writing:
+            return
+        # Some platforms emit dataChanged without a real change, or deliver
+        # the signal for our own write asynchronously, so only read the full
+        # contents if the fingerprint differs from what we last saw.
+        fingerprint = self.wrapper.get_clipboard_fingerprint(sample_size=None)
+        if fingerprint == self._last_seen:
+            return
+        self._last_seen = fingerprint
+        if fingerprint in self.rejections:
+            reason = "left alone before"
+        else:
+            reason = fingerprint_rejection_reason(fingerprint)
+        if reason is not None:
+            TELEMETRY.count_skipped(reason)
+            logger.debug("Leaving the clipboard alone: %s", reason)
+            self.supersede()
+            return
+        contents = self.wrapper.get_clipboard_contents()
+        self.submit(ConversionJob(self._generation + 1, fingerprint, contents))
+
+    def supersede(self) -> None:
+        """Make sure the current job, if any, won't write its result back."""
+        self._generation += 1
+        if self._current_future is not None:
+            self._current_future.cancel()
+        self._current_job = self._current_future = None
+
+    def submit(self, job: ConversionJob) -> None:
+        """Start converting contents off the Qt thread, superseding any earlier job."""
+        from PyQt5.QtCore import QTimer
+
+        self._generation = job.generation
+        if self._current_future is not None:
+            self._current_future.cancel()
+        future = self._executor.submit(self.process, job.contents)
+        self._current_job = job
+        self._current_future = future
+        # Runs on the worker thread; the signal queues the job for the Qt thread.
+        future.add_done_callback(lambda future: self._relay.finished.emit(job, future))
+        if self.timeout is not None:
+            QTimer.singleShot(int(self.timeout * 1000), lambda: self.on_job_timeout(job))
+
+    def on_job_timeout(self, job: ConversionJob) -> None:
+        if job is self._current_job and not self._current_future.done():  # type: ignore
+            job.abandoned = True
+            logger.warning("Conversion took over %ss, leaving the clipboard alone", self.timeout)
+
+    def on_job_finished(self, job: ConversionJob, future: Future) -> None:
+        if future.cancelled() or job.abandoned or job.generation != self._generation:
+            return
+        self._current_job = self._current_future = None
+        try:
+            processed_contents = future.result()
+        except Exception:
+            logger.exception("Conversion failed")
+            return
+        if processed_contents == job.contents:
+            self.rejections.add(job.fingerprint)
+            return
+        # The clipboard can change without its dataChanged signal having been
+        # delivered yet, so check that it still holds what we converted.
+        if self.wrapper.get_clipboard_fingerprint(sample_size=None) != job.fingerprint:
+            logger.info("Clipboard changed during conversion, discarding the result")
+            return
+        self._writing = True
+        try:
+            self.wrapper.set_clipboard_contents(processed_contents)
+            self._last_seen = self.wrapper.get_clipboard_fingerprint(sample_size=None)
+        finally:
+            self._writing = False
+
+    def run(self) -> int:
+        """Run the Qt event loop until interrupted."""
+        self.start_warm_up()
+        return self.wrapper.app.exec_()
+
+    def start_warm_up(self) -> Future:
+        """Load the parsers on the conversion thread, ahead of the first paste.
+
+        The markdown converter is per thread, so warming up anywhere else
+        would leave the first conversion cold; and this doesn't block the
+        event loop. A paste arriving meanwhile just waits for it.
+        """
+        return self._executor.submit(warm_up)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.wrapper.shutdown()
+
+    def _install_sigint_handler(self):
+        # The Qt event loop runs in C++, so Python signal handlers only run
+        # when the interpreter gets control back. Route signals through a
+        # socket that Qt watches, so Ctrl-C wakes the loop without a timer.
+        from PyQt5.QtCore import QSocketNotifier
+
+        self._signal_rsock, self._signal_wsock = socket.socketpair()
+        self._signal_rsock.setblocking(False)
+        self._signal_wsock.setblocking(False)
+        signal.set_wakeup_fd(self._signal_wsock.fileno())
+        self._signal_notifier = QSocketNotifier(
+            self._signal_rsock.fileno(), QSocketNotifier.Read
+        )
+        self._signal_notifier.activated.connect(self._drain_signal_socket)
+        signal.signal(signal.SIGINT, lambda *_: self.shutdown())
+
+    def _drain_signal_socket(self):
+        try:
+            self._signal_rsock.recv(1024)
+        except BlockingIOError:
+            pass
+
+
+def poll_loop():
+    """The original polling loop, kept for platforms where dataChanged is unreliable."""
     while True:
         cb = ClipboardWrapper()
         contents = cb.wait_for_new_paste() 
         processed_contents = process_contents(contents) 
-        cb.set_clipboard_contents(processed_contents)
+        if processed_contents != contents:
+            cb.set_clipboard_contents(processed_contents)
         contents = cb.get_clipboard_contents()
         cb.shutdown()
         # we have to delete and recreate to avoid a hanging bug
         # TODO (gh#1): fix the hanging bug
         del cb
 
+
+def main(argv: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(prog="slack-copy")
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll the clipboard instead of waiting for change events.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT_SECONDS,
+        help="Seconds a conversion may take before the clipboard is left alone (0 for no limit).",
+    )
+    add_telemetry_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    watch_parser = subparsers.add_parser(
+        "watch", help="Watch the clipboard and convert pastes (the default)."
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", default=argparse.SUPPRESS, help=argparse.SUPPRESS
+    )
+    watch_parser.add_argument(
+        "--timeout", type=float, default=argparse.SUPPRESS, help=argparse.SUPPRESS
+    )
+    add_telemetry_arguments(watch_parser, subcommand=True)
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert files or JSON lines without the clipboard."
+    )
+    # Imported here because batch imports this module.
+    from slack_copy.batch import add_convert_arguments, run_convert
+
+    add_convert_arguments(convert_parser)
+    add_telemetry_arguments(convert_parser, subcommand=True)
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve conversions to scripts and editor plugins over a Unix socket."
+    )
+    from slack_copy.server import add_serve_arguments, run_serve
+
+    add_serve_arguments(serve_parser)
+    add_telemetry_arguments(serve_parser, subcommand=True)
+    args = parser.parse_args(argv)
+    # Stages timed in worker processes are recorded there, not here.
+    if args.profile is not None and args.command == "convert" and args.jobs > 1 and args.executor == "process":
+        convert_parser.error("--profile can't time worker processes, use --executor thread or -j 1")
+    if args.profile is not None and args.command == "serve" and args.executor == "process":
+        serve_parser.error("--profile can't time worker processes, use --executor thread")
+    apply_telemetry_arguments(args)
+    if args.command == "convert":
+        sys.exit(run_convert(args))
+    if args.command == "serve":
+        sys.exit(run_serve(args))
+    if args.poll:
+        poll_loop()
+        return
+    watcher = ClipboardWatcher(timeout=args.timeout or None)
+    sys.exit(watcher.run())
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,14 @@
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Literal
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Literal, Sequence, Union
+import functools
+import html
 import typing
 
+if TYPE_CHECKING:
+    from slack_copy.payloads import Payload
+
 Style = Literal["bold", "italic", "underline", "strikethrough", "code"]
 STYLES: tuple[Style, ...] = typing.get_args(Style)
 STYLE_TO_TAG = {
@@ -14,54 +19,223 @@ STYLE_TO_TAG = {
     "code": "code",
 }
 
-@dataclass
+# Shared by every leaf, so leaves don't each allocate an empty list.
+EMPTY_CHILDREN: tuple["AMNode", ...] = ()
+
+_INTERNED_STYLES: dict[tuple[Style, ...], tuple[Style, ...]] = {}
+
+
+def intern_styles(styles: Iterable[Style]) -> tuple[Style, ...]:
+    """Return a shared tuple for a combination of styles.
+
+    There are only a handful of distinct combinations, so every node with the
+    same styles points at the same tuple.
+    """
+    styles = tuple(styles)
+    return _INTERNED_STYLES.setdefault(styles, styles)
+
+
+# Texts up to this long (mostly the whitespace between tags) are shared
+# between the leaves of a tree. The table is cleared after each parse (see
+# `clear_shared_texts`), and bounded for nodes built outside of one, so it
+# doesn't keep pasted text alive.
+SHARE_MAX_LENGTH = 32
+MAX_SHARED_TEXTS = 100_000
+_SHARED_TEXTS: dict[str, str] = {}
+
+
+def own_text(text: str) -> str:
+    """Return text as a plain str, shared with other nodes if it's short.
+
+    Parsers can hand over str subclasses that point back into their document
+    (e.g. BeautifulSoup's NavigableString, which knows its parent and
+    siblings), and a node holding one would keep the whole document alive.
+    """
+    if text.__class__ is not str:
+        text = str.__str__(text)
+    if len(text) <= SHARE_MAX_LENGTH:
+        shared = _SHARED_TEXTS.get(text)
+        if shared is not None:
+            return shared
+        if len(_SHARED_TEXTS) < MAX_SHARED_TEXTS:
+            _SHARED_TEXTS[text] = text
+    return text
+
+
+def clear_shared_texts() -> None:
+    """Forget the texts shared so far, e.g. once a parse is finished.
+
+    Trees built afterwards don't share texts with earlier ones, which is only
+    a missed saving, so this is safe while other threads are parsing.
+    """
+    _SHARED_TEXTS.clear()
+
+
+@functools.cache
+def _field_names(cls: type) -> tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+# Items on the rendering stack: nodes still to render, or finished fragments.
+RenderItem = Union["AMNode", str]
+# Below this depth, AMNode.write_html recurses, which is the fastest way to
+# render; deeper subtrees are handed to the explicit-stack walker in iter_html.
+MAX_RENDER_RECURSION = 200
+
+
+@dataclass(slots=True)
 class AMNode(ABC):
     """
     Node in an AbstractMarkdownTree.
+
+    Nodes use __slots__, and styles are stored as interned tuples (see
+    `intern_styles`), to keep large trees small.
+
+    Rendering is split into `html_open`, the children and `html_close`, and
+    every fragment is written straight into one sink, so rendering never
+    builds intermediate strings for subtrees.
     """
     children: list["AMNode"]
+    # Whether a parent AMList wraps this node in <li> (nested lists aren't).
+    wrap_in_list_item = True
 
     @abstractmethod
-    def to_html(self) -> str:
+    def html_open(self) -> str:
         pass
 
-@dataclass
+    @abstractmethod
+    def html_close(self) -> str:
+        pass
+
+    def __reduce__(self):
+        # Pickle through __init__, so that unpickled nodes share interned
+        # styles again, and without a state dict per node.
+        return (self.__class__, tuple([getattr(self, name) for name in _field_names(self.__class__)]))
+
+    def push_html_children(self, stack: list[RenderItem]) -> None:
+        """Push the children onto the rendering stack, last child first."""
+        stack.extend(reversed(self.children))
+
+    def write_html(self, write: Callable[[str], object], depth: int = 0) -> None:
+        """Write the html for this subtree into a sink."""
+        if depth > MAX_RENDER_RECURSION:
+            for fragment in iter_html(self):
+                write(fragment)
+            return
+        write(self.html_open())
+        for child in self.children:
+            child.write_html(write, depth + 1)
+        write(self.html_close())
+
+    def to_html(self) -> str:
+        buffer: list[str] = []
+        self.write_html(buffer.append)
+        return "".join(buffer)
+
+
+def iter_html(root: AMNode) -> Iterator[str]:
+    """Yield the html for a tree as a stream of fragments.
+
+    Uses an explicit stack, so rendering time is linear in the size of the
+    tree and deep trees can't hit the recursion limit.
+    """
+    stack: list[RenderItem] = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        item = pop()
+        if item.__class__ is str:
+            yield item
+            continue
+        if item.__class__ is AMLeaf:
+            yield item.html_open()
+            continue
+        if item.__class__ is AMImage:
+            yield from item.html_fragments()
+            continue
+        opening = item.html_open()
+        if opening:
+            yield opening
+        closing = item.html_close()
+        if closing:
+            push(closing)
+        item.push_html_children(stack)
+
+
+def write_html(root: AMNode, write: Callable[[str], object]) -> None:
+    """Write the html for a tree into a sink, e.g. `list.append` or `io.StringIO.write`."""
+    root.write_html(write)
+
+
+@functools.lru_cache(maxsize=None)
+def _style_tags(styles: tuple[Style, ...]) -> tuple[str, str]:
+    """The opening and closing tags for some styles (the first style is innermost)."""
+    opening = "".join(f"<{STYLE_TO_TAG[style]}>" for style in reversed(styles))
+    closing = "".join(f"</{STYLE_TO_TAG[style]}>" for style in styles)
+    return opening, closing
+
+
+def _wrap_styles(styles: tuple[Style, ...], url: str | None) -> tuple[str, str]:
+    """The fragments that go before and after content with these styles and link."""
+    opening, closing = _style_tags(styles)
+    if url is not None:
+        return f'{opening}<a href="{url}">', f"</a>{closing}"
+    return opening, closing
+
+
+@dataclass(slots=True)
 class AMLeaf(AMNode):
     """
     Leaf node in an AbstractMarkdownTree.
 
     If a url is given, the text should be a hyperlink.
+
+    Leaves share `EMPTY_CHILDREN` instead of each holding an empty list, and
+    own their text as a plain str (see `own_text`).
     """
     text: str
-    styles: list[Style]
+    styles: Sequence[Style]
     url: str | None = None
     
     def __post_init__(self):
-        assert self.children == [], "Leaf nodes cannot have children"
-
-    def to_html(self) -> str:
-        """Iteratively build the html for this leaf"""
-        html = self.text
+        assert not self.children, "Leaf nodes cannot have children"
+        self.children = EMPTY_CHILDREN  # type: ignore
+        self.styles = intern_styles(self.styles)
+        self.text = own_text(self.text)
         if self.url is not None:
-            html = f'<a href="{self.url}">{html}</a>'
-        for style in self.styles:
-            tag = STYLE_TO_TAG[style]
-            html = f"<{tag}>{html}</{tag}>"
+            self.url = own_text(self.url)
+
+    def html_open(self) -> str:
+        if not self.styles and self.url is None:
+            return self.text
+        opening, closing = _wrap_styles(self.styles, self.url)
+        return f"{opening}{self.text}{closing}"
+
+    def html_close(self) -> str:
+        return ""
 
-        return html
+    def write_html(self, write: Callable[[str], object], depth: int = 0) -> None:
+        write(self.html_open())
 
-@dataclass
+@dataclass(slots=True)
 class AMParagraph(AMNode):
     """
     Paragraph node in an AbstractMarkdownTree.
 
     Similar to p in HTML.
     """
-    styles: list[Style]
-    def to_html(self) -> str:
-        return f"<p>{''.join(child.to_html() for child in self.children)}</p>"
+    styles: Sequence[Style]
+
+    def __post_init__(self):
+        self.styles = intern_styles(self.styles)
+
+    def html_open(self) -> str:
+        return "<p>"
+
+    def html_close(self) -> str:
+        return "</p>"
 
-@dataclass
+@dataclass(slots=True)
 class AMContainer(AMNode):
     """
     Container node in an AbstractMarkdownTree.
@@ -72,13 +246,18 @@ class AMContainer(AMNode):
 
     If a url is given, the container should be a hyperlink tag (<a>).
     """
-    styles: list[Style]
+    styles: Sequence[Style]
 
-    def to_html(self) -> str:
-        content = "".join(child.to_html() for child in self.children)
-        return f'<div>{content}</div>'
+    def __post_init__(self):
+        self.styles = intern_styles(self.styles)
+
+    def html_open(self) -> str:
+        return "<div>"
 
-@dataclass
+    def html_close(self) -> str:
+        return "</div>"
+
+@dataclass(slots=True)
 class AMSpan(AMNode):
     """
     Span node in an AbstractMarkdownTree.
@@ -87,21 +266,22 @@ class AMSpan(AMNode):
     
     NOTE: These spans do not have a newline, unlike container.
     """
-    styles: list[Style]
+    styles: Sequence[Style]
     url: str | None = None
 
-    def to_html(self) -> str:
-        content = "".join(child.to_html() for child in self.children)
+    def __post_init__(self):
+        self.styles = intern_styles(self.styles)
         if self.url is not None:
-            content = f'<a href="{self.url}">{content}</a>'
-        for style in self.styles:
-            tag = STYLE_TO_TAG[style]
-            content = f"<{tag}>{content}</{tag}>"
+            self.url = own_text(self.url)
+
+    def html_open(self) -> str:
+        return f"<span>{_wrap_styles(self.styles, self.url)[0]}"
 
-        return f"<span>{content}</span>"
+    def html_close(self) -> str:
+        return f"{_wrap_styles(self.styles, self.url)[1]}</span>"
 
 
-@dataclass
+@dataclass(slots=True)
 class AMList(AMNode):
     """
     List node in an AbstractMarkdownTree.
@@ -117,21 +297,39 @@ class AMList(AMNode):
     """
     ordered: bool
     data_indent: int | None = None
+    wrap_in_list_item = False
 
 
-    def to_html(self) -> str:
-        list_type = "ol" if self.ordered else "ul"
-        list_html = ""
-        # generate html iteratively (to handle nested lists)
+    def html_open(self) -> str:
+        return "<ol>" if self.ordered else "<ul>"
+
+    def html_close(self) -> str:
+        return "</ol>" if self.ordered else "</ul>"
+
+    def write_html(self, write: Callable[[str], object], depth: int = 0) -> None:
+        if depth > MAX_RENDER_RECURSION:
+            super(AMList, self).write_html(write, depth)
+            return
+        write(self.html_open())
+        # Nested lists go straight inside the list; everything else is an item.
         for child in self.children:
-            child_html = child.to_html()
-            if isinstance(child, AMList):
-                list_html += f"{child_html}"
+            if child.wrap_in_list_item:
+                write("<li>")
+                child.write_html(write, depth + 1)
+                write("</li>")
             else:
-                list_html += f"<li>{child_html}</li>"
-        return f"<{list_type}>{list_html}</{list_type}>"
+                child.write_html(write, depth + 1)
+        write(self.html_close())
 
-@dataclass
+    def push_html_children(self, stack: list[RenderItem]) -> None:
+        # Nested lists go straight inside the list; everything else is an item.
+        for child in reversed(self.children):
+            if child.wrap_in_list_item:
+                stack += ("</li>", child, "<li>")
+            else:
+                stack.append(child)
+
+@dataclass(slots=True)
 class AMListElement(AMNode):
     """
     Element in a list node in an AbstractMarkdownTree.
@@ -145,5 +343,46 @@ class AMListElement(AMNode):
     """
     ql_indent: int = 0
 
-    def to_html(self) -> str:
-        return "".join(child.to_html() for child in self.children)
\ No newline at end of file
+    def html_open(self) -> str:
+        return ""
+
+    def html_close(self) -> str:
+        return ""
+
+
+@dataclass(slots=True)
+class AMImage(AMNode):
+    """
+    Image node in an AbstractMarkdownTree.
+
+    Similar to img in HTML. Large inline images (data URIs) keep their src as
+    a `Payload`, which is written into the HTML as it is, without escaping or
+    copying it into the tag; see `slack_copy.payloads`.
+    """
+    src: "str | Payload"
+    alt: str = ""
+
+    def __post_init__(self):
+        assert not self.children, "Image nodes cannot have children"
+        self.children = EMPTY_CHILDREN  # type: ignore
+        if isinstance(self.src, str):
+            self.src = own_text(self.src)
+        self.alt = own_text(self.alt)
+
+    def html_fragments(self) -> tuple[str, ...]:
+        """The html for the image, with a payload src as a fragment of its own."""
+        alt = html.escape(self.alt)
+        if self.src.__class__ is str:
+            return (f'<img src="{html.escape(self.src)}" alt="{alt}">',)  # type: ignore
+        # Payloads are only extracted if they need no escaping.
+        return ('<img src="', self.src.text, f'" alt="{alt}">')  # type: ignore
+
+    def html_open(self) -> str:
+        return "".join(self.html_fragments())
+
+    def html_close(self) -> str:
+        return ""
+
+    def write_html(self, write: Callable[[str], object], depth: int = 0) -> None:
+        for fragment in self.html_fragments():
+            write(fragment)
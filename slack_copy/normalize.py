@@ -0,0 +1,203 @@
+"""Simplify an AMNode tree before rendering, without changing how it displays.
+
+Parsers build one node per HTML tag, so Google Docs pastes in particular turn
+into chains of style-less spans around single leaves, each of which renders
+as a `<span>`. `normalize` rewrites the tree bottom-up to:
+
+- unwrap spans with no styles or link, splicing their children into the parent;
+- unwrap style-less containers around a single block (paragraph, container
+  or list);
+- hoist styles shared by all of a span's children onto the span;
+- fold a span around a single leaf or span into that child;
+- merge adjacent leaves with the same styles and link.
+
+Lists are treated carefully, since each child of an AMList renders as its own
+`<li>`: children of a list are never merged or spliced into several items.
+"""
+from dataclasses import dataclass
+
+from slack_copy.nodes import (
+    EMPTY_CHILDREN,
+    AMContainer,
+    AMLeaf,
+    AMList,
+    AMNode,
+    AMParagraph,
+    AMSpan,
+    intern_styles,
+)
+
+BLOCK_NODES = frozenset([AMParagraph, AMContainer, AMList])
+INLINE_NODES = frozenset([AMLeaf, AMSpan])
+
+
+@dataclass
+class NormalizationStats:
+    """How much `normalize` shrank a tree."""
+    nodes_before: int
+    nodes_after: int
+
+    @property
+    def nodes_removed(self) -> int:
+        return self.nodes_before - self.nodes_after
+
+    @property
+    def reduction(self) -> float:
+        """The fraction of nodes removed."""
+        return self.nodes_removed / self.nodes_before if self.nodes_before else 0.0
+
+
+def normalize(root: AMNode) -> tuple[AMNode, NormalizationStats]:
+    """Simplify a tree in place.
+
+    Uses an explicit stack, so deep trees can't hit the recursion limit.
+
+    Args:
+        root: The root of the tree. Its nodes are modified and may be reused
+            in the result, so the original tree shouldn't be used afterwards.
+
+    Returns:
+        The new root (which may be a descendant of the old one), and stats on
+        how much the tree shrank.
+    """
+    # Pre-order, so reversing it visits children before their parents.
+    order: list[AMNode] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children)
+    for node in reversed(order):
+        if node.children:
+            _normalize_children(node)
+
+    new_root = _simplify_children([root], parent_is_list=False)
+    # A root span can only be unwrapped into a single node.
+    root = new_root[0] if len(new_root) == 1 else root
+    return root, NormalizationStats(len(order), count_nodes(root))
+
+# Node types are compared with `__class__ is` rather than isinstance, which is
+# much slower for the ABC-derived node classes.
+
+
+def count_nodes(root: AMNode) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def _normalize_children(node: AMNode) -> None:
+    """Simplify a node's children, whose own children are already simplified."""
+    parent_is_list = node.__class__ is AMList
+    children = _simplify_children(node.children, parent_is_list)
+    if node.__class__ is AMSpan:
+        shared = _shared_styles(children)
+        if shared:
+            node.styles = intern_styles(shared + tuple(node.styles))
+            children = _simplify_children([_without_styles(c, shared) for c in children], False)
+    if not parent_is_list:
+        children = _merge_leaves(children)
+    node.children = children
+
+
+def _simplify_children(children: list[AMNode], parent_is_list: bool) -> list[AMNode]:
+    result: list[AMNode] = []
+    for child in children:
+        cls = child.__class__
+        if cls is AMLeaf:
+            result.append(child)
+            continue
+        if cls is AMSpan:
+            child = _fold_span(child)
+            if child.__class__ is AMSpan and not child.styles and child.url is None:
+                if not parent_is_list:
+                    result.extend(child.children)
+                    continue
+                if len(child.children) == 1 and child.children[0].wrap_in_list_item:
+                    result.append(child.children[0])
+                    continue
+        elif (
+            cls is AMContainer
+            and not child.styles
+            and len(child.children) == 1
+            and child.children[0].__class__ in BLOCK_NODES
+            and not (parent_is_list and child.children[0].__class__ is AMList)
+        ):
+            result.append(child.children[0])
+            continue
+        result.append(child)
+    return result
+
+
+def _fold_span(span: AMSpan) -> AMNode:
+    """Fold a span around a single leaf or span into that child, if both can't be links."""
+    if len(span.children) != 1:
+        return span
+    child = span.children[0]
+    if child.__class__ not in INLINE_NODES or (span.url is not None and child.url is not None):
+        return span
+    if not span.styles and span.url is None:
+        return child
+    styles = intern_styles(
+        tuple(child.styles) + tuple(s for s in span.styles if s not in child.styles)
+    )
+    url = child.url if child.url is not None else span.url
+    if child.__class__ is AMLeaf:
+        return AMLeaf(children=EMPTY_CHILDREN, text=child.text, styles=styles, url=url)
+    child.styles = styles
+    child.url = url
+    return child
+
+
+def _shared_styles(children: list[AMNode]) -> tuple:
+    """The styles that every child has, if there are several inline children."""
+    if len(children) < 2 or not all(c.__class__ in INLINE_NODES for c in children):
+        return ()
+    shared = set(children[0].styles)  # type: ignore
+    for child in children[1:]:
+        shared.intersection_update(child.styles)  # type: ignore
+        if not shared:
+            return ()
+    return tuple(s for s in children[0].styles if s in shared)  # type: ignore
+
+
+def _without_styles(node: AMNode, styles: tuple) -> AMNode:
+    remaining = tuple(s for s in node.styles if s not in styles)  # type: ignore
+    if node.__class__ is AMLeaf:
+        return AMLeaf(children=EMPTY_CHILDREN, text=node.text, styles=remaining, url=node.url)
+    node.styles = intern_styles(remaining)  # type: ignore
+    return node
+
+
+def _mergeable(previous: AMNode, child: AMNode) -> bool:
+    return (
+        child.__class__ is AMLeaf
+        and previous.__class__ is AMLeaf
+        and child.styles is previous.styles  # type: ignore
+        and child.url == previous.url  # type: ignore
+    )
+
+
+def _merge_leaves(children: list[AMNode]) -> list[AMNode]:
+    if len(children) < 2 or not any(_mergeable(a, b) for a, b in zip(children, children[1:])):
+        return children
+    # Group runs of mergeable leaves, then join each run's text once.
+    runs: list[list[AMNode]] = []
+    for child in children:
+        if runs and _mergeable(runs[-1][-1], child):
+            runs[-1].append(child)
+        else:
+            runs.append([child])
+    result: list[AMNode] = []
+    for run in runs:
+        first = run[0]
+        if len(run) == 1:
+            result.append(first)
+            continue
+        text = "".join(leaf.text for leaf in run)  # type: ignore
+        result.append(AMLeaf(children=EMPTY_CHILDREN, text=text, styles=first.styles, url=first.url))  # type: ignore
+    return result
@@ -0,0 +1,240 @@
+"""Read Obsidian-flavored markdown straight into an AMNode tree.
+
+`parse_obsidian_markdown` turns markdown into HTML with the `markdown`
+package, which then has to be parsed again. For the markdown that Obsidian
+notes are mostly made of (paragraphs, `-` and `1.` lists nested with tabs,
+and `*`, `**`, backtick and `[text](url)` inline markup), this module builds
+the same tree in one pass over the lines, including the newline leaves that
+the HTML round trip produces between blocks.
+
+Anything else (headings, quotes, code blocks, loose lists, items after an
+item with a nested list, a list at the start of the text, runs of spaces or
+backticks, raw HTML, escapes, ...) is reported as unsupported, and the
+caller falls back to the HTML round trip. (The round trip's preprocessing
+can make the items of a list at the start loose paragraphs, so those are
+left to it.)
+"""
+import re
+
+from slack_copy.nodes import (
+    EMPTY_CHILDREN,
+    AMContainer,
+    AMLeaf,
+    AMList,
+    AMListElement,
+    AMNode,
+    AMParagraph,
+    AMSpan,
+    clear_shared_texts,
+)
+
+_LIST_ITEM = re.compile(r"(\t*)(-|\d+\.) (.*)")
+# Lines that start a construct we don't read: indentation, headings, quotes,
+# raw HTML, tables, fences, rules and other list markers, setext underlines,
+# and reference definitions.
+_UNSUPPORTED_START = re.compile(r"[ \t#>|<`~*+_=-]|\d+[.)](?:\s|$)|\[[^\]]*\]:")
+_LINK = re.compile(r"\[([^\[\]]+)\]\(([^()\s<>]+)\)")
+_ENTITY = re.compile(r"&(?:#\d+|#[xX][0-9a-fA-F]+|\w+);")
+# Characters that can never appear in plain text that we read. Backslashes
+# are escapes, < starts raw HTML or autolinks, tabs are expanded by markdown.
+_UNSUPPORTED_CHARS = frozenset("\\<\t")
+
+
+class UnsupportedMarkdown(Exception):
+    """The markdown uses a construct that `read_obsidian_markdown` doesn't handle."""
+
+
+def read_obsidian_markdown(text: str) -> AMNode | None:
+    """Build the tree for Obsidian markdown without going through HTML.
+
+    Args:
+        text: The markdown.
+
+    Returns:
+        The root of the tree, the same as `from_obsidian(text, is_html=False)`
+        would build, or None if the text uses markdown that isn't supported
+        here (or is empty).
+    """
+    try:
+        blocks = _read_blocks(text.replace("\r\n", "\n").replace("\r", "\n").split("\n"))
+    except UnsupportedMarkdown:
+        return None
+    finally:
+        clear_shared_texts()
+    if not blocks:
+        return None
+    if len(blocks) == 1:
+        return blocks[0]
+    children: list[AMNode] = [blocks[0]]
+    for block in blocks[1:]:
+        children.append(_newline())
+        children.append(block)
+    return AMContainer(children=children, styles=[])
+
+
+def _newline() -> AMLeaf:
+    return AMLeaf(children=EMPTY_CHILDREN, text="\n", styles=[])
+
+
+def _read_blocks(lines: list[str]) -> list[AMNode]:
+    blocks: list[AMNode] = []
+    paragraph: list[str] = []
+    # The open lists, outermost first, each with its last item.
+    open_lists: list[tuple[AMList, AMListElement]] = []
+    after_blank = False
+
+    def end_paragraph() -> None:
+        if paragraph:
+            blocks.append(AMParagraph(children=parse_inline("\n".join(paragraph)), styles=[]))
+            paragraph.clear()
+
+    for line in lines:
+        if not line.strip():
+            end_paragraph()
+            after_blank = True
+            continue
+        if line.endswith("  "):
+            # A line break, or trailing spaces that markdown trims unevenly.
+            raise UnsupportedMarkdown(line)
+
+        match = _LIST_ITEM.fullmatch(line)
+        if match is None:
+            if _UNSUPPORTED_START.match(line):
+                raise UnsupportedMarkdown(line)
+            # Text straight after a list starts a new paragraph.
+            open_lists.clear()
+            paragraph.append(line)
+            after_blank = False
+            continue
+
+        end_paragraph()
+        if not blocks:
+            # A list at the start, which the HTML round trip may make loose.
+            raise UnsupportedMarkdown(line)
+        indent, marker, content = match.groups()
+        level = len(indent)
+        ordered = marker != "-"
+        if after_blank and open_lists:
+            # Markdown would make this a loose list.
+            raise UnsupportedMarkdown(line)
+        if level > len(open_lists):
+            raise UnsupportedMarkdown(line)
+        # Whether the previous item at this level has a nested list.
+        after_nested_list = len(open_lists) > level + 1
+        del open_lists[level + 1:]
+
+        if level == len(open_lists):
+            amlist = AMList(children=[_newline()], ordered=ordered)
+            if level == 0:
+                blocks.append(amlist)
+            else:
+                parent_item = open_lists[-1][1]
+                parent_item.children.append(amlist)
+                parent_item.children.append(_newline())
+        else:
+            amlist = open_lists[level][0]
+            if amlist.ordered != ordered:
+                if level > 0:
+                    raise UnsupportedMarkdown(line)
+                amlist = AMList(children=[_newline()], ordered=ordered)
+                blocks.append(amlist)
+            elif after_nested_list:
+                # An item after one with a nested list: markdown makes the
+                # list loose.
+                raise UnsupportedMarkdown(line)
+            del open_lists[level:]
+
+        content = content.lstrip(" ")
+        if not content or _UNSUPPORTED_START.match(content):
+            raise UnsupportedMarkdown(line)
+        item = AMListElement(children=parse_inline(content))
+        amlist.children.append(item)
+        amlist.children.append(_newline())
+        open_lists.append((amlist, item))
+        after_blank = False
+
+    end_paragraph()
+    return blocks
+
+
+def parse_inline(text: str) -> list[AMNode]:
+    """Parse inline markdown into leaves and spans, as HTMLParser would parse its HTML.
+
+    Raises:
+        UnsupportedMarkdown: The text uses inline markup we don't handle, such
+            as nested emphasis, underscores or escapes.
+    """
+    nodes: list[AMNode] = []
+    literal: list[str] = []
+
+    def flush() -> None:
+        if literal:
+            nodes.append(AMLeaf(children=EMPTY_CHILDREN, text="".join(literal), styles=[]))
+            literal.clear()
+
+    if "  " in text:
+        # Runs of spaces are collapsed differently around inline markup.
+        raise UnsupportedMarkdown(text)
+    i = 0
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char == "`":
+            end = text.find("`", i + 1)
+            code = text[i + 1:end].strip()
+            if end == -1 or end == i + 1 or not code or text.startswith("`", end + 1):
+                # Runs of backticks delimit code spans of their own length.
+                raise UnsupportedMarkdown(text)
+            flush()
+            nodes.append(_styled([code], "code"))
+            i = end + 1
+        elif char == "*":
+            width = 2 if text.startswith("**", i) else 1
+            end = text.find("*" * width, i + width)
+            inner = text[i + width:end]
+            if (
+                end == -1
+                or not inner
+                or inner != inner.strip()
+                or any(c in inner for c in "*`[")
+            ):
+                raise UnsupportedMarkdown(text)
+            _check_literal(inner)
+            flush()
+            nodes.append(_styled([inner], "bold" if width == 2 else "italic"))
+            i = end + width
+        elif char == "[":
+            match = _LINK.match(text, i)
+            if match is None:
+                literal.append(char)
+                i += 1
+                continue
+            flush()
+            nodes.append(AMSpan(children=parse_inline(match.group(1)), styles=[], url=match.group(2)))
+            i = match.end()
+        else:
+            if (
+                char in _UNSUPPORTED_CHARS
+                or (char == "_" and not (_is_word(text, i - 1) and _is_word(text, i + 1)))
+                or (char == "!" and text.startswith("[", i + 1))
+                or (char == "&" and _ENTITY.match(text, i))
+            ):
+                raise UnsupportedMarkdown(text)
+            literal.append(char)
+            i += 1
+    flush()
+    return nodes
+
+
+def _styled(texts: list[str], style: str) -> AMSpan:
+    leaves: list[AMNode] = [AMLeaf(children=EMPTY_CHILDREN, text=t, styles=[]) for t in texts]
+    return AMSpan(children=leaves, styles=[style])  # type: ignore
+
+
+def _check_literal(text: str) -> None:
+    if any(c in _UNSUPPORTED_CHARS or c == "_" or c == "&" for c in text):
+        raise UnsupportedMarkdown(text)
+
+
+def _is_word(text: str, i: int) -> bool:
+    return 0 <= i < len(text) and text[i].isalnum()
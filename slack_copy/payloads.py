@@ -0,0 +1,134 @@
+"""Keep large inline payloads (e.g. data-URI images) out of the parsing pipeline.
+
+Web pastes embed images as `<img src="data:image/png;base64,...">`, where the
+attribute alone can be megabytes. Before parsing, `extract_payloads` swaps
+each large `data:` attribute value for a short placeholder and takes the
+value out as a `Payload`. The parser backends (and the worker processes of
+the "parallel" backend) then only ever see the placeholders, and
+`resolve_payloads` points the finished tree's AMImage nodes at the payloads,
+which rendering writes out as they are. So each payload is copied once out
+of the pasted HTML and once into the output, and the tree doesn't keep the
+pasted HTML alive.
+
+Only values that are literally an attribute's value, and can be written back
+without escaping, are extracted: ones containing `&` (entities), `<` or `"`,
+or whose tag starts too far back to check that they're inside it, are left
+in place for the parser.
+"""
+from typing import TYPE_CHECKING
+
+from slack_copy.nodes import AMImage
+
+if TYPE_CHECKING:
+    from slack_copy.nodes import AMNode
+
+# Attribute values at least this long (in characters) are extracted.
+PAYLOAD_THRESHOLD = 4096
+PLACEHOLDER_PREFIX = "slack-copy-payload:"
+# How far back from a value to look for the start of its tag.
+MAX_TAG_LOOKBACK = 4096
+_SPACES = " \t\n\r\f"
+
+
+class Payload:
+    """A large attribute value taken out of the HTML, which is written out without escaping.
+
+    Args:
+        text: The value.
+    """
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"Payload({self.text[:30]!r}..., {len(self.text)} characters)"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Payload):
+            # Compares the strings in place (and identical ones by identity).
+            return self.text == other.text
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # Strings cache their hash, so this is only computed once.
+        return hash(self.text)
+
+    def __reduce__(self):
+        return (Payload, (self.text,))
+
+
+def extract_payloads(text: str, threshold: int = PAYLOAD_THRESHOLD) -> tuple[str, list[Payload]]:
+    """Replace large `data:` attribute values with placeholders.
+
+    Returns:
+        The HTML with the placeholders (the text itself if nothing was
+        extracted), and the payloads, where the placeholder for
+        `payloads[i]` is `f"{PLACEHOLDER_PREFIX}{i}"`.
+    """
+    payloads: list[Payload] = []
+    parts: list[str] = []
+    last = 0
+    position = text.find("data:")
+    while position != -1:
+        next_position = position + 5
+        quote = text[position - 1] if position > 0 else ""
+        if quote in ('"', "'") and _is_attribute_value(text, position - 1):
+            end = text.find(quote, position)
+            if (
+                end - position >= threshold
+                and text.find("<", position, end) == -1
+                and text.find("&", position, end) == -1
+                and text.find('"', position, end) == -1
+            ):
+                parts.append(text[last:position])
+                parts.append(f"{PLACEHOLDER_PREFIX}{len(payloads)}")
+                payloads.append(Payload(text[position:end]))
+                last = next_position = end
+        position = text.find("data:", next_position)
+    if not payloads:
+        return text, payloads
+    parts.append(text[last:])
+    return "".join(parts), payloads
+
+
+def _is_attribute_value(text: str, quote_index: int) -> bool:
+    """Whether the quote at an index opens an attribute value: it follows an `=`, inside a tag."""
+    index = quote_index - 1
+    while index >= 0 and text[index] in _SPACES:
+        index -= 1
+    if index < 0 or text[index] != "=":
+        return False
+    window_start = max(0, index - MAX_TAG_LOOKBACK)
+    return text.rfind("<", window_start, index) > text.rfind(">", window_start, index)
+
+
+def resolve_payloads(root: "AMNode", payloads: list[Payload]) -> None:
+    """Point the images in a tree at their payloads, and restore links to them, in place."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.__class__ is AMImage:
+            node.src = lookup_payload(node.src, payloads)  # type: ignore
+        else:
+            # Links to data URIs are rare, so they just get their text back.
+            url = getattr(node, "url", None)
+            if url is not None and url.startswith(PLACEHOLDER_PREFIX):
+                node.url = str(lookup_payload(url, payloads))  # type: ignore
+        stack.extend(node.children)
+
+
+def lookup_payload(value: "str | Payload", payloads: list[Payload]) -> "str | Payload":
+    """The payload a placeholder stands for, or the value itself if it isn't one."""
+    if value.__class__ is not str or not value.startswith(PLACEHOLDER_PREFIX):  # type: ignore
+        return value
+    index = value[len(PLACEHOLDER_PREFIX):]  # type: ignore
+    if index.isdigit() and int(index) < len(payloads):
+        return payloads[int(index)]
+    return value
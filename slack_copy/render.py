@@ -0,0 +1,323 @@
+"""Render a tree to HTML, plain text and markdown in a single traversal.
+
+`render_formats` walks the tree once with an explicit stack. HTML is written
+as it goes, the same as `AMNode.to_html`. The other formats are line-based,
+so they share one `_LineLayout`, which collects each line's inline runs and
+works out its list marker and indentation once, then lets each
+`LineFormat` write the line its own way:
+
+- Plain text puts each block on its own line, with bullets and numbering for
+  list items, indented by nesting depth.
+- Markdown is Obsidian-flavored, the way `obsidian_reader` reads it: `-` and
+  `1.` list items nested with tabs, `*`, `**`, `~~` and backticks for styles,
+  `<u>` for underline, `[text](url)` for links and `![alt](url)` for images.
+
+Inline images (data URIs) are only written into the HTML, so their payload is
+copied once; the other formats get their alt text.
+
+Styles and links come from leaves and the spans around them; containers and
+paragraphs don't render styles in HTML, so they don't here either.
+Whitespace is collapsed as a browser would, and lines that end up empty
+(e.g. the whitespace between list items in pretty-printed HTML) are dropped.
+"""
+from dataclasses import dataclass
+import re
+from typing import Iterable
+
+from slack_copy.nodes import AMImage, AMLeaf, AMList, AMNode, AMParagraph, AMSpan, Style
+
+FORMATS = ("html", "text", "markdown")
+# Markdown markers, outermost first; code is innermost since nothing inside
+# a code span is parsed.
+MARKDOWN_MARKERS: dict[Style, tuple[str, str]] = {
+    "strikethrough": ("~~", "~~"),
+    "underline": ("<u>", "</u>"),
+    "bold": ("**", "**"),
+    "italic": ("*", "*"),
+    "code": ("`", "`"),
+}
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>])")
+# HTML collapses these, but not e.g. non-breaking spaces.
+_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+
+# An inline run of a line: its text, all the styles it has, its link, and
+# the image it is (for which the text is the alt text), if any.
+Run = tuple[str, frozenset[Style], "str | None", "AMImage | None"]
+
+# Rendering events: a node to open, a node to close, or a list item boundary.
+_OPEN, _CLOSE, _OPEN_ITEM, _CLOSE_ITEM = range(4)
+
+
+@dataclass
+class RenderedFormats:
+    """A tree rendered to each format ("" for formats that weren't asked for)."""
+    html: str = ""
+    text: str = ""
+    markdown: str = ""
+
+
+class LineFormat:
+    """Plain text: the text of each line, with bullets and numbers for list items.
+
+    Attributes:
+        indent: The indentation per level of list nesting.
+        bullet: The marker for items of unordered lists.
+    """
+    indent = "    "
+    bullet = "•"
+
+    def inline(self, runs: list[Run], text: str) -> str:
+        """Write a line's runs, given their concatenated text."""
+        return text
+
+
+class MarkdownFormat(LineFormat):
+    """Obsidian-flavored markdown."""
+    indent = "\t"
+    bullet = "-"
+
+    def inline(self, runs: list[Run], text: str) -> str:
+        if all(not styles and url is None and image is None for _, styles, url, image in runs):
+            return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+        # Merge runs with the same styles and link, so markers aren't closed
+        # and reopened between them (which markdown would misread).
+        parts: list[str] = []
+        texts: list[str] = []
+        styles: frozenset[Style] = frozenset()
+        url = None
+        for run_text, run_styles, run_url, image in runs:
+            if image is None and texts and run_styles == styles and run_url == url:
+                texts.append(run_text)
+                continue
+            if texts:
+                parts.append(_markdown_run("".join(texts), styles, url))
+                texts = []
+            if image is not None:
+                parts.append(_markdown_image(image))
+                continue
+            texts = [run_text]
+            styles, url = run_styles, run_url
+        if texts:
+            parts.append(_markdown_run("".join(texts), styles, url))
+        return "".join(parts)
+
+
+def _markdown_run(text: str, styles: frozenset[Style], url: str | None) -> str:
+    content = text.strip(" \t\n\r\f")
+    if not content:
+        return text
+    if not styles and url is None:
+        return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+    # Markers must hug the text, so whitespace goes outside them.
+    leading = text[:text.index(content[0])]
+    trailing = text[len(leading) + len(content):]
+    if "code" in styles:
+        content = f"`{content}`" if "`" not in content else f"`` {content} ``"
+    else:
+        content = _MARKDOWN_SPECIAL.sub(r"\\\1", content)
+    if url is not None:
+        target = f"<{url}>" if any(c in url for c in " ()") else url
+        content = f"[{content}]({target})"
+    for style, (opening, closing) in reversed(MARKDOWN_MARKERS.items()):
+        if style in styles and style != "code":
+            content = f"{opening}{content}{closing}"
+    return f"{leading}{content}{trailing}"
+
+
+def _markdown_image(image: AMImage) -> str:
+    alt = _MARKDOWN_SPECIAL.sub(r"\\\1", image.alt)
+    src = image.src
+    if src.__class__ is not str or src.startswith("data:"):  # type: ignore
+        return alt
+    target = f"<{src}>" if any(c in src for c in " ()") else src  # type: ignore
+    return f"![{alt}]({target})"
+
+
+FORMAT_CLASSES = {"text": LineFormat, "markdown": MarkdownFormat}
+
+
+class _ListFrame:
+    """A list being laid out, and where we are in its current item."""
+    __slots__ = ("ordered", "count", "item_pending", "in_item")
+
+    def __init__(self, ordered: bool) -> None:
+        self.ordered = ordered
+        # Items numbered so far; blank items aren't numbered.
+        self.count = 0
+        # Whether the next line starts an item, and whether it has been started.
+        self.item_pending = False
+        self.in_item = False
+
+
+class _LineLayout:
+    """Lays blocks out as lines for one or more `LineFormat`s."""
+
+    def __init__(self, formats: dict[str, LineFormat]) -> None:
+        self.formats = formats
+        self.lines: dict[str, list[str]] = {name: [] for name in formats}
+        self.lists: list[_ListFrame] = []
+        # The styles and link of the spans we're inside, innermost last.
+        self.spans: list[tuple[frozenset[Style], str | None]] = [(frozenset(), None)]
+        self.runs: list[Run] = []
+        # Consecutive top-level paragraphs are separated by a blank line.
+        self.last_top_level_paragraph = False
+        self.starting_paragraph = False
+
+    def leaf(self, node: AMLeaf) -> None:
+        styles, url = self.spans[-1]
+        if node.styles:
+            styles = styles.union(node.styles)
+        if node.url is not None:
+            url = node.url
+        self.runs.append((node.text, styles, url, None))
+
+    def image(self, node: AMImage) -> None:
+        styles, url = self.spans[-1]
+        self.runs.append((node.alt, styles, url, node))
+
+    def open_span(self, node: AMSpan) -> None:
+        styles, url = self.spans[-1]
+        self.spans.append((styles.union(node.styles), node.url if node.url is not None else url))
+
+    def close_span(self) -> None:
+        self.spans.pop()
+
+    def open_block(self, node: AMNode) -> None:
+        if self.runs:
+            self.end_line()
+        if node.__class__ is AMList:
+            self.lists.append(_ListFrame(node.ordered))  # type: ignore
+        elif node.__class__ is AMParagraph and not self.lists:
+            self.starting_paragraph = True
+
+    def close_block(self, node: AMNode) -> None:
+        if self.runs:
+            self.end_line()
+        if node.__class__ is AMList:
+            self.lists.pop()
+        elif node.__class__ is AMParagraph and not self.lists:
+            self.last_top_level_paragraph = True
+
+    def open_item(self) -> None:
+        if self.runs:
+            self.end_line()
+        self.lists[-1].item_pending = True
+
+    def close_item(self) -> None:
+        if self.runs:
+            self.end_line()
+        frame = self.lists[-1]
+        frame.item_pending = frame.in_item = False
+
+    def end_line(self) -> None:
+        """Finish the current line, dropping it if it's blank (and has no images)."""
+        runs = self.runs
+        self.runs = []
+        text = "".join([run[0] for run in runs])
+        if not text.strip(" \t\n\r\f") and all(run[3] is None for run in runs):
+            return
+        # Indentation levels and marker before the line.
+        levels = 0
+        marker = None
+        if self.lists:
+            levels = len(self.lists) - 1
+            frame = self.lists[-1]
+            if frame.item_pending:
+                frame.count += 1
+                marker = f"{frame.count}." if frame.ordered else ""
+                frame.item_pending = False
+                frame.in_item = True
+            elif frame.in_item:
+                levels += 1
+        elif self.starting_paragraph and self.last_top_level_paragraph:
+            for lines in self.lines.values():
+                lines.append("")
+        self.last_top_level_paragraph = self.starting_paragraph = False
+
+        for name, line_format in self.formats.items():
+            line = _WHITESPACE.sub(" ", line_format.inline(runs, text)).strip(" ")
+            if marker is not None:
+                line = f"{marker or line_format.bullet} {line}"
+            self.lines[name].append(f"{line_format.indent * levels}{line}" if levels else line)
+
+    def results(self) -> dict[str, str]:
+        if self.runs:
+            self.end_line()
+        return {name: "\n".join(lines) for name, lines in self.lines.items()}
+
+
+def render_formats(root: AMNode, formats: Iterable[str] = FORMATS) -> RenderedFormats:
+    """Render a tree to several formats with one traversal.
+
+    Uses an explicit stack, so deep trees can't hit the recursion limit.
+
+    Args:
+        root: The root of the tree.
+        formats: Which of "html", "text" and "markdown" to render.
+    """
+    formats = set(formats)
+    html: list[str] | None = [] if "html" in formats else None
+    line_formats = {name: FORMAT_CLASSES[name]() for name in FORMATS if name in formats and name != "html"}
+    layout = _LineLayout(line_formats) if line_formats else None
+
+    stack: list[tuple[int, AMNode | None]] = [(_OPEN, root)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        event, node = pop()
+        if event == _OPEN:
+            cls = node.__class__
+            if cls is AMLeaf:
+                if html is not None:
+                    html.append(node.html_open())  # type: ignore
+                if layout is not None:
+                    layout.leaf(node)  # type: ignore
+                continue
+            if cls is AMImage:
+                if html is not None:
+                    html.extend(node.html_fragments())  # type: ignore
+                if layout is not None:
+                    layout.image(node)  # type: ignore
+                continue
+            if html is not None:
+                html.append(node.html_open())  # type: ignore
+            if layout is not None:
+                if cls is AMSpan:
+                    layout.open_span(node)  # type: ignore
+                else:
+                    layout.open_block(node)  # type: ignore
+            push((_CLOSE, node))
+            if cls is AMList:
+                for child in reversed(node.children):  # type: ignore
+                    if child.wrap_in_list_item:
+                        push((_CLOSE_ITEM, None))
+                        push((_OPEN, child))
+                        push((_OPEN_ITEM, None))
+                    else:
+                        push((_OPEN, child))
+            else:
+                stack.extend([(_OPEN, child) for child in reversed(node.children)])  # type: ignore
+        elif event == _CLOSE:
+            if html is not None:
+                html.append(node.html_close())  # type: ignore
+            if layout is not None:
+                if node.__class__ is AMSpan:
+                    layout.close_span()
+                else:
+                    layout.close_block(node)  # type: ignore
+        elif event == _OPEN_ITEM:
+            if html is not None:
+                html.append("<li>")
+            if layout is not None:
+                layout.open_item()
+        else:
+            if html is not None:
+                html.append("</li>")
+            if layout is not None:
+                layout.close_item()
+
+    rendered = RenderedFormats(html="".join(html) if html is not None else "")
+    if layout is not None:
+        for name, output in layout.results().items():
+            setattr(rendered, name, output)
+    return rendered
@@ -0,0 +1,331 @@
+"""Conversion server: `slack-copy serve`.
+
+Keeps warmed-up parsers in a pool of workers behind a Unix domain socket, so
+editor plugins and scripts can convert documents without paying for Python,
+bs4, lxml and markdown to start up on every call. `slack_copy.client` talks
+to it.
+
+The protocol is JSON lines. Each request is a JSON object on one line:
+
+- "html" and/or "text": the document, as in `slack-copy convert --jsonl`.
+- "source" (optional): the app it came from ("gdocs", "slack", "airtable",
+  or "obsidian" for markdown text), instead of detecting it.
+- "formats" (optional): the clipboard MIME formats offered with it, which
+  help detect the source.
+- "to" (optional): which of "html", "text" and "markdown" to render.
+  Defaults to all three.
+- "id" (optional): echoed back in the response.
+
+Each response is one line, with the rendered formats or an "error".
+Requests on a connection are answered in order; clients open several
+connections to have several documents converted at once.
+
+Workers decode, convert and encode each request, so the event loop only
+moves bytes. At most `max_pending` requests are being read or converted at
+once. A connection takes a slot when the first byte of a request arrives and
+only then reads the rest of it; until a slot frees up, at most
+`READ_BUFFER_BYTES` of each waiting connection are buffered, and clients wait
+on their writes instead of the server queueing unbounded work in memory.
+"""
+import argparse
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+import contextlib
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.batch import contents_from_record, make_executor
+from slack_copy.client import default_socket_path
+from slack_copy.main import HTML_CONVERTERS, ClipboardContents, cb_to_amtree, render_contents, text_to_amtree
+from slack_copy.render import FORMATS
+from slack_copy.telemetry import TELEMETRY, logger
+
+if TYPE_CHECKING:
+    import asyncio
+
+# asyncio is imported where it's used: `slack-copy` imports this module for
+# its arguments whatever the command, and asyncio takes ~50 ms to import.
+
+# The longest request line accepted; longer ones get an error and the
+# connection is closed.
+DEFAULT_MAX_REQUEST_BYTES = 64 * 1024 * 1024
+# How much of a connection is buffered before the server stops reading from
+# it. Requests are read in pieces of at most this size.
+READ_BUFFER_BYTES = 64 * 1024
+
+
+def request_to_amtree(request: dict, contents: ClipboardContents) -> AbstractMarkdownTree:
+    """Parse a request's document (its `contents_from_record`), using its source hint if it has one."""
+    if contents.html == "" and contents.text == "":
+        raise ValueError('Request has no "html" or "text"')
+    source = request.get("source")
+    if source is None:
+        return cb_to_amtree(contents)
+    if source == "obsidian" and contents.html == "":
+        return text_to_amtree(contents.text)
+    converter = HTML_CONVERTERS.get(source)
+    if converter is None or contents.html == "":
+        raise ValueError(f"Can't convert {'html' if contents.html else 'text'} from source {source!r}")
+    with TELEMETRY.stage("parse"):
+        return converter(contents.html)
+
+
+def convert_request(request: dict) -> dict:
+    """Convert one request, returning its response.
+
+    Failures are reported in the response rather than raised, as in
+    `batch.convert_item`.
+    """
+    response = {"id": request["id"]} if "id" in request else {}
+    try:
+        targets = request.get("to", FORMATS)
+        if isinstance(targets, str):
+            targets = [targets]
+        unknown = [target for target in targets if target not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown formats {unknown}; expected some of {list(FORMATS)}")
+        contents = contents_from_record(request)
+        amtree = request_to_amtree(request, contents)
+    except (TypeError, ValueError, NotImplementedError) as e:
+        response["error"] = f"{type(e).__name__}: {e}"
+        return response
+    rendered = render_contents(amtree, contents, targets)
+    for target in targets:
+        response[target] = getattr(rendered, target)
+    return response
+
+
+def handle_line(line: bytes) -> bytes:
+    """Decode a request line, convert it and encode the response line. Runs in a worker."""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return error_line(f"Invalid JSON: {e}")
+    if not isinstance(request, dict):
+        return error_line("Request must be a JSON object")
+    return json.dumps(convert_request(request), ensure_ascii=False).encode() + b"\n"
+
+
+def error_line(message: str) -> bytes:
+    return json.dumps({"error": message}).encode() + b"\n"
+
+
+class ConversionServer:
+    """Serves conversions on a Unix domain socket.
+
+    Args:
+        socket_path: Where to listen. Defaults to `client.default_socket_path()`.
+        jobs: How many workers convert documents.
+        executor: "process" or "thread", as for `slack-copy convert`.
+        max_pending: How many conversions may be in flight at once.
+            Defaults to twice the number of workers, so workers don't wait
+            on the event loop between requests.
+        max_request_bytes: The longest request line accepted.
+    """
+
+    def __init__(
+        self,
+        socket_path: str | None = None,
+        jobs: int = 1,
+        executor: str = "process",
+        max_pending: int | None = None,
+        max_request_bytes: int = DEFAULT_MAX_REQUEST_BYTES,
+    ) -> None:
+        self.socket_path = socket_path or default_socket_path()
+        self.jobs = jobs
+        self.executor_kind = executor
+        self.max_pending = max_pending or 2 * jobs
+        self.max_request_bytes = max_request_bytes
+        self.slots: "asyncio.Semaphore | None" = None
+        self.pool: Executor | None = None
+        self.connections: "set[asyncio.Task]" = set()
+        self.n_requests = 0
+        self._stop: "asyncio.Event | None" = None
+
+    async def serve(self, ready: "asyncio.Event | None" = None) -> None:
+        """Serve until `stop` is called (or SIGINT or SIGTERM), then remove the socket.
+
+        Signals are only handled when serving from the main thread.
+
+        Args:
+            ready: Set once the server is accepting connections.
+        """
+        import asyncio
+
+        remove_stale_socket(self.socket_path)
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self._stop = stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        signals = [signal.SIGINT, signal.SIGTERM] if threading.current_thread() is threading.main_thread() else []
+        try:
+            for signum in signals:
+                loop.add_signal_handler(signum, stop.set)
+            self.pool = make_executor(self.executor_kind, self.jobs)
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path=self.socket_path, limit=READ_BUFFER_BYTES
+            )
+            os.chmod(self.socket_path, 0o600)
+            logger.info(
+                "Serving conversions on %s with %d %s workers", self.socket_path, self.jobs, self.executor_kind
+            )
+            if ready is not None:
+                ready.set()
+            async with server:
+                await stop.wait()
+                # Drop open connections (and any conversions in flight), so
+                # that closing the server doesn't wait on idle clients.
+                for task in self.connections:
+                    task.cancel()
+                await asyncio.gather(*self.connections, return_exceptions=True)
+        finally:
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.socket_path)
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            logger.info("Served %d requests", self.n_requests)
+
+    def stop(self) -> None:
+        """Make `serve` return. Call from the server's event loop."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def handle_connection(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter") -> None:
+        import asyncio
+
+        task = asyncio.current_task()
+        self.connections.add(task)  # type: ignore
+        try:
+            while True:
+                # Wait for a request without holding a slot, so idle
+                # connections don't keep others waiting.
+                head = await reader.read(1)
+                if not head:
+                    break
+                async with self.slots:  # type: ignore
+                    line = await self.read_line(reader, head)
+                    if line is None:
+                        writer.write(error_line(f"Request longer than {self.max_request_bytes} bytes"))
+                        await writer.drain()
+                        break
+                    if line.isspace():
+                        continue
+                    writer.write(await self.convert_line(line))
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled only when the server shuts down, and there's nothing
+            # above the handler to tell.
+            pass
+        finally:
+            self.connections.discard(task)  # type: ignore
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def read_line(self, reader: "asyncio.StreamReader", head: bytes) -> bytes | None:
+        """Read the rest of a request line that starts with `head`.
+
+        Returns:
+            The line, or None if it's longer than `max_request_bytes`.
+        """
+        import asyncio
+
+        parts = [head]
+        size = len(head)
+        while not parts[-1].endswith(b"\n"):
+            try:
+                chunk = await reader.readuntil(b"\n")
+            except asyncio.LimitOverrunError as e:
+                # No newline yet within the buffer's limit; take what's there.
+                chunk = await reader.read(e.consumed)
+            except asyncio.IncompleteReadError as e:
+                # The last request, without a newline.
+                parts.append(e.partial)
+                break
+            parts.append(chunk)
+            size += len(chunk)
+            if size > self.max_request_bytes:
+                return None
+        return b"".join(parts)
+
+    async def convert_line(self, line: bytes) -> bytes:
+        """Convert a request line in the pool. The caller holds a slot."""
+        import asyncio
+
+        self.n_requests += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, handle_line, line)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for running out of memory), which
+            # takes the pool with it; start a new one for later requests.
+            logger.error("A conversion worker died; restarting the pool")
+            self.pool.shutdown(wait=False)  # type: ignore
+            self.pool = make_executor(self.executor_kind, self.jobs)
+            return error_line("The conversion worker died")
+        except Exception as e:
+            logger.exception("Conversion failed")
+            return error_line(f"{type(e).__name__}: {e}")
+
+
+def remove_stale_socket(path: str) -> None:
+    """Remove a socket left behind by a server that didn't shut down cleanly.
+
+    Raises:
+        OSError: If another server is listening there, or the path isn't a socket.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{path} exists and isn't a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f"Another server is already listening on {path}")
+
+
+def add_serve_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--socket", default=None, help=f"The socket to listen on (default: {default_socket_path()})."
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of workers."
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        default="process",
+        help="Run workers as processes (the default) or threads.",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=None,
+        help="Conversions in flight before clients have to wait (default: twice the workers).",
+    )
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    """Run `slack-copy serve`, returning the exit code."""
+    import asyncio
+
+    server = ConversionServer(args.socket, args.jobs, args.executor, args.max_pending)
+    print(f"Serving conversions on {server.socket_path}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve())
+    except OSError as e:
+        print(f"slack-copy: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,261 @@
+"""Per-stage timings and counts of what the parsers skipped.
+
+Everything is collected into the module-level `TELEMETRY`. Stage timing is
+off by default and costs one attribute check per stage when off; it is turned
+on by `slack-copy --profile`, which prints a summary (or a histogram of
+stage times) on exit. Unknown tags are always counted by name, replacing the
+per-tag prints the parsers used to make, as are pastes that were left alone
+without converting them, by reason. Pastes are converted from worker threads,
+so updates take a lock, and tag names past the first `MAX_UNPARSED_NAMES` are
+counted together as "other", since they come from whatever HTML is pasted.
+
+Diagnostics go through the "slack_copy" logger; `configure_logging` sets it
+up for plain or JSON-lines output.
+"""
+import argparse
+import atexit
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import functools
+import json
+import logging
+import math
+import sys
+import threading
+import time
+from typing import Callable, Iterator, TypeVar
+
+logger = logging.getLogger("slack_copy")
+
+# The stages of handling a paste, in order. "nest" (list fix-up) happens
+# during "parse", so its time is also included in "parse".
+STAGES = ("fetch", "detect", "parse", "nest", "normalize", "render", "set_clipboard")
+# Upper bounds of the histogram buckets, in milliseconds.
+BUCKET_BOUNDS_MS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, math.inf)
+# Distinct unknown tag names counted before the rest are counted as "other".
+MAX_UNPARSED_NAMES = 100
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageStats:
+    """Running statistics of one stage's durations."""
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    # Number of durations per bucket of `BUCKET_BOUNDS_MS`.
+    buckets: list[int] = field(default_factory=lambda: [0] * len(BUCKET_BOUNDS_MS))
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        milliseconds = seconds * 1e3
+        for i, bound in enumerate(BUCKET_BOUNDS_MS):
+            if milliseconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Telemetry:
+    """Collects stage timings and unparsed-node counts.
+
+    Attributes:
+        enabled: Whether stages are timed.
+        stages: Statistics for each stage that has been timed.
+        unparsed: How often each unknown tag name was skipped. Nodes that
+            aren't tags or strings (e.g. comments) are counted as "#Type",
+            and names beyond the first `MAX_UNPARSED_NAMES` as "other".
+        skipped: How often a paste was left alone without converting it, by
+            reason (e.g. "not markdown").
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.stages: dict[str, StageStats] = {}
+        self.unparsed: Counter[str] = Counter()
+        self.skipped: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.unparsed.clear()
+            self.skipped.clear()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.add(seconds)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of a `with` block as the given stage, if enabled."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorator timing every call of a function as the given stage, if enabled."""
+        def decorator(function: Callable[..., T]) -> Callable[..., T]:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs) -> T:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def count_unparsed(self, name: str) -> None:
+        with self._lock:
+            if name not in self.unparsed and len(self.unparsed) >= MAX_UNPARSED_NAMES:
+                name = "other"
+            self.unparsed[name] += 1
+
+    def count_skipped(self, reason: str) -> None:
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def summary(self) -> str:
+        """A table of the time spent in each stage, the skipped tags and the skipped pastes."""
+        lines = [f"{'stage':<14}{'count':>7}{'total (ms)':>12}{'mean (ms)':>11}{'max (ms)':>10}"]
+        with self._lock:
+            for name, stats in self._ordered_stages():
+                lines.append(
+                    f"{name:<14}{stats.count:>7}{stats.total * 1e3:>12.2f}"
+                    f"{stats.mean * 1e3:>11.2f}{stats.max * 1e3:>10.2f}"
+                )
+            if self.unparsed:
+                counts = ", ".join(f"{name} x{count}" for name, count in self.unparsed.most_common())
+                lines.append(f"unparsed: {counts}")
+            if self.skipped:
+                counts = ", ".join(f"{reason} x{count}" for reason, count in self.skipped.most_common())
+                lines.append(f"left alone: {counts}")
+        return "\n".join(lines)
+
+    def histogram(self) -> str:
+        """The number of times each stage took up to each bucket's bound."""
+        labels = [f"<={bound:g}" if bound != math.inf else ">1000" for bound in BUCKET_BOUNDS_MS]
+        lines = [f"{'stage (ms)':<14}" + "".join(f"{label:>8}" for label in labels)]
+        with self._lock:
+            for name, stats in self._ordered_stages():
+                lines.append(f"{name:<14}" + "".join(f"{count:>8}" for count in stats.buckets))
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {"count": stats.count, "total": stats.total, "max": stats.max}
+                    for name, stats in self._ordered_stages()
+                },
+                "unparsed": dict(self.unparsed),
+                "skipped": dict(self.skipped),
+            }
+
+    def _ordered_stages(self) -> list[tuple[str, StageStats]]:
+        """The stages in pipeline order. Call with the lock held."""
+        order = {name: i for i, name in enumerate(STAGES)}
+        return sorted(self.stages.items(), key=lambda item: order.get(item[0], len(order)))
+
+
+TELEMETRY = Telemetry()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as JSON lines, including any `extra` fields."""
+
+    _RESERVED = frozenset(vars(logging.makeLogRecord({})))
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in self._RESERVED)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "WARNING", json_lines: bool = False) -> None:
+    """Send the "slack_copy" logger's records to stderr."""
+    handler = logging.StreamHandler(sys.stderr)
+    if json_lines:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def enable_profiling(report: str = "summary") -> None:
+    """Time stages from now on and print a report to stderr on exit.
+
+    Args:
+        report: "summary" for totals per stage, or "histogram" for the
+            distribution of each stage's durations.
+    """
+    TELEMETRY.enabled = True
+
+    def print_report() -> None:
+        print(TELEMETRY.histogram() if report == "histogram" else TELEMETRY.summary(), file=sys.stderr)
+
+    atexit.register(print_report)
+
+
+def add_telemetry_arguments(parser: argparse.ArgumentParser, subcommand: bool = False) -> None:
+    """Add --profile, --log-level and --log-json to a parser.
+
+    Args:
+        subcommand: Whether the parser is a subcommand's, in which case the
+            options default to whatever was given before the subcommand.
+    """
+    def default(value):
+        return argparse.SUPPRESS if subcommand else value
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="summary",
+        choices=["summary", "histogram"],
+        default=default(None),
+        help="Time each stage and print a summary (or histogram) on exit.",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default=default("WARNING"),
+        help="Level of diagnostics to print to stderr.",
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        default=default(False),
+        help="Print diagnostics as JSON lines.",
+    )
+
+
+def apply_telemetry_arguments(args: argparse.Namespace) -> None:
+    configure_logging(args.log_level, args.log_json)
+    if args.profile is not None:
+        enable_profiling(args.profile)
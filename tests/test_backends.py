@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.examples.basic import BASIC_EXAMPLE
+
+BACKENDS = ["bs4", "lxml", "stream"]
+AIRTABLE_EXAMPLE = (Path(__file__).parent.parent / "slack_copy" / "examples" / "airtable_html.html").read_text()
+
+CASES = {
+    "gdocs": (AbstractMarkdownTree.from_gdocs, BASIC_EXAMPLE["gdocs"]),
+    "slack": (AbstractMarkdownTree.from_slack, BASIC_EXAMPLE["slack"]),
+    "airtable": (AbstractMarkdownTree.from_airtable, AIRTABLE_EXAMPLE),
+    "obsidian": (AbstractMarkdownTree.from_obsidian, BASIC_EXAMPLE["obsidian_html"]),
+    "whitespace and comments": (
+        AbstractMarkdownTree.from_gdocs,
+        "<!DOCTYPE html><!--c--><html><body><pre>  \n </pre>  <p class='a  b'>x<!-- y -->z<br>&amp;</p>"
+        " \n <textarea> </textarea><?php x ?></body></html><!--after-->",
+    ),
+    "misnested": (AbstractMarkdownTree.from_gdocs, "<p><b>a<i>b</p>c</i>d</b><ul><li>x<li>y</ul>"),
+}
+
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_backends_build_the_same_tree(case):
+    convert, html = CASES[case]
+    roots = [convert(html, backend=backend).root for backend in BACKENDS]
+    assert roots[0] == roots[1] == roots[2]
+
+
+@pytest.mark.parametrize("source", ["gdocs", "slack", "airtable"])
+@pytest.mark.parametrize("seed", range(3))
+def test_backends_agree_on_generated_documents(source, seed):
+    convert = CASES[source][0]
+    html = GENERATORS[source](20, list_depth=3, style_density=0.5, seed=seed)
+    roots = [convert(html, backend=backend).root for backend in BACKENDS]
+    assert roots[0] == roots[1] == roots[2]
@@ -0,0 +1,70 @@
+import argparse
+import itertools
+import json
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.batch import BatchItem, add_convert_arguments, convert_all, convert_item, iter_items, run_convert
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.main import ClipboardContents
+
+
+def test_convert_all_streams_in_order_with_bounded_read_ahead():
+    n_read = 0
+
+    def items():
+        nonlocal n_read
+        for i in itertools.count():
+            n_read += 1
+            yield BatchItem(str(i), contents=ClipboardContents(f"- item {i}", ""))
+
+    records = convert_all(items(), jobs=2, executor="thread", chunksize=4)
+    try:
+        names = [next(records)["name"] for _ in range(30)]
+    finally:
+        records.close()
+    assert names == [str(i) for i in range(30)]
+    # The 30 yielded, plus at most 2 * jobs chunks read ahead.
+    assert n_read <= 30 + 2 * 2 * 4 + 4
+
+
+def test_convert_item_renders_text_for_html():
+    html = BASIC_EXAMPLE["gdocs"]
+    record = convert_item(BatchItem("doc", contents=ClipboardContents("stale text", html)))
+    assert record["text"] == AbstractMarkdownTree.from_gdocs(html).render_formats(["text"]).text
+    assert record["text"] != "stale text"
+
+
+def test_convert_item_keeps_plain_text():
+    text = "- item *one*"
+    record = convert_item(BatchItem("doc", contents=ClipboardContents(text, "")))
+    assert record["text"] == text
+
+
+def test_bad_jsonl_lines_become_error_records(tmp_path):
+    lines = [
+        json.dumps({"id": "good", "text": "- a"}),
+        "{not json",
+        "[1]",
+        json.dumps({"html": 5}),
+        "",
+        json.dumps({"text": "- b"}),
+    ]
+    path = tmp_path / "docs.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    records = list(convert_all(iter_items([str(path)], jsonl=True)))
+    assert [record["name"] for record in records] == ["good", f"{path}:2", f"{path}:3", f"{path}:4", f"{path}:6"]
+    assert [("error" in record) for record in records] == [False, True, True, True, False]
+    assert records[1]["error"].startswith("JSONDecodeError")
+    assert "must be an object" in records[2]["error"]
+    assert "must be strings" in records[3]["error"]
+
+
+def test_convert_exits_with_1_on_bad_lines(tmp_path, capsys):
+    path = tmp_path / "docs.jsonl"
+    path.write_text('{"text": "- a"}\n[1]\n')
+    output = tmp_path / "out.jsonl"
+    parser = argparse.ArgumentParser()
+    add_convert_arguments(parser)
+    assert run_convert(parser.parse_args(["--jsonl", str(path), "-o", str(output), "-j", "1"])) == 1
+    assert len(output.read_text().splitlines()) == 2
+    assert "(1 failed)" in capsys.readouterr().err
@@ -0,0 +1,94 @@
+import pytest
+
+from slack_copy.cache import ConversionCache, RejectionCache, contents_digest
+from slack_copy.detectors import SOURCE_DETECTORS
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.fingerprint import ClipboardFingerprint
+from slack_copy.main import ClipboardContents, fingerprint_rejection_reason, process_contents, rejection_reason
+
+
+def converted(i):
+    return ClipboardContents(text=f"text {i}", html=f"<p>text {i}</p>")
+
+
+def test_hits_and_misses():
+    cache = ConversionCache()
+    key = contents_digest("gdocs", "<p>a</p>")
+    assert cache.get(key) is None
+    cache.put(key, converted(0))
+    assert cache.get(key) == converted(0)
+    # The same payload from another source is another conversion.
+    assert cache.get(contents_digest("slack", "<p>a</p>")) is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_least_recently_used_is_evicted():
+    cache = ConversionCache(maxsize=2)
+    keys = [contents_digest("gdocs", str(i)) for i in range(3)]
+    cache.put(keys[0], converted(0))
+    cache.put(keys[1], converted(1))
+    # Using the oldest entry makes the other one the least recently used.
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], converted(2))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == converted(0)
+    assert cache.get(keys[2]) == converted(2)
+
+
+def test_own_output_is_recognized():
+    cache = ConversionCache()
+    cache.put(contents_digest("gdocs", "<p>a</p>"), converted(0))
+    assert cache.is_own_output(ClipboardContents(text="text 0", html="<p>text 0</p>", formats=("text/html",)))
+    assert not cache.is_own_output(ClipboardContents(text="text 0", html="<p>other</p>"))
+    assert cache.stats.own_outputs == 1
+
+
+def test_process_contents_uses_the_cache():
+    cache = ConversionCache()
+    contents = ClipboardContents(text="", html=BASIC_EXAMPLE["gdocs"], formats=("text/html",))
+    first = process_contents(contents, cache)
+    assert first != contents
+    assert process_contents(contents, cache) is first
+    assert cache.stats.hits == 1
+    # The converted contents coming back round are left as they are.
+    assert process_contents(first, cache) is first
+    assert cache.stats.own_outputs == 1
+
+
+def test_rejection_cache_evicts_least_recently_seen():
+    rejections = RejectionCache(maxsize=2)
+    rejections.add("a")
+    rejections.add("b")
+    assert "a" in rejections
+    rejections.add("c")
+    assert "b" not in rejections
+    assert "a" in rejections and "c" in rejections
+    assert rejections.hits == 3
+
+
+@pytest.mark.parametrize(
+    "contents, reason",
+    [
+        (ClipboardContents(text="", html="<p>from somewhere</p>"), "unknown source"),
+        (ClipboardContents(text="", html=BASIC_EXAMPLE["obsidian_html"]), "no converter for obsidian"),
+        (ClipboardContents(text=" \n", html=""), "no text or html"),
+        (ClipboardContents(text="2024-01-01 12:00:00 ERROR something failed", html=""), "not markdown"),
+    ],
+)
+def test_unconvertible_contents_are_left_alone(contents, reason):
+    detection = SOURCE_DETECTORS.detect(contents.html) if contents.html else None
+    assert rejection_reason(contents, detection) == reason
+    assert process_contents(contents, ConversionCache()) is contents
+
+
+def test_convertible_contents_are_not_rejected():
+    html = BASIC_EXAMPLE["gdocs"]
+    assert rejection_reason(ClipboardContents(text="", html=html), SOURCE_DETECTORS.detect(html)) is None
+    assert rejection_reason(ClipboardContents(text=BASIC_EXAMPLE["obsidian_plain"], html=""), None) is None
+
+
+def test_fingerprint_without_text_or_html_is_rejected():
+    image = ClipboardFingerprint(("image/png",), (-1, -1), b"")
+    assert fingerprint_rejection_reason(image) == "no text or html"
+    text = ClipboardFingerprint(("text/plain",), (5, -1), b"")
+    assert fingerprint_rejection_reason(text) is None
@@ -0,0 +1,47 @@
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.html_parsers.gdocs_parser import GDocsParser, css_styles, parse_css_declarations
+
+
+@pytest.mark.parametrize(
+    "style, expected",
+    [
+        ("", ()),
+        ("font-weight:700;font-style:normal;", ("bold",)),
+        ("font-weight: 400", ()),
+        ("FONT-WEIGHT: Bold", ("bold",)),
+        ("font-weight:600", ("bold",)),
+        ("font-style:italic", ("italic",)),
+        ("text-decoration:underline line-through", ("underline", "strikethrough")),
+        ("text-decoration-line:line-through", ("strikethrough",)),
+        ("font-family:'Roboto Mono',monospace;font-weight:700", ("bold", "code")),
+        ("font-family:Arial", ()),
+        # Later declarations win, and !important is ignored.
+        ("font-weight:700;font-weight:400", ()),
+        ("font-weight:700 !important", ("bold",)),
+        # Malformed declarations are skipped.
+        ("font-weight;font-style:italic;;", ("italic",)),
+    ],
+)
+def test_css_styles(style, expected):
+    assert css_styles(style) == expected
+
+
+def test_css_styles_are_memoized():
+    style = "font-weight:700;font-style:italic;color:#123456"
+    assert css_styles(style) is css_styles(style)
+    # Equal style lists are shared between different strings.
+    assert css_styles("font-style:italic;font-weight:bold") is css_styles(style)
+
+
+def test_parse_css_declarations():
+    assert parse_css_declarations(" Color : red ; margin-left:1pt; bad ") == {"color": "red", "margin-left": "1pt"}
+
+
+def test_normal_weight_wrapper_is_not_bold():
+    def markdown(html):
+        return AbstractMarkdownTree(GDocsParser().parse(html)).render_formats().markdown
+
+    assert markdown('<b style="font-weight:normal;" id="docs-internal-guid-1"><p>a</p></b>').strip() == "a"
+    assert markdown("<b>a</b>").strip() == "**a**"
@@ -0,0 +1,98 @@
+import pytest
+
+from slack_copy.detectors import SOURCE_DETECTORS, SourceDetectorRegistry, looks_like_markdown
+from slack_copy.examples.basic import BASIC_EXAMPLE
+
+
+@pytest.fixture
+def registry():
+    registry = SourceDetectorRegistry(prefix_size=100)
+    registry.register("first", mime_formats=["first/clip"], markers=["FIRST-MARK"])
+    registry.register("second", mime_formats=["second/clip"], markers=["SECOND-MARK", "FIRST"])
+    return registry
+
+
+@pytest.mark.parametrize(
+    "name, source", [("gdocs", "gdocs"), ("slack", "slack"), ("obsidian_html", "obsidian")]
+)
+def test_detects_the_examples(name, source):
+    detection = SOURCE_DETECTORS.detect(BASIC_EXAMPLE[name])
+    assert detection is not None
+    assert detection.source == source
+
+
+def test_mime_formats_come_first(registry):
+    detection = registry.detect("<p>FIRST-MARK</p>", ["text/html", "second/clip"])
+    assert (detection.source, detection.rule.kind) == ("second", "mime")
+    # Earlier registered sources win within a stage.
+    assert registry.detect("", ["second/clip", "first/clip"]).source == "first"
+
+
+def test_prefix_markers(registry):
+    detection = registry.detect("<p>SECOND-MARK FIRST-MARK</p>")
+    assert (detection.source, detection.rule.kind) == ("first", "prefix")
+    # The longest marker wins where markers overlap.
+    assert registry.detect("<p>FIRST-MARK</p>").rule.pattern == "FIRST-MARK"
+    assert registry.detect("<p>no marker</p>") is None
+
+
+@pytest.mark.parametrize("offset", range(85, 101))
+def test_marker_straddling_the_prefix_is_found(registry, offset):
+    html = "x" * offset + "SECOND-MARK" + "y" * 200
+    detection = registry.detect(html)
+    assert detection is not None
+    assert detection.source == "second"
+    assert detection.rule.pattern == "SECOND-MARK"
+    assert detection.rule.kind == ("prefix" if offset + len("SECOND-MARK") <= 100 else "full")
+
+
+def test_markers_past_the_prefix(registry):
+    detection = registry.detect("x" * 1000 + "SECOND-MARK")
+    assert (detection.source, detection.rule.kind) == ("second", "full")
+    assert registry.detect("x" * 1000) is None
+    assert SourceDetectorRegistry().detect("<p>a</p>") is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "- item",
+        "notes\n  1. item",
+        "1) item",
+        "# Heading",
+        "```python",
+        "some **bold** text",
+        "some *italic* text",
+        "some _italic_ text",
+        "~~struck~~",
+        "run `ls`",
+        "[a link](https://example.com)",
+        "see [[Other note]]",
+        BASIC_EXAMPLE["obsidian_plain"],
+    ],
+)
+def test_markdown_is_recognized(text):
+    assert looks_like_markdown(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "just some words",
+        "2024-01-01 12:00:00 ERROR something failed",
+        "x = a*b*c",
+        "a * b * c",
+        "snake_case_name",
+        "https://example.com/a_b_c?q=*",
+        "#hashtag",
+        "-1 degrees",
+    ],
+)
+def test_plain_text_is_not_markdown(text):
+    assert not looks_like_markdown(text)
+
+
+def test_markdown_is_only_looked_for_in_the_scan_window():
+    text = "a" * 100 + " **bold**"
+    assert not looks_like_markdown(text, scan_size=100)
+    assert looks_like_markdown(text, scan_size=200)
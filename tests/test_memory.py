@@ -0,0 +1,102 @@
+import gc
+import sys
+import tracemalloc
+import weakref
+
+import bs4
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.memory import MAX_RETAINED_RATIO, measure_tree_memory, soup_released
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.html_parsers.gdocs_parser import GDocsParser
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.html_parsers.slack_parser import SlackParser
+from slack_copy.nodes import AMLeaf
+from slack_copy.obsidian_reader import read_obsidian_markdown
+
+# Generous, so only a tree holding on to parser state fails.
+MAX_BYTES_PER_NODE = 250
+
+
+@pytest.mark.parametrize(
+    "parser_class, html",
+    [
+        (HTMLParser, BASIC_EXAMPLE["obsidian_html"]),
+        (GDocsParser, BASIC_EXAMPLE["gdocs"]),
+        (SlackParser, BASIC_EXAMPLE["slack"]),
+    ],
+)
+def test_soup_is_freed_after_parsing(monkeypatch, parser_class, html):
+    soups = []
+
+    class RecordingSoup(bs4.BeautifulSoup):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            soups.append(weakref.ref(self))
+
+    monkeypatch.setattr(bs4, "BeautifulSoup", RecordingSoup)
+    root = parser_class("bs4").parse(html)
+    gc.collect()
+    assert root is not None
+    assert soups
+    assert all(soup() is None for soup in soups)
+
+
+def test_soup_released_check():
+    assert soup_released(BASIC_EXAMPLE["gdocs"])
+
+
+def test_tree_is_all_that_is_retained():
+    html = BASIC_EXAMPLE["gdocs"] * 100
+    retained = {backend: measure_tree_memory(html, backend) for backend in ["bs4", "stream"]}
+    (bs4_bytes, n_nodes), (stream_bytes, _) = retained["bs4"], retained["stream"]
+    assert bs4_bytes <= MAX_RETAINED_RATIO * stream_bytes
+    assert bs4_bytes <= MAX_BYTES_PER_NODE * n_nodes
+    # The tree keeps nothing of the input but its text.
+    assert bs4_bytes < len(html)
+
+
+def test_tree_memory_is_freed_with_the_tree():
+    # Thousands of distinct short texts, which are shared between nodes.
+    html = "".join(f"<p><span>text {i}</span> <b>{i}</b></p>" for i in range(5000))
+    AbstractMarkdownTree.from_gdocs(BASIC_EXAMPLE["gdocs"], backend="bs4")
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tree = AbstractMarkdownTree.from_gdocs(html, backend="bs4")
+        del tree
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Nothing is cached for later parses, e.g. the texts of the nodes.
+    assert after - before < 20_000
+
+
+def leaf_texts(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AMLeaf):
+            yield node.text
+        stack.extend(node.children)
+
+
+@pytest.mark.parametrize(
+    "parse",
+    [
+        lambda text: HTMLParser("bs4").parse(f"<p>{text}</p>"),
+        lambda text: HTMLParser("stream").parse(f"<p><b>{text}</b></p>"),
+        lambda text: read_obsidian_markdown(f"intro\n- {text}"),
+    ],
+)
+def test_short_texts_are_freed_with_their_tree(parse):
+    root = parse("distinct short text 8d1f")
+    text = next(t for t in leaf_texts(root) if "8d1f" in t)
+    del root
+    gc.collect()
+    # Only `text` and getrefcount's argument refer to it, so nothing shared
+    # between parses (or an interned, immortal string) keeps it alive.
+    assert sys.getrefcount(text) == 2
@@ -0,0 +1,59 @@
+from slack_copy.html_parsers.nesting import nest_by_indent
+from slack_copy.nodes import EMPTY_CHILDREN, AMLeaf, AMList, AMListElement
+
+
+def flat(*items):
+    """(indent, text) pairs, or (indent, text, ordered), as one-item lists."""
+    for indent, text, *ordered in items:
+        item = AMListElement(children=[AMLeaf(children=EMPTY_CHILDREN, text=text, styles=[])])
+        yield indent, AMList(children=[item], ordered=bool(ordered and ordered[0]), data_indent=indent)
+
+
+def shape(node):
+    """A list as ("ol"/"ul", data_indent, [item texts and nested shapes])."""
+    children = []
+    for child in node.children:
+        if isinstance(child, AMList):
+            children.append(shape(child))
+        else:
+            children.append(child.children[0].text)
+    return ("ol" if node.ordered else "ul", node.data_indent, children)
+
+
+def test_nests_and_dedents():
+    roots = nest_by_indent(flat((0, "a"), (1, "b"), (1, "c"), (2, "d"), (0, "e"), (1, "f")))
+    assert [shape(root) for root in roots] == [
+        ("ul", 0, ["a", ("ul", 1, ["b", "c", ("ul", 2, ["d"])]), "e", ("ul", 1, ["f"])]),
+    ]
+
+
+def test_dedent_closes_several_levels():
+    roots = nest_by_indent(flat((0, "a"), (1, "b"), (2, "c"), (3, "d"), (1, "e")))
+    assert [shape(root) for root in roots] == [
+        ("ul", 0, ["a", ("ul", 1, ["b", ("ul", 2, ["c", ("ul", 3, ["d"])]), "e"])]),
+    ]
+
+
+def test_gaps_get_empty_lists():
+    roots = nest_by_indent(flat((0, "a"), (3, "b"), (1, "c")))
+    assert [shape(root) for root in roots] == [
+        ("ul", 0, ["a", ("ul", 1, [("ul", 2, [("ul", 3, ["b"])]), "c"])]),
+    ]
+
+
+def test_mixed_ordered_and_unordered():
+    roots = nest_by_indent(flat((0, "a", True), (1, "b"), (1, "c", True), (0, "d"), (2, "e", True)))
+    # Items join the open list at their level, whatever its type; new and
+    # filler lists take the type of the item that opens them.
+    assert [shape(root) for root in roots] == [
+        ("ol", 0, ["a", ("ul", 1, ["b", "c"]), "d", ("ol", 1, [("ol", 2, ["e"])])]),
+    ]
+
+
+def test_items_less_indented_than_the_first_start_new_roots():
+    roots = nest_by_indent(flat((1, "a"), (2, "b"), (0, "c"), (0, "d")))
+    assert [shape(root) for root in roots] == [
+        ("ul", 1, ["a", ("ul", 2, ["b"])]),
+        ("ul", 0, ["c", "d"]),
+    ]
+    assert nest_by_indent([]) == []
@@ -0,0 +1,81 @@
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.nodes import AMContainer, AMImage, AMLeaf, AMList, AMNode, AMParagraph
+
+CONVERTERS = {
+    "gdocs": AbstractMarkdownTree.from_gdocs,
+    "slack": AbstractMarkdownTree.from_slack,
+    "airtable": AbstractMarkdownTree.from_airtable,
+    "obsidian_plain": lambda text: AbstractMarkdownTree.from_obsidian(text, is_html=False),
+}
+BLOCK_NODES = (AMParagraph, AMContainer, AMList)
+
+
+def displayed(root: AMNode) -> list[tuple]:
+    """What a tree displays: block boundaries, and runs of text with their effective styles and link.
+
+    Spans don't show up except through the styles and links they give their
+    text, and a container around a single block looks the same as the block.
+    """
+    items: list[tuple] = []
+
+    def add_text(text: str, styles: frozenset, url: str | None) -> None:
+        if items and items[-1][0] == "text" and items[-1][2:] == (styles, url):
+            items[-1] = ("text", items[-1][1] + text, styles, url)
+        else:
+            items.append(("text", text, styles, url))
+
+    def walk(node: AMNode, styles: frozenset, url: str | None) -> None:
+        styles = styles | frozenset(getattr(node, "styles", ()))
+        url = getattr(node, "url", None) or url
+        if node.__class__ is AMLeaf:
+            add_text(node.text, styles, url)
+            return
+        if node.__class__ is AMImage:
+            items.append(("image", str(node.src), node.alt, styles, url))
+            return
+        boundary = node.__class__ in (AMParagraph, AMList) or (
+            node.__class__ is AMContainer
+            and not (len(node.children) == 1 and isinstance(node.children[0], BLOCK_NODES))
+        )
+        if boundary:
+            items.append(("open", node.__class__.__name__, getattr(node, "ordered", None)))
+        for child in node.children:
+            in_item = node.__class__ is AMList and child.wrap_in_list_item
+            if in_item:
+                items.append(("open", "li"))
+            walk(child, styles, url)
+            if in_item:
+                items.append(("close", "li"))
+        if boundary:
+            items.append(("close", node.__class__.__name__))
+
+    walk(root, frozenset(), None)
+    return items
+
+
+def assert_normalize_keeps_output(tree: AbstractMarkdownTree) -> None:
+    before = tree.render_formats()
+    shown = displayed(tree.root)
+    stats = tree.normalize()
+    after = tree.render_formats()
+    assert stats.nodes_removed > 0
+    assert after.text == before.text
+    assert after.markdown == before.markdown
+    assert displayed(tree.root) == shown
+    assert len(after.html) <= len(before.html)
+
+
+@pytest.mark.parametrize("source", list(GENERATORS))
+@pytest.mark.parametrize("seed", range(3))
+def test_normalize_keeps_generated_output(source, seed):
+    text = GENERATORS[source](30, list_depth=3, style_density=0.6, seed=seed)
+    assert_normalize_keeps_output(CONVERTERS[source](text))
+
+
+@pytest.mark.parametrize("source", ["gdocs", "slack", "obsidian_plain"])
+def test_normalize_keeps_example_output(source):
+    assert_normalize_keeps_output(CONVERTERS[source](BASIC_EXAMPLE[source]))
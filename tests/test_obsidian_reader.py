@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree, parse_obsidian_markdown
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.obsidian_reader import read_obsidian_markdown
+
+
+def read_through_html(text):
+    return HTMLParser().parse(parse_obsidian_markdown(text))
+
+
+def random_note(rng: random.Random) -> str:
+    """A note starting with a line of text, then text, blank lines and list items."""
+    words = ["a", "bc", "*it*", "**bold**", "`code`", "[link](http://example.com)"]
+
+    def text():
+        return "".join(rng.choice(words) + rng.choice([" ", ""]) for _ in range(rng.randint(1, 4))).strip()
+
+    lines = ["intro " + text()]
+    for _ in range(rng.randint(1, 6)):
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(text())
+        elif kind < 0.4:
+            lines.append("")
+        else:
+            lines.append("\t" * rng.randint(0, 1) + rng.choice(["-", "1.", "2."]) + " " + text())
+    return "\n".join(lines)
+
+
+def test_example_matches_html_path():
+    text = BASIC_EXAMPLE["obsidian_plain"]
+    root = read_obsidian_markdown(text)
+    assert root is not None
+    assert root == read_through_html(text)
+
+
+def test_random_notes_match_html_path():
+    rng = random.Random(0)
+    n_read = 0
+    for _ in range(2000):
+        text = random_note(rng)
+        root = read_obsidian_markdown(text)
+        if root is None:
+            continue
+        n_read += 1
+        assert root == read_through_html(text), text
+    assert n_read > 100
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        # Runs of spaces, which the HTML path collapses around markup.
+        "intro *i*  *i*",
+        "intro a  b",
+        # Runs of backticks.
+        "intro `c``c` a",
+        # An item after one with a nested list, which markdown makes loose.
+        "intro\n- c\n\t- a\n- d",
+        "intro\n1. b\n\t- b\n1. a",
+        # A nested list switching type.
+        "intro\n- a\n\t- b\n\t1. c",
+    ],
+)
+def test_differing_constructs_fall_back(text):
+    assert read_obsidian_markdown(text) is None
+
+
+def test_list_switching_type_after_text_matches_html_path():
+    text = "intro\n2. a\n- b"
+    assert read_obsidian_markdown(text) == read_through_html(text)
+
+
+@pytest.mark.parametrize("text", ["- a\n- b", "1. a\n2. b\ntext", "2. a\n- b", "\n- a"])
+def test_list_at_start_matches_html_path(text):
+    # The HTML path can make these items loose paragraphs, so it's used for them.
+    assert read_obsidian_markdown(text) is None
+    assert AbstractMarkdownTree.from_obsidian(text, is_html=False).root == read_through_html(text)
@@ -0,0 +1,71 @@
+from concurrent.futures.process import BrokenProcessPool
+import os
+import time
+
+import pytest
+
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.html_parsers import html_parser
+from slack_copy.html_parsers.airtable_parser import AirtableParser
+from slack_copy.html_parsers.gdocs_parser import GDocsParser
+from slack_copy.html_parsers.html_parser import HTMLParser
+from slack_copy.html_parsers.parallel import IdleProcessPool, ParallelBackend
+from slack_copy.html_parsers.slack_parser import SlackParser
+
+
+@pytest.fixture(scope="module")
+def parallel_backend():
+    backend = ParallelBackend(jobs=2)
+    yield backend
+    backend.pool.shutdown()
+
+
+@pytest.mark.parametrize("parser_class", [GDocsParser, SlackParser, AirtableParser])
+@pytest.mark.parametrize("seed", range(3))
+def test_parallel_matches_serial(parallel_backend, parser_class, seed):
+    source = {GDocsParser: "gdocs", SlackParser: "slack", AirtableParser: "airtable"}[parser_class]
+    text = GENERATORS[source](30, list_depth=3, style_density=0.5, seed=seed)
+    parser = parser_class("lxml")
+    assert parallel_backend.build(parser, text) == parser.backend.build(parser, text)
+
+
+def test_explicit_backend_is_not_switched(monkeypatch):
+    monkeypatch.setattr(html_parser, "PARALLEL_THRESHOLD", 0)
+    monkeypatch.setattr(html_parser, "parallel_parsing_available", lambda: True)
+
+    def fail():
+        raise AssertionError("switched to the parallel backend")
+
+    monkeypatch.setattr(html_parser, "get_parallel_backend", fail)
+    assert HTMLParser("stream").parse("<p>a</p><p>b</p>") is not None
+
+
+def test_pool_shuts_down_when_idle():
+    pool = IdleProcessPool(jobs=1, idle_seconds=0.1)
+    try:
+        with pool.use() as executor:
+            assert executor.submit(abs, -1).result() == 1
+            time.sleep(0.3)
+            # Not shut down while in use.
+            assert pool.running
+        deadline = time.monotonic() + 5
+        while pool.running and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not pool.running
+    finally:
+        pool.shutdown()
+
+
+def test_dead_worker_falls_back_to_serial(parallel_backend, caplog):
+    text = GENERATORS["gdocs"](30, list_depth=3, style_density=0.5, seed=0)
+    parser = GDocsParser("lxml")
+    with parallel_backend.pool.use() as executor:
+        broken = executor
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(os._exit, 1).result()
+    assert parallel_backend.build(parser, text) == parser.backend.build(parser, text)
+    assert "parsing serially" in caplog.text
+    # The broken pool was discarded, and the next parse starts a new one.
+    assert parallel_backend.build(parser, text) == parser.backend.build(parser, text)
+    with parallel_backend.pool.use() as executor:
+        assert executor is not broken
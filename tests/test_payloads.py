@@ -0,0 +1,53 @@
+import gc
+import pickle
+
+import pytest
+
+from slack_copy.abstract_markdown import AbstractMarkdownTree
+from slack_copy.benchmarks.memory import image_heavy_html
+from slack_copy.html_parsers import GDocsParser
+from slack_copy.nodes import AMImage, iter_html
+from slack_copy.payloads import PLACEHOLDER_PREFIX, Payload, extract_payloads
+
+
+@pytest.fixture(scope="module")
+def html():
+    return image_heavy_html(n_images=2, image_bytes=20_000)
+
+
+def images(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, AMImage):
+            yield node
+        stack.extend(node.children)
+
+
+def test_payloads_dont_reference_the_source(html):
+    text, payloads = extract_payloads(html)
+    assert len(payloads) == 2
+    assert f"{PLACEHOLDER_PREFIX}0" in text
+    for payload in payloads:
+        assert payload.text.startswith("data:image/png;base64,")
+        assert payload.text in html
+        assert not any(referent is html for referent in gc.get_referents(payload))
+
+
+@pytest.mark.parametrize("backend", ["bs4", "lxml", "stream"])
+def test_tree_with_payloads_renders_like_the_html(html, backend):
+    root = GDocsParser(backend).parse(html)
+    srcs = [image.src for image in images(root)]
+    assert srcs and all(isinstance(src, Payload) for src in srcs)
+    rendered = AbstractMarkdownTree(root).render_formats()
+    assert rendered.html == root.to_html() == "".join(iter_html(root))
+    for src in srcs:
+        assert f'<img src="{src.text}" alt="chart">' in rendered.html
+    assert "data:" not in rendered.markdown
+
+
+def test_payload_equality_and_pickling():
+    a, b = Payload("data:" + "x" * 10), Payload("data:" + "x" * 10)
+    assert a == b and hash(a) == hash(b)
+    assert a != Payload("data:y")
+    assert pickle.loads(pickle.dumps(a)) == a
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from slack_copy.client import ConversionClient, ConversionError
+from slack_copy.examples.basic import BASIC_EXAMPLE
+from slack_copy.server import ConversionServer
+
+
+class RunningServer:
+    """A ConversionServer serving from a background thread, as when embedded."""
+
+    def __init__(self, socket_path: str, **kwargs) -> None:
+        self.server = ConversionServer(socket_path, jobs=1, executor="thread", **kwargs)
+        self.loop = asyncio.new_event_loop()
+        self.started = threading.Event()
+        self.error: BaseException | None = None
+        self.thread = threading.Thread(target=self._run)
+
+    def _run(self) -> None:
+        ready = asyncio.Event()
+
+        async def serve():
+            task = asyncio.create_task(self.server.serve(ready))
+            await asyncio.wait([task, asyncio.create_task(ready.wait())], return_when=asyncio.FIRST_COMPLETED)
+            self.started.set()
+            await task
+
+        try:
+            self.loop.run_until_complete(serve())
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.started.set()
+            self.loop.close()
+
+    def start(self) -> None:
+        self.thread.start()
+        assert self.started.wait(10)
+        if self.error is not None:
+            raise self.error
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.server.stop)
+        self.thread.join(10)
+        assert not self.thread.is_alive()
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def server(tmp_path):
+    running = RunningServer(str(tmp_path / "server.sock"))
+    running.start()
+    yield running
+    if running.thread.is_alive():
+        running.stop()
+
+
+def test_converts_requests(server):
+    with ConversionClient(server.server.socket_path, timeout=10) as client:
+        converted = client.convert(html=BASIC_EXAMPLE["gdocs"])
+        assert set(converted) == {"html", "text", "markdown"}
+        assert "**numbered**" in converted["markdown"]
+        # A second request on the same connection.
+        assert client.convert(text=BASIC_EXAMPLE["obsidian_plain"], source="obsidian", to=["html"])["html"]
+
+
+def test_to_selects_formats(server):
+    with ConversionClient(server.server.socket_path, timeout=10) as client:
+        response = client.request({"id": 7, "html": BASIC_EXAMPLE["slack"], "source": "slack", "to": "markdown"})
+    assert set(response) == {"id", "markdown"}
+
+
+@pytest.mark.parametrize(
+    "request_, error",
+    [
+        ({"id": 1}, 'Request has no "html" or "text"'),
+        ({"id": 1, "html": "<p>a</p>", "to": ["pdf"]}, "Unknown formats"),
+        ({"id": 1, "html": "<p>a</p>", "source": "word"}, "Can't convert html from source 'word'"),
+    ],
+)
+def test_errors_are_responses(server, request_, error):
+    with ConversionClient(server.server.socket_path, timeout=10) as client:
+        response = client.request(request_)
+        assert response["id"] == 1
+        assert error in response["error"]
+        with pytest.raises(ConversionError):
+            client.convert(html="<p>a</p>", to=["pdf"])
+        # The connection is still usable.
+        assert client.convert(html=BASIC_EXAMPLE["gdocs"], to=["text"])["text"]
+
+
+def test_invalid_json_and_long_requests(tmp_path):
+    running = RunningServer(str(tmp_path / "server.sock"), max_request_bytes=1000)
+    running.start()
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.settimeout(10)
+            sock.connect(running.server.socket_path)
+            responses = sock.makefile("rb")
+            sock.sendall(b"not json\n")
+            assert json.loads(responses.readline())["error"].startswith("Invalid JSON")
+            sock.sendall(json.dumps({"html": "x" * 5000}).encode() + b"\n")
+            assert "longer than 1000 bytes" in json.loads(responses.readline())["error"]
+            assert responses.readline() == b""
+    finally:
+        running.stop()
+
+
+def test_waits_for_a_slot_before_reading(tmp_path):
+    running = RunningServer(str(tmp_path / "server.sock"), max_pending=1)
+    running.start()
+    try:
+        # An idle connection doesn't hold the only slot.
+        with socket.socket(socket.AF_UNIX) as idle:
+            idle.connect(running.server.socket_path)
+            with ConversionClient(running.server.socket_path, timeout=10) as client:
+                assert client.convert(html=BASIC_EXAMPLE["gdocs"], to=["text"])["text"]
+    finally:
+        running.stop()
+
+
+def test_stop_removes_the_socket(server):
+    path = server.server.socket_path
+    assert os.path.exists(path)
+    with ConversionClient(path, timeout=10) as client:
+        client.convert(html=BASIC_EXAMPLE["gdocs"], to=["html"])
+        server.stop()
+    assert not os.path.exists(path)
+    assert server.server.n_requests == 1
+
+
+def test_text_follows_the_clipboard_rule(server):
+    note = BASIC_EXAMPLE["obsidian_plain"]
+    with ConversionClient(server.server.socket_path, timeout=10) as client:
+        # Plain text keeps its text; HTML gets the rendered text.
+        assert client.convert(text=note, source="obsidian", to=["text"])["text"] == note
+        assert client.convert(html=BASIC_EXAMPLE["gdocs"], to=["text"])["text"].startswith("Here’s an example")
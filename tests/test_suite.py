@@ -0,0 +1,39 @@
+import pytest
+
+from slack_copy.benchmarks.generators import GENERATORS
+from slack_copy.benchmarks.suite import STAGES, best_stages, check_scaling, time_stages
+from slack_copy.telemetry import TELEMETRY
+
+SIZES = [50, 200]
+# Looser than the benchmark's own guard: small documents on a busy machine
+# are noisy, and a quadratic stage would still come out near 2.
+MAX_EXPONENT = 1.6
+
+
+@pytest.mark.parametrize("source", list(GENERATORS))
+def test_stages_scale_linearly(source):
+    results = {size: best_stages(source, size, repeat=5) for size in SIZES}
+    assert check_scaling(results, SIZES, max_exponent=MAX_EXPONENT) == []
+
+
+def test_check_scaling_flags_quadratic_stage():
+    results = {
+        size: {"detect": None, "parse": size * 1e-4, "nest": (size * 1e-3) ** 2, "render": size * 1e-5}
+        for size in SIZES
+    }
+    failures = check_scaling(results, SIZES)
+    assert len(failures) == 1
+    assert failures[0].startswith("nest grew as size^2.00")
+
+
+@pytest.mark.parametrize("source", ["slack", "airtable"])
+def test_nest_is_timed_from_the_real_parser(source):
+    timings = time_stages(source, GENERATORS[source](50))
+    assert set(timings) == set(STAGES)
+    assert timings["nest"] is not None and timings["nest"] > 0
+    assert not TELEMETRY.enabled
+
+
+@pytest.mark.parametrize("source", ["gdocs", "obsidian_plain"])
+def test_nest_is_none_when_lists_come_out_nested(source):
+    assert time_stages(source, GENERATORS[source](50))["nest"] is None
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from slack_copy.main import main
+from slack_copy.telemetry import MAX_UNPARSED_NAMES, TELEMETRY, Telemetry
+
+
+def test_counts_from_threads_add_up():
+    telemetry = Telemetry(enabled=True)
+    n_threads, n_updates = 8, 2000
+    start = threading.Barrier(n_threads)
+
+    def update(i):
+        start.wait()
+        for j in range(n_updates):
+            telemetry.record("parse", 1e-4)
+            telemetry.count_unparsed(f"tag{j % 5}")
+            telemetry.count_skipped("not markdown")
+            if j % 100 == 0:
+                telemetry.as_dict()
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert telemetry.stages["parse"].count == n_threads * n_updates
+    assert sum(telemetry.stages["parse"].buckets) == n_threads * n_updates
+    assert sum(telemetry.unparsed.values()) == n_threads * n_updates
+    assert telemetry.skipped["not markdown"] == n_threads * n_updates
+
+
+def test_unparsed_names_are_capped():
+    telemetry = Telemetry()
+    for i in range(MAX_UNPARSED_NAMES + 50):
+        telemetry.count_unparsed(f"x-tag-{i}")
+    # Names already counted keep their own count.
+    telemetry.count_unparsed("x-tag-0")
+    assert len(telemetry.unparsed) == MAX_UNPARSED_NAMES + 1
+    assert telemetry.unparsed["other"] == 50
+    assert telemetry.unparsed["x-tag-0"] == 2
+    assert "other x50" in telemetry.summary()
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["convert", "--profile", "-j", "2", "--executor", "process"],
+        ["--profile", "summary", "serve", "--executor", "process"],
+    ],
+)
+def test_profile_rejects_worker_processes(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv)
+    assert exit_info.value.code == 2
+    assert "--profile can't time worker processes" in capsys.readouterr().err
+    assert not TELEMETRY.enabled
@@ -0,0 +1,29 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from slack_copy import main  # noqa: E402
+from slack_copy.abstract_markdown import get_markdown_converter, warm_up  # noqa: E402
+
+
+def test_warm_up_runs_on_the_conversion_thread(monkeypatch):
+    warmed = []
+
+    def recording_warm_up():
+        warm_up()
+        warmed.append((threading.current_thread(), get_markdown_converter()))
+
+    monkeypatch.setattr(main, "warm_up", recording_warm_up)
+    watcher = main.ClipboardWatcher()
+    try:
+        watcher.start_warm_up().result(timeout=30)
+        [(thread, converter)] = warmed
+        assert thread is not threading.main_thread()
+        # Conversions get the converter the warm-up built.
+        assert watcher._executor.submit(get_markdown_converter).result() is converter
+    finally:
+        watcher.shutdown()